@@ -36,7 +36,7 @@ CREATE TABLE shard.completed_viewings (
     id UUID,
     event_time DateTime64(3, 'UTC'),
     user_id UUID,
-    video_id UInt32
+    video_id UUID
 ) ENGINE = ReplicatedMergeTree('/clickhouse/tables/{shard}/completed_viewings', '{replica}') 
 PARTITION BY toYYYYMMDD(event_time) 
 ORDER BY event_time;
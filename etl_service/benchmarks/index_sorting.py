@@ -0,0 +1,163 @@
+"""Сравнение списка фильмов по рейтингу на индексах с сортировкой и без.
+
+Создаёт два индекса с маппингом Movie - с index.sort по imdb_rating
+и без него, - заполняет их одинаковым синтетическим каталогом
+и замеряет первые страницы списка фильмов с сортировкой по убыванию
+рейтинга: с подсчётом общего числа совпадений и без него.
+
+Запуск из каталога etl_service:
+    python -m benchmarks.index_sorting --host http://localhost:9200 \\
+        --films 1000000
+"""
+
+import argparse
+import json
+import random
+import statistics
+import string
+import time
+import uuid
+from typing import Any, Iterator
+
+from elasticsearch import Elasticsearch
+from elasticsearch.helpers import parallel_bulk
+
+from documents.movie import Movie
+
+SORTED_INDEX = "bench_movies_sorted"
+UNSORTED_INDEX = "bench_movies_unsorted"
+GENRES = [str(uuid.uuid4()) for _ in range(30)]
+SORT_SETTINGS = ("sort.field", "sort.order", "sort.missing")
+
+
+def synthetic_films(count: int, seed: int) -> Iterator[dict[str, Any]]:
+    rnd = random.Random(seed)
+    for _ in range(count):
+        film_id = str(uuid.UUID(int=rnd.getrandbits(128)))
+        title = " ".join(
+            "".join(rnd.choices(string.ascii_lowercase, k=rnd.randint(3, 9)))
+            for _ in range(rnd.randint(1, 4))
+        )
+        yield {
+            "_id": film_id,
+            "id": film_id,
+            "title": title,
+            "imdb_rating": round(rnd.uniform(1, 10), 1),
+            "genres": [
+                {"uuid": genre, "name": genre}
+                for genre in rnd.sample(GENRES, rnd.randint(1, 3))
+            ],
+        }
+
+
+def create_index(client: Elasticsearch, name: str, index_sorting: bool):
+    settings = dict(Movie._index.to_dict()["settings"])
+    if not index_sorting:
+        for key in SORT_SETTINGS:
+            settings.pop(key, None)
+    # На время загрузки обновление и реплики не нужны
+    settings.update({"refresh_interval": "-1", "number_of_replicas": 0})
+
+    client.indices.delete(index=name, ignore_unavailable=True)
+    client.indices.create(
+        index=name,
+        settings=settings,
+        mappings=Movie._doc_type.mapping.to_dict(),
+    )
+
+
+def load(client: Elasticsearch, names: list[str], films: int, seed: int):
+    for name in names:
+        started = time.monotonic()
+        for ok, item in parallel_bulk(
+            client,
+            ({**doc, "_index": name} for doc in synthetic_films(films, seed)),
+            chunk_size=5000,
+            thread_count=4,
+        ):
+            if not ok:
+                raise RuntimeError(item)
+        client.indices.put_settings(
+            index=name, settings={"refresh_interval": "1s"}
+        )
+        client.indices.refresh(index=name)
+        # Одинаковое число сегментов в обоих индексах
+        client.indices.forcemerge(index=name, max_num_segments=5)
+        print(f"{name}: {films} films in {time.monotonic() - started:.1f}s")
+
+
+def measure(
+    client: Elasticsearch,
+    index: str,
+    track_total_hits: bool,
+    pages: int,
+    page_size: int,
+    repeats: int,
+) -> dict[str, Any]:
+    latencies, took = [], []
+    for _ in range(repeats):
+        for page_number in range(1, pages + 1):
+            body = {
+                "query": {"match_all": {}},
+                "sort": [{"imdb_rating": {"order": "desc"}}],
+                "from": (page_number - 1) * page_size,
+                "size": page_size,
+                "track_total_hits": track_total_hits,
+            }
+            started = time.perf_counter()
+            # request_cache выключен: сравниваем выполнение запроса
+            response = client.search(
+                index=index, body=body, request_cache=False
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+            took.append(response["took"])
+
+    latencies.sort()
+    return {
+        "index": index,
+        "track_total_hits": track_total_hits,
+        "requests": len(latencies),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+        "mean_took_ms": round(statistics.fmean(took), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="http://localhost:9200")
+    parser.add_argument("--films", type=int, default=1_000_000)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--skip-load",
+        action="store_true",
+        help="использовать индексы, загруженные предыдущим запуском",
+    )
+    args = parser.parse_args()
+
+    client = Elasticsearch(hosts=args.host, request_timeout=600)
+    if not args.skip_load:
+        create_index(client, SORTED_INDEX, index_sorting=True)
+        create_index(client, UNSORTED_INDEX, index_sorting=False)
+        load(client, [SORTED_INDEX, UNSORTED_INDEX], args.films, args.seed)
+
+    results = [
+        measure(
+            client,
+            index,
+            track_total_hits,
+            args.pages,
+            args.page_size,
+            args.repeats,
+        )
+        for index in (UNSORTED_INDEX, SORTED_INDEX)
+        for track_total_hits in (True, False)
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
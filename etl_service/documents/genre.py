@@ -1,3 +1,4 @@
+import json
 from datetime import datetime
 from typing import Generator
 
@@ -12,8 +13,13 @@ from elasticsearch_dsl import (
     Text,
 )
 from psycopg import ServerCursor
-from psycopg.conninfo import make_conninfo
 from psycopg.rows import class_row
+from redis import Redis
+
+# Материализованные списки фильмов жанров для theatre_service
+GENRE_FILMS_KEY = "genre_films:{genre_id}"
+GENRE_STUBS_KEY = "genre_stubs"
+FILM_STUBS_KEY = "film_stubs"
 
 
 class FilmCommon(InnerDoc):
@@ -74,13 +80,13 @@ class Genre(Document):
 
 
 def get_genre_index_data(
-    database_settings: dict, last_sync_state: datetime, batch_size: int = 100
+    conn: psycopg.Connection,
+    checkpoint: tuple[datetime, str],
+    batch_size: int = 100,
 ) -> Generator[list[Genre], None, None]:
-    dsn = make_conninfo(**database_settings)
-
     with (
-        psycopg.connect(dsn, row_factory=class_row(Genre)) as conn,
-        ServerCursor(conn, "fetcher") as cursor,
+        conn.transaction(),
+        ServerCursor(conn, "fetcher", row_factory=class_row(Genre)) as cursor,
     ):
         raw_sql = """
         SELECT
@@ -108,10 +114,87 @@ def get_genre_index_data(
                 (fw.modified)   -- дата изменения фильма
         ) v(last_change_date)
         GROUP BY g.id
-        having max(v.last_change_date) > %s
-        ORDER BY g.name
+        having (max(v.last_change_date), g.id) > (%s, %s)
+        ORDER BY max(v.last_change_date), g.id
         """
 
-        cursor.execute(raw_sql, (last_sync_state,))
+        cursor.execute(raw_sql, checkpoint)
         while results := cursor.fetchmany(size=batch_size):
             yield results
+
+
+def sync_genre_films(redis: Redis, genres: list[Genre]):
+    """Перестраивает отсортированные по рейтингу множества фильмов жанров.
+
+    Множество жанра собирается во временном ключе и атомарно подменяет
+    старое через RENAME, поэтому читатели не видят его частично
+    заполненным, а фильмы, исключённые из жанра, пропадают из него.
+    Краткие описания фильмов, не оставшихся ни в одном жанре, удаляются.
+    """
+    with redis.pipeline(transaction=False) as pipe:
+        for genre in genres:
+            pipe.zrange(GENRE_FILMS_KEY.format(genre_id=genre.id), 0, -1)
+        previous = pipe.execute()
+    removed = set()
+    for genre, film_ids in zip(genres, previous):
+        current = {film.id for film in genre.films or []}
+        removed.update(
+            film_id.decode()
+            for film_id in film_ids
+            if film_id.decode() not in current
+        )
+
+    with redis.pipeline(transaction=False) as pipe:
+        for genre in genres:
+            key = GENRE_FILMS_KEY.format(genre_id=genre.id)
+            tmp_key = f"{key}:tmp"
+            pipe.hset(
+                GENRE_STUBS_KEY,
+                genre.id,
+                json.dumps({"id": genre.id, "name": genre.name}),
+            )
+            films = genre.films or []
+            if not films:
+                pipe.delete(key)
+                continue
+
+            pipe.delete(tmp_key)
+            pipe.zadd(
+                tmp_key, {film.id: film.imdb_rating or 0 for film in films}
+            )
+            pipe.rename(tmp_key, key)
+            pipe.hset(
+                FILM_STUBS_KEY,
+                mapping={
+                    film.id: json.dumps(
+                        {
+                            "id": film.id,
+                            "title": film.title,
+                            "imdb_rating": film.imdb_rating,
+                        }
+                    )
+                    for film in films
+                },
+            )
+        pipe.execute()
+
+    if removed:
+        prune_film_stubs(redis, list(removed))
+
+
+def prune_film_stubs(redis: Redis, film_ids: list[str]):
+    """Удаляет краткие описания фильмов, которых нет ни в одном жанре"""
+    genre_ids = [
+        genre_id.decode() for genre_id in redis.hkeys(GENRE_STUBS_KEY)
+    ]
+    with redis.pipeline(transaction=False) as pipe:
+        for genre_id in genre_ids:
+            pipe.zmscore(GENRE_FILMS_KEY.format(genre_id=genre_id), film_ids)
+        scores = pipe.execute()
+    orphans = [
+        film_id
+        for position, film_id in enumerate(film_ids)
+        if all(genre_scores[position] is None for genre_scores in scores)
+    ]
+    if orphans:
+        redis.hdel(FILM_STUBS_KEY, *orphans)
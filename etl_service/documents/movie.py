@@ -3,6 +3,8 @@ from typing import Generator
 
 import psycopg
 from elasticsearch_dsl import (
+    Completion,
+    Date,
     Document,
     Float,
     InnerDoc,
@@ -12,9 +14,10 @@ from elasticsearch_dsl import (
     Text,
 )
 from psycopg import ServerCursor
-from psycopg.conninfo import make_conninfo
 from psycopg.rows import class_row
 
+from helpers.suggest import completion_input
+
 
 class Director(InnerDoc):
     id = Keyword()
@@ -58,8 +61,11 @@ class GenresCommon(InnerDoc):
 class Movie(Document):
     id = Keyword()
     imdb_rating = Float()
+    creation_date = Date()
     genres = Nested(GenresCommon)
     title = Text(analyzer="ru_en", fields={"raw": Keyword()})
+    # Подсказки при наборе названия, вес - рейтинг
+    title_suggest = Completion()
     description = Text(analyzer="ru_en")
     directors_names = Text(analyzer="ru_en")
     actors_names = Text(analyzer="ru_en")
@@ -74,6 +80,12 @@ class Movie(Document):
         name = "movies"
         settings = {
             "refresh_interval": "1s",
+            # Сегменты упорядочены так же, как список фильмов по умолчанию:
+            # запросы с той же сортировкой останавливаются после первых
+            # size документов сегмента. Задаётся только при создании индекса
+            "sort.field": "imdb_rating",
+            "sort.order": "desc",
+            "sort.missing": "_last",
             "analysis": {
                 "filter": {
                     "english_stop": {"type": "stop", "stopwords": "_english_"},
@@ -112,13 +124,13 @@ class Movie(Document):
 
 
 def get_movie_index_data(
-    database_settings: dict, last_sync_state: datetime, batch_size: int = 100
+    conn: psycopg.Connection,
+    checkpoint: tuple[datetime, str],
+    batch_size: int = 100,
 ) -> Generator[list[Movie], None, None]:
-    dsn = make_conninfo(**database_settings)
-
     with (
-        psycopg.connect(dsn, row_factory=class_row(Movie)) as conn,
-        ServerCursor(conn, "fetcher") as cursor,
+        conn.transaction(),
+        ServerCursor(conn, "fetcher", row_factory=class_row(Movie)) as cursor,
     ):
         raw_sql = """
         SELECT
@@ -126,6 +138,7 @@ def get_movie_index_data(
         fw.title,
         fw.description,
         fw.rating as imdb_rating,
+        fw.creation_date,
         COALESCE (json_agg(
             DISTINCT jsonb_build_object(
                 'uuid', g.id,
@@ -172,10 +185,16 @@ def get_movie_index_data(
         LEFT JOIN content.genre g ON g.id = gfw.genre_id
         cross join lateral (values (fw.modified), (pfw.created), (p.modified), (gfw.created), (g.modified)) v(last_change_date)
         GROUP BY fw.id
-        having max(v.last_change_date) > %s
-        ORDER BY fw.modified
+        -- Позиция (last_change_date, id): загрузка продолжается
+        -- со строки, следующей за последней загруженной
+        having (max(v.last_change_date), fw.id) > (%s, %s)
+        ORDER BY max(v.last_change_date), fw.id
         """
 
-        cursor.execute(raw_sql, (last_sync_state,))
+        cursor.execute(raw_sql, checkpoint)
         while results := cursor.fetchmany(size=batch_size):
+            for movie in results:
+                movie.title_suggest = completion_input(
+                    movie.title, (movie.imdb_rating or 0) * 10
+                )
             yield results
@@ -3,6 +3,7 @@ from typing import Generator
 
 import psycopg
 from elasticsearch_dsl import (
+    Completion,
     Document,
     Float,
     InnerDoc,
@@ -12,9 +13,10 @@ from elasticsearch_dsl import (
     Text,
 )
 from psycopg import ServerCursor
-from psycopg.conninfo import make_conninfo
 from psycopg.rows import class_row
 
+from helpers.suggest import completion_input
+
 
 class FilmCommon(InnerDoc):
     id = Keyword()
@@ -29,6 +31,8 @@ class FilmCommon(InnerDoc):
 class Person(Document):
     id = Keyword()
     full_name = Text(analyzer="ru_en", fields={"raw": Keyword()})
+    # Подсказки при наборе имени, вес - число фильмов
+    full_name_suggest = Completion()
     films = Nested(FilmCommon)
     last_change_date = Keyword(index=False)
 
@@ -74,13 +78,13 @@ class Person(Document):
 
 
 def get_person_index_data(
-    database_settings: dict, last_sync_state: datetime, batch_size: int = 100
+    conn: psycopg.Connection,
+    checkpoint: tuple[datetime, str],
+    batch_size: int = 100,
 ) -> Generator[list[Person], None, None]:
-    dsn = make_conninfo(**database_settings)
-
     with (
-        psycopg.connect(dsn, row_factory=class_row(Person)) as conn,
-        ServerCursor(conn, "fetcher") as cursor,
+        conn.transaction(),
+        ServerCursor(conn, "fetcher", row_factory=class_row(Person)) as cursor,
     ):
         raw_sql = """
         WITH film_roles AS (
@@ -118,10 +122,14 @@ def get_person_index_data(
                 (fr.film_modified)
         ) v(last_change_date)
         GROUP BY p.id
-        having max(v.last_change_date) > %s
-        ORDER BY p.full_name
+        having (max(v.last_change_date), p.id) > (%s, %s)
+        ORDER BY max(v.last_change_date), p.id
         """
 
-        cursor.execute(raw_sql, (last_sync_state,))
+        cursor.execute(raw_sql, checkpoint)
         while results := cursor.fetchmany(size=batch_size):
+            for person in results:
+                person.full_name_suggest = completion_input(
+                    person.full_name, len(person.films or [])
+                )
             yield results
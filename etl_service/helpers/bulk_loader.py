@@ -0,0 +1,184 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from logging import Logger
+from typing import Any, Callable, Iterable
+
+from elasticsearch import Elasticsearch, TransportError
+from elasticsearch.helpers import streaming_bulk
+from elasticsearch_dsl import Document
+
+from settings import BulkSettings
+
+# Временные отказы: документы отправляются ещё раз
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+
+class BulkLoadError(Exception):
+    """Документы не загружены и после всех повторов"""
+
+
+class LoaderStats:
+    """Счётчики загрузки в индекс с момента создания загрузчика"""
+
+    def __init__(self, index: str):
+        self.index = index
+        self.loaded = 0
+        self.retried = 0
+        self.rejected = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, loaded: int = 0, retried: int = 0, rejected: int = 0):
+        with self._lock:
+            self.loaded += loaded
+            self.retried += retried
+            self.rejected += rejected
+
+    def metrics(self) -> dict[str, Any]:
+        elapsed = time.monotonic() - self.started
+        return {
+            "index": self.index,
+            "loaded": self.loaded,
+            "retried": self.retried,
+            "rejected": self.rejected,
+            "elapsed_s": round(elapsed, 1),
+            "docs_per_s": round(self.loaded / elapsed, 1) if elapsed else 0,
+        }
+
+
+class BulkLoader:
+    """Параллельная загрузка пачек экстрактора в индекс.
+
+    Каждая пачка отправляется в своём потоке через streaming_bulk,
+    который делит её на запросы по chunk_size документов и не больше
+    max_chunk_bytes байт. Одновременно загружается не больше workers
+    пачек: следующую пачку экстрактор отдаёт, только когда загрузилась
+    самая старая. Загруженные пачки передаются в on_loaded в порядке
+    экстрактора, поэтому позиция конвейера не обгоняет незагруженные
+    строки.
+
+    Повторно отправляются только документы с временным отказом (429,
+    5xx, обрыв соединения) с экспоненциальной паузой. Документы,
+    отклонённые окончательно, например не подходящие под маппинг,
+    пишутся в лог и учитываются в rejected.
+    """
+
+    def __init__(
+        self,
+        client: Elasticsearch,
+        index: str,
+        bulk_settings: BulkSettings,
+        logger: Logger,
+    ):
+        self.client = client
+        self.index = index
+        self.settings = bulk_settings
+        self.logger = logger
+        self.stats = LoaderStats(index)
+        self._reported = time.monotonic()
+
+    def load(
+        self,
+        batches: Iterable[list[Document]],
+        on_loaded: Callable[[list[Document]], None],
+    ) -> None:
+        in_flight: deque[tuple[list[Document], Future]] = deque()
+        with ThreadPoolExecutor(
+            max_workers=self.settings.workers,
+            thread_name_prefix=f"bulk-{self.index}",
+        ) as executor:
+            for rows in batches:
+                if len(in_flight) >= self.settings.workers:
+                    self._complete(*in_flight.popleft(), on_loaded)
+                in_flight.append((rows, executor.submit(self._send, rows)))
+            while in_flight:
+                self._complete(*in_flight.popleft(), on_loaded)
+
+    def report(self) -> None:
+        metrics = self.stats.metrics()
+        self.logger.info(
+            f"{self.index}: loaded {metrics['loaded']} documents "
+            f"in {metrics['elapsed_s']} s ({metrics['docs_per_s']} docs/s), "
+            f"retried {metrics['retried']}, rejected {metrics['rejected']}"
+        )
+        self._reported = time.monotonic()
+
+    def _complete(
+        self,
+        rows: list[Document],
+        future: Future,
+        on_loaded: Callable[[list[Document]], None],
+    ) -> None:
+        future.result()
+        on_loaded(rows)
+        if time.monotonic() - self._reported > self.settings.report_interval:
+            self.report()
+
+    def _send(self, rows: list[Document]) -> None:
+        pending = {
+            str(row.id): dict(
+                row.to_dict(True, skip_empty=False), _id=str(row.id)
+            )
+            for row in rows
+        }
+        attempt = 0
+        while pending := self._send_once(pending):
+            if attempt >= self.settings.max_retries:
+                raise BulkLoadError(
+                    f"{len(pending)} documents were not loaded into "
+                    f"{self.index} after {attempt} retries"
+                )
+            delay = min(
+                self.settings.initial_backoff * 2**attempt,
+                self.settings.max_backoff,
+            )
+            attempt += 1
+            self.stats.add(retried=len(pending))
+            self.logger.warning(
+                f"{len(pending)} documents were not loaded into "
+                f"{self.index}. Retrying in {delay} seconds"
+            )
+            time.sleep(delay)
+
+    def _send_once(self, pending: dict[str, dict]) -> dict[str, dict]:
+        """Отправляет документы и возвращает те, что стоит повторить"""
+        failed = {}
+        answered = set()
+        loaded = rejected = 0
+        try:
+            for ok, item in streaming_bulk(
+                self.client,
+                pending.values(),
+                chunk_size=self.settings.chunk_size,
+                max_chunk_bytes=self.settings.max_chunk_bytes,
+                raise_on_error=False,
+                raise_on_exception=False,
+                # Повторы делает загрузчик: streaming_bulk повторил бы
+                # только 429 и без учёта в статистике
+                max_retries=0,
+            ):
+                _, info = item.popitem()
+                doc_id = info["_id"]
+                answered.add(doc_id)
+                if ok:
+                    loaded += 1
+                elif info.get("status") in RETRYABLE_STATUSES:
+                    failed[doc_id] = pending[doc_id]
+                else:
+                    rejected += 1
+                    self.logger.error(
+                        f"Document {doc_id} rejected by {self.index}: "
+                        f"{info.get('error')}"
+                    )
+        except TransportError as e:
+            # Обрыв соединения: повторяются все документы без ответа
+            self.logger.warning(f"Bulk request to {self.index} failed: {e}")
+            failed.update(
+                (doc_id, action)
+                for doc_id, action in pending.items()
+                if doc_id not in answered
+            )
+        self.stats.add(loaded=loaded, rejected=rejected)
+        return failed
@@ -0,0 +1,30 @@
+import json
+
+from redis import Redis
+
+# Поток изменённых документов, который читает theatre_service
+CHANGES_STREAM = "etl:changes"
+# Приблизительная длина потока: читатели отстают не более чем на минуты
+CHANGES_STREAM_MAXLEN = 10000
+# Поколение ключей страниц списков индекса в кэше theatre_service
+GENERATION_KEY = "cache_generation:{namespace}"
+
+
+def publish_changes(redis: Redis, index: str, rows: list):
+    """Публикует идентификаторы документов пачки, загруженной в индекс.
+
+    Увеличение поколения разом инвалидирует все страницы списков
+    индекса в кэше theatre_service.
+    """
+    with redis.pipeline(transaction=True) as pipe:
+        pipe.incr(GENERATION_KEY.format(namespace=index))
+        pipe.xadd(
+            CHANGES_STREAM,
+            {
+                "index": index,
+                "ids": json.dumps([str(row.id) for row in rows]),
+            },
+            maxlen=CHANGES_STREAM_MAXLEN,
+            approximate=True,
+        )
+        pipe.execute()
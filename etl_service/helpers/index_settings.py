@@ -0,0 +1,143 @@
+import time
+from logging import Logger
+
+from elasticsearch import Elasticsearch
+from elasticsearch_dsl import Document
+
+# Статические настройки: у существующего индекса их не изменить
+STATIC_SETTINGS = ("sort.field", "sort.order", "sort.missing")
+
+# Имя версии индекса: theatre_service читает индекс по алиасу без версии
+INDEX_VERSION = "{alias}_v{version}"
+# Как часто проверяется задача переиндексации, секунды
+REINDEX_POLL_INTERVAL = 5
+
+
+class ReindexError(Exception):
+    """Переиндексация в новую версию индекса не удалась"""
+
+
+def _as_list(value) -> list[str]:
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+def index_needs_recreation(document: type[Document]) -> bool:
+    """Индекс существует, но его статические настройки отличаются
+    от описания документа"""
+    index = document._index
+    if not index.exists():
+        return False
+
+    wanted = index.to_dict().get("settings", {})
+    # Ответ приходит по имени версии, на которую указывает алиас
+    (current,) = index.get_settings().values()
+    current = current["settings"]["index"]
+    for name in STATIC_SETTINGS:
+        section, key = name.split(".")
+        if _as_list(wanted.get(name)) != _as_list(
+            current.get(section, {}).get(key)
+        ):
+            return True
+    return False
+
+
+def _aliased_indexes(client: Elasticsearch, alias: str) -> list[str]:
+    """Версии, на которые указывает алиас; пусто, если алиаса нет
+    или под этим именем лежит индекс без версии"""
+    if not client.indices.exists_alias(name=alias):
+        return []
+    return list(client.indices.get_alias(name=alias))
+
+
+def _create_version(document: type[Document]) -> str:
+    alias = document._index._name
+    name = INDEX_VERSION.format(
+        alias=alias, version=time.strftime("%Y%m%d%H%M%S", time.gmtime())
+    )
+    document._index.clone(name).create()
+    return name
+
+
+def _drop_unused_versions(
+    client: Elasticsearch, alias: str, live: list[str]
+) -> None:
+    """Удаляет версии, которые не читаются: недостроенные после
+    падения и выведенные из работы прошлой переиндексацией"""
+    versions = client.indices.get(
+        index=INDEX_VERSION.format(alias=alias, version="*")
+    )
+    for name in versions:
+        if name not in live:
+            client.indices.delete(index=name)
+
+
+def _reindex(client: Elasticsearch, source: str, dest: str) -> None:
+    task = client.reindex(
+        source={"index": source},
+        dest={"index": dest},
+        refresh=True,
+        wait_for_completion=False,
+    )["task"]
+    while not (status := client.tasks.get(task_id=task))["completed"]:
+        time.sleep(REINDEX_POLL_INTERVAL)
+
+    failures = status.get("error") or status.get("response", {}).get(
+        "failures"
+    )
+    if failures:
+        raise ReindexError(f"Reindex {source} -> {dest} failed: {failures}")
+
+
+def ensure_index(
+    client: Elasticsearch, document: type[Document], logger: Logger
+) -> None:
+    """Готовит версию индекса за алиасом с именем индекса документа.
+
+    Если статические настройки изменились, документы переиндексируются
+    в новую версию, и алиас переключается на неё одной атомарной
+    операцией. Индекс, который читает theatre_service, до переключения
+    не изменяется и не удаляется; выведенная версия остаётся до
+    следующей переиндексации, чтобы не оборвать открытые point in time.
+    Позиция конвейера не сбрасывается: пока идёт переиндексация,
+    конвейер в индекс не пишет.
+    """
+    alias = document._index._name
+    if not document._index.exists():
+        client.indices.update_aliases(
+            actions=[
+                {"add": {"index": _create_version(document), "alias": alias}}
+            ]
+        )
+        return
+    if not index_needs_recreation(document):
+        # Новые поля документа добавляются в маппинг всех версий за
+        # алиасом. Document.init() здесь не подходит: он ищет настройки
+        # по имени алиаса и пытается изменить статические настройки
+        client.indices.put_mapping(
+            index=alias, **document._index.to_dict()["mappings"]
+        )
+        return
+
+    live = _aliased_indexes(client, alias)
+    _drop_unused_versions(client, alias, live)
+    version = _create_version(document)
+    logger.warning(f"Reindexing {alias} into {version}")
+    try:
+        _reindex(client, alias, version)
+    except Exception:
+        client.indices.delete(index=version)
+        raise
+
+    actions = [{"add": {"index": version, "alias": alias}}]
+    if live:
+        actions.extend(
+            {"remove": {"index": name, "alias": alias}} for name in live
+        )
+    else:
+        # Индекс без версии, созданный до перехода на алиасы: алиас
+        # с тем же именем появляется в той же операции, что и удаление
+        actions.append({"remove_index": {"index": alias}})
+    client.indices.update_aliases(actions=actions)
+    logger.warning(f"Alias {alias} switched to {version}")
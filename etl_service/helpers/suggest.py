@@ -0,0 +1,18 @@
+from typing import Optional
+
+# Completion-поле не принимает входы длиннее max_input_length
+MAX_INPUT_LENGTH = 50
+
+
+def completion_input(text: Optional[str], weight: float) -> dict:
+    """Входы completion-поля для подсказок theatre_service.
+
+    Completion-поле ищет только по началу входа, поэтому кроме строки
+    целиком добавляется каждый её хвост, начиная с очередного слова:
+    «The Matrix» находится и по «the», и по «mat».
+    """
+    words = (text or "").split()
+    inputs = [
+        " ".join(words[i:])[:MAX_INPUT_LENGTH] for i in range(len(words))
+    ]
+    return {"input": inputs, "weight": max(int(round(weight)), 0)}
@@ -1,4 +1,5 @@
 import logging
+import multiprocessing
 import os
 import sys
 from logging.handlers import RotatingFileHandler
@@ -22,9 +23,17 @@ def create_directory(path):
 
 create_directory('./logs')
 
+# Процессы конвейеров пишут каждый в свой файл: общий файл они бы
+# перетирали при старте и ротировали одновременно
+process_name = multiprocessing.current_process().name
+if process_name == 'MainProcess':
+    log_file = './logs/log.txt'
+else:
+    log_file = f'./logs/{process_name}.txt'
+
 handlers = [
     RotatingFileHandler(
-        filename='./logs/log.txt',
+        filename=log_file,
         mode='w',
         maxBytes=512000,
         backupCount=4,
@@ -36,7 +45,10 @@ handlers = [
 logging.basicConfig(
     handlers=handlers,
     level=log_level,
-    format='%(asctime)s - %(levelname)s - %(name)s: %(message)s',
+    format=(
+        '%(asctime)s - %(levelname)s - %(processName)s - '
+        '%(name)s: %(message)s'
+    ),
     datefmt='%Y-%m-%dT%H:%M:%S%z',
 )
 
@@ -1,16 +1,24 @@
+import argparse
+import multiprocessing
+import signal
+import sys
 import time
-from datetime import datetime
-from typing import Generator, Any
+from contextlib import closing
+from functools import partial
+from typing import Callable, Generator, Optional, Sequence
 
-import pytz
-from dateutil import parser
-from elasticsearch.helpers import bulk
+import psycopg
 from elasticsearch_dsl import connections, Document
+from psycopg.conninfo import make_conninfo
+from redis import Redis
 import sentry_sdk
 from documents.movie import Movie, get_movie_index_data
-from documents.genre import Genre, get_genre_index_data
+from documents.genre import Genre, get_genre_index_data, sync_genre_films
 from documents.person import Person, get_person_index_data
 from helpers.backoff_func_wrapper import backoff
+from helpers.bulk_loader import BulkLoader
+from helpers.change_events import publish_changes
+from helpers.index_settings import ensure_index
 from logger import logger
 from settings import settings
 from state_manager.json_file_storage import JsonFileStorage
@@ -18,75 +26,209 @@ from state_manager.state_manager import StateManager
 
 sentry_sdk.init(dsn=settings.sentry_dsn_etl)
 
+# До разделения конвейеров состояние всех индексов хранилось в одном файле
+LEGACY_STATE_FILE = "./storage/state_storage.json"
+STATE_FILE = "./storage/{name}_state.json"
+# Отметка в файле конвейера: состояние из общего файла уже перенесено
+LEGACY_STATE_MIGRATED = "legacy_state_migrated"
 
-@backoff(0.1, 2, 10, logger)
-def _send_to_es(es_load_data: Generator[dict[str, Any], Any, None]):
-    bulk(
-        connections.get_connection(),
-        es_load_data,
-    )
+# Каждый индекс синхронизируется своим конвейером: в отдельном процессе,
+# по своему расписанию, со своими соединениями и файлом состояния
+PIPELINES = {
+    "persons": {
+        "document": Person,
+        "get_index_data": get_person_index_data,
+        "state": "person_index_last_sync_state",
+        "interval": settings.pipeline_settings.persons_interval,
+        "after_load": lambda redis: [
+            partial(publish_changes, redis, "persons"),
+        ],
+    },
+    "genres": {
+        "document": Genre,
+        "get_index_data": get_genre_index_data,
+        "state": "genre_index_last_sync_state",
+        "interval": settings.pipeline_settings.genres_interval,
+        "after_load": lambda redis: [
+            # Отсортированные множества фильмов жанров в Redis
+            partial(sync_genre_films, redis),
+            partial(publish_changes, redis, "genres"),
+        ],
+    },
+    "movies": {
+        "document": Movie,
+        "get_index_data": get_movie_index_data,
+        "state": "movie_index_last_sync_state",
+        "interval": settings.pipeline_settings.movies_interval,
+        "after_load": lambda redis: [
+            partial(publish_changes, redis, "movies"),
+        ],
+    },
+}
 
 
-def update_index(document: Document, get_index_data: Generator, state: str):
-    state_manager = StateManager(JsonFileStorage(logger=logger))
+def update_index(
+    document: Document,
+    get_index_data: Generator,
+    state: str,
+    state_manager: StateManager,
+    conn: psycopg.Connection,
+    after_load: Sequence[Callable[[list], None]] = (),
+):
+    client = connections.get_connection()
+    # Например, изменилась сортировка индекса: документы переносятся
+    # в новую версию индекса за алиасом, который читает theatre_service
+    ensure_index(client, document, logger)
 
-    last_sync_state = state_manager.get_state(state)
+    def on_loaded(rows: list):
+        for callback in after_load:
+            backoff(0.1, 2, 10, logger)(callback)(rows)
 
-    if last_sync_state is None:
-        last_sync_state = pytz.UTC.localize(datetime.min)
-    else:
-        last_sync_state = parser.isoparse(last_sync_state)
+        # Строки упорядочены по (last_change_date, id): после перезапуска
+        # загрузка продолжится со строки, следующей за последней в пачке
+        state_manager.set_checkpoint(
+            state, rows[-1].last_change_date, rows[-1].id
+        )
 
-    connections.create_connection(
-        hosts=settings.elasticsearch_settings.get_host()
+    loader = BulkLoader(
+        client,
+        document._index._name,
+        settings.bulk_settings,
+        logger,
     )
-    document.init()
-
-    for rows in get_index_data(
-        settings.database_settings.get_dsn(), last_sync_state, 100
-    ):
-        es_load_data = (
-            dict(d.to_dict(True, skip_empty=False), **{"_id": d.id})
-            for d in rows
+    # closing: при ошибке загрузки курсор и транзакция экстрактора
+    # закрываются сразу, а не при сборке мусора
+    with closing(
+        get_index_data(
+            conn,
+            state_manager.get_checkpoint(state),
+            settings.bulk_settings.chunk_size,
         )
+    ) as batches:
+        try:
+            loader.load(batches, on_loaded)
+        finally:
+            if loader.stats.loaded or loader.stats.rejected:
+                loader.report()
 
-        _send_to_es(es_load_data)
 
-        last_change_date = pytz.UTC.localize(
-            max(item.last_change_date for item in rows)
-        )
-        if last_change_date > last_sync_state:
-            last_sync_state = last_change_date
+def get_state_manager(name: str, state: str) -> StateManager:
+    """Состояние конвейера в собственном файле.
+
+    Процессы конвейеров не перезаписывают состояние друг друга.
+    Состояние из общего файла переносится один раз: отметка о переносе
+    хранится в файле конвейера, и позиция, сброшенная позже, из общего
+    файла уже не восстанавливается.
+    """
+    state_manager = StateManager(
+        JsonFileStorage(logger=logger, file_path=STATE_FILE.format(name=name))
+    )
+    if state_manager.get_state(LEGACY_STATE_MIGRATED) is None:
+        if state_manager.get_state(state) is None:
+            legacy_state = StateManager(
+                JsonFileStorage(logger=logger, file_path=LEGACY_STATE_FILE)
+            ).get_state(state)
+            if legacy_state is not None:
+                state_manager.set_state(state, legacy_state)
+        state_manager.set_state(LEGACY_STATE_MIGRATED, True)
+    return state_manager
+
 
-    state_manager.set_state(state, last_sync_state.isoformat())
+def connect_database(
+    conn: Optional[psycopg.Connection],
+) -> psycopg.Connection:
+    """Соединение с Postgres переиспользуется между запусками конвейера
+    и пересоздаётся, только если закрыто или разорвано"""
+    if conn is not None and not conn.closed and not conn.broken:
+        return conn
+    if conn is not None:
+        conn.close()
+    return psycopg.connect(
+        make_conninfo(**settings.database_settings.get_dsn())
+    )
 
 
-if __name__ == "__main__":
-    data = [
-        {
-            "document": Person,
-            "get_index_data": get_person_index_data,
-            "state": "person_index_last_sync_state",
-        },
-        {
-            "document": Genre,
-            "get_index_data": get_genre_index_data,
-            "state": "genre_index_last_sync_state",
-        },
-        {
-            "document": Movie,
-            "get_index_data": get_movie_index_data,
-            "state": "movie_index_last_sync_state",
-        },
-    ]
+def run_pipeline(name: str):
+    """Бесконечный цикл синхронизации одного индекса"""
+    pipeline = PIPELINES[name]
+    state_manager = get_state_manager(name, pipeline["state"])
+    connections.create_connection(
+        hosts=settings.elasticsearch_settings.get_host()
+    )
+    redis = Redis(
+        host=settings.redis_settings.host, port=settings.redis_settings.port
+    )
+    after_load = pipeline["after_load"](redis)
+    conn = None
     while True:
+        started = time.monotonic()
         try:
-            for item in data:
-                update_index(
-                    document=item["document"],
-                    get_index_data=item["get_index_data"],
-                    state=item["state"],
-                )
-            time.sleep(60)
+            conn = connect_database(conn)
+            update_index(
+                document=pipeline["document"],
+                get_index_data=pipeline["get_index_data"],
+                state=pipeline["state"],
+                state_manager=state_manager,
+                conn=conn,
+                after_load=after_load,
+            )
         except Exception as e:
             logger.exception(e)
+        # Интервал отсчитывается от начала запуска: долгая синхронизация
+        # не сдвигает расписание, а отставший конвейер начинает сразу
+        elapsed = time.monotonic() - started
+        time.sleep(max(pipeline["interval"] - elapsed, 0))
+
+
+def supervise(names: Sequence[str]):
+    """Запускает конвейеры в отдельных процессах и перезапускает упавшие"""
+    # spawn: дочерний процесс сам инициализирует sentry, логгер
+    # и соединения, а не наследует их потоки и сокеты
+    context = multiprocessing.get_context("spawn")
+    processes = {}
+
+    def start(name: str):
+        process = context.Process(
+            target=run_pipeline, args=(name,), name=f"etl-{name}", daemon=True
+        )
+        process.start()
+        processes[name] = process
+
+    for name in names:
+        start(name)
+    while True:
+        time.sleep(settings.pipeline_settings.supervise_interval)
+        for name, process in list(processes.items()):
+            if not process.is_alive():
+                logger.error(
+                    f"Pipeline {name} exited with code {process.exitcode}, "
+                    "restarting"
+                )
+                start(name)
+
+
+def parse_args() -> argparse.Namespace:
+    arg_parser = argparse.ArgumentParser(
+        description="Синхронизация индексов Elasticsearch с Postgres"
+    )
+    arg_parser.add_argument(
+        "--index",
+        dest="indexes",
+        action="append",
+        choices=list(PIPELINES),
+        help="синхронизировать только этот индекс, можно указать несколько",
+    )
+    return arg_parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    indexes = list(dict.fromkeys(args.indexes or PIPELINES))
+    if len(indexes) == 1:
+        # Один индекс синхронизируется в текущем процессе
+        run_pipeline(indexes[0])
+    else:
+        # docker stop присылает SIGTERM: выход через SystemExit
+        # завершает и процессы конвейеров
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        supervise(indexes)
@@ -23,10 +23,50 @@ class ElasticsearchSettings(BaseSettings):
         return f'http://{self.host}:{self.port}'
 
 
+class RedisSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix='redis_')
+    host: str = ...
+    port: int = 6379
+
+
+class PipelineSettings(BaseSettings):
+    """Расписание конвейеров индексов: интервалы между запусками, секунды."""
+
+    model_config = SettingsConfigDict(env_prefix='etl_')
+    persons_interval: float = 60
+    genres_interval: float = 60
+    movies_interval: float = 60
+    # Как часто основной процесс проверяет, живы ли процессы конвейеров
+    supervise_interval: float = 5
+
+
+class BulkSettings(BaseSettings):
+    """Загрузка в Elasticsearch.
+
+    chunk_size - документов в пачке экстрактора и в запросе bulk,
+    max_chunk_bytes - предел размера запроса, workers - пачек,
+    загружаемых одновременно.
+    """
+
+    model_config = SettingsConfigDict(env_prefix='etl_bulk_')
+    chunk_size: int = 500
+    max_chunk_bytes: int = 10 * 1024 * 1024
+    workers: int = 4
+    # Повторы документов с временным отказом, паузы растут вдвое
+    max_retries: int = 8
+    initial_backoff: float = 0.5
+    max_backoff: float = 30
+    # Как часто долгий запуск пишет в лог скорость загрузки, секунды
+    report_interval: float = 30
+
+
 class Settings(BaseSettings):
     debug: bool = Field(...)
     database_settings: DatabaseSettings = DatabaseSettings()
     elasticsearch_settings: ElasticsearchSettings = ElasticsearchSettings()
+    redis_settings: RedisSettings = RedisSettings()
+    pipeline_settings: PipelineSettings = PipelineSettings()
+    bulk_settings: BulkSettings = BulkSettings()
     sentry_dsn_etl: str = Field(..., alias="SENTRY_DSN_ETL")
 
 
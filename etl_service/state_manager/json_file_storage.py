@@ -35,8 +35,12 @@ class JsonFileStorage(BaseStorage):
         """Сохранить состояние в хранилище."""
         lock = FileLock(f'{self._file_path}.lock')
         with lock:
-            with open(file=self._file_path, mode='w', encoding='utf-8') as json_storage:
+            # Состояние сохраняется после каждой пачки: файл подменяется
+            # целиком, чтобы падение во время записи не обнулило его
+            tmp_path = f'{self._file_path}.tmp'
+            with open(file=tmp_path, mode='w', encoding='utf-8') as json_storage:
                 json.dump(state, json_storage)
+            os.replace(tmp_path, self._file_path)
 
     def retrieve_state(self) -> dict[str, Any]:
         """Получить состояние из хранилища."""
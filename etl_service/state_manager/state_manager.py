@@ -1,7 +1,20 @@
+from datetime import datetime
 from typing import Any
 
+import pytz
+from dateutil import parser
+
 from state_manager.base_storage import BaseStorage
 
+# Позиция конвейера: (last_change_date, id) последней загруженной строки
+Checkpoint = tuple[datetime, str]
+
+# Позиция до первой строки: индекс заполняется с начала
+INITIAL_CHECKPOINT: Checkpoint = (
+    pytz.UTC.localize(datetime.min),
+    "00000000-0000-0000-0000-000000000000",
+)
+
 
 class StateManager:
 
@@ -19,3 +32,26 @@ class StateManager:
         if self.state.__contains__(key):
             return self.state[key]
         return None
+
+    def set_checkpoint(
+        self, key: str, last_change_date: datetime, last_id: Any
+    ) -> None:
+        if last_change_date.tzinfo is None:
+            last_change_date = pytz.UTC.localize(last_change_date)
+        self.set_state(
+            key,
+            {
+                "last_change_date": last_change_date.isoformat(),
+                "id": str(last_id),
+            },
+        )
+
+    def get_checkpoint(self, key: str) -> Checkpoint:
+        value = self.get_state(key)
+        if value is None:
+            return INITIAL_CHECKPOINT
+        if isinstance(value, str):
+            # Прежний формат - только дата: строки с этой датой
+            # загрузятся ещё раз
+            return parser.isoparse(value), INITIAL_CHECKPOINT[1]
+        return parser.isoparse(value["last_change_date"]), value["id"]
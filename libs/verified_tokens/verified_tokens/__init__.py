@@ -0,0 +1,70 @@
+import copy
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+class VerifiedTokenCache:
+    """
+    LRU-кэш содержимого токенов, уже прошедших проверку подписи.
+    Один и тот же токен приходит с каждым запросом пользователя,
+    поэтому повторная проверка сводится к поиску в словаре.
+    Ключ - хэш токена, запись живёт до момента exp из токена.
+    Токены без exp не запоминаются.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        # хэш токена -> (содержимое токена, exp)
+        self._entries: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        payload, expire_at = entry
+        if expire_at <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        # Полная копия: в токене бывают вложенные списки (например,
+        # roles), и обработчик запроса не должен изменить общую запись
+        return copy.deepcopy(payload)
+
+    def set(self, token: str, payload: dict) -> None:
+        expire_at = payload.get("exp")
+        if not isinstance(expire_at, (int, float)):
+            return
+        if expire_at <= time.time():
+            return
+
+        key = self._key(token)
+        self._entries[key] = (copy.deepcopy(payload), expire_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def metrics(self) -> dict[str, Any]:
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "entries": len(self._entries),
+            "evictions": self.evictions,
+        }
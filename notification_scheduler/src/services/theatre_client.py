@@ -17,8 +17,8 @@ class TheatreClient:
     """
 
     def __init__(self):
-        self.base_url = settings.ugc_crud_host
-        self.secret_key = settings.NOTIFICATION_API_SECRET_KEY
+        self.base_url = settings.theatre_host
+        self.secret_key = settings.NOTIFICATION_API_SECRET_KEY.get_secret_value()
 
     async def _get_headers(self) -> Dict[str, str]:
         if not self.secret_key:
@@ -0,0 +1,65 @@
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+
+class Settings(BaseSettings):
+    # ClickHouse configuration
+    clickhouse_nodes: str
+    clickhouse_port: int = 9000
+    clickhouse_user: str = "default"
+    clickhouse_password: str = ""
+    clickhouse_database: str = "shard"
+
+    # MongoDB configuration (база ugc_crud_service)
+    mongo_host: str = Field(..., alias="MONGO_DB_HOST")
+    mongo_port: int = Field(27017, alias="MONGO_DB_PORT")
+    mongo_root_username: str = Field(..., alias="MONGO_ROOT_USERNAME")
+    mongo_root_password: str = Field(..., alias="MONGO_ROOT_PASSWORD")
+    mongo_db_name: str = Field(..., alias="MONGO_DB_NAME")
+
+    # Redis theatre_service, куда публикуется модель
+    redis_host: str = Field(..., alias="REDIS_HOST")
+    redis_port: int = Field(6379, alias="REDIS_PORT")
+    model_key: str = "recommendations:model"
+
+    # Job configuration
+    lookback_days: int = 180
+    top_k: int = 50
+    min_cooccurrence: int = 2
+    viewing_weight: float = 1.0
+    like_weight: float = 2.0
+    bookmark_weight: float = 1.5
+    # Интервал между пересчётами в секундах; 0 - однократный запуск
+    run_interval: int = 6 * 60 * 60
+
+    # Sentry configuration
+    sentry_dsn_recommendations: str = Field(
+        "", alias="SENTRY_DSN_RECOMMENDATIONS"
+    )
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+        extra = "ignore"
+
+    @property
+    def clickhouse_config(self) -> dict:
+        nodes = self.clickhouse_nodes.split(",")
+        return {
+            "host": nodes[0],
+            "alt_hosts": ",".join(nodes[1:]) if len(nodes) > 1 else "",
+            "port": self.clickhouse_port,
+            "user": self.clickhouse_user,
+            "password": self.clickhouse_password,
+            "database": self.clickhouse_database,
+        }
+
+    @property
+    def mongo_uri(self) -> str:
+        return (
+            f"mongodb://{self.mongo_root_username}:{self.mongo_root_password}"
+            f"@{self.mongo_host}:{self.mongo_port}"
+        )
+
+
+settings = Settings()
@@ -0,0 +1,78 @@
+import itertools
+import logging
+import signal
+import sys
+import time
+
+from clickhouse_driver import Client
+from pymongo import MongoClient
+from redis import Redis
+import sentry_sdk
+
+from config import settings
+from logging_config import setup_logging
+from model import build_model
+from sources import ReactionsSource, ViewingsSource
+from storage import publish_model
+
+sentry_sdk.init(dsn=settings.sentry_dsn_recommendations)
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def shutdown_handler(signum, frame):
+    logger.info("Shutting down...")
+    sys.exit(0)
+
+
+def run_once(ch_client: Client, mongo_client: MongoClient, redis: Redis):
+    viewings = ViewingsSource(
+        ch_client,
+        lookback_days=settings.lookback_days,
+        weight=settings.viewing_weight,
+    )
+    reactions = ReactionsSource(
+        mongo_client[settings.mongo_db_name],
+        like_weight=settings.like_weight,
+        bookmark_weight=settings.bookmark_weight,
+    )
+
+    started = time.monotonic()
+    model = build_model(
+        itertools.chain(viewings.fetch(), reactions.fetch()),
+        top_k=settings.top_k,
+        min_cooccurrence=settings.min_cooccurrence,
+    )
+    publish_model(redis, settings.model_key, model.dumps())
+    logger.info(
+        f"Model built in {time.monotonic() - started:.1f}s: "
+        f"{len(model.items)} items, {len(model.users)} users, "
+        f"{model.neighbours.nnz} neighbour pairs"
+    )
+
+
+if __name__ == "__main__":
+    # Обработка SIGTERM для graceful shutdown
+    signal.signal(signal.SIGTERM, shutdown_handler)
+    signal.signal(signal.SIGINT, shutdown_handler)
+
+    logger.info("Starting recommendations job...")
+
+    try:
+        ch_client = Client(**settings.clickhouse_config)
+        # user_id и content_id в ugc_crud_service - UUID в Binary подтипа 4
+        mongo_client = MongoClient(
+            settings.mongo_uri, uuidRepresentation="standard"
+        )
+        redis = Redis(host=settings.redis_host, port=settings.redis_port)
+
+        while True:
+            run_once(ch_client, mongo_client, redis)
+            if not settings.run_interval:
+                break
+            time.sleep(settings.run_interval)
+
+    except Exception as e:
+        logger.critical(f"Fatal error: {e}")
+        sys.exit(1)
@@ -0,0 +1,176 @@
+import io
+import logging
+from typing import Iterable
+
+import numpy as np
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+# Версия формата артефакта: theatre_service отказывается загружать
+# артефакт с незнакомой версией
+ARTIFACT_VERSION = 1
+
+Interaction = tuple[str, str, float]
+
+
+class RecommendationModel:
+    """Разреженная модель item-item рекомендаций.
+
+    neighbours - матрица фильмы x фильмы в формате CSR: в строке фильма
+    хранятся не более top_k ближайших соседей с косинусной мерой
+    совместной встречаемости. history - матрица пользователи x фильмы
+    с весами взаимодействий. popularity - индексы фильмов по убыванию
+    суммарного веса взаимодействий для холодных пользователей.
+    """
+
+    def __init__(
+        self,
+        items: np.ndarray,
+        users: np.ndarray,
+        neighbours: sparse.csr_matrix,
+        history: sparse.csr_matrix,
+        popularity: np.ndarray,
+    ):
+        self.items = items
+        self.users = users
+        self.neighbours = neighbours
+        self.history = history
+        self.popularity = popularity
+
+    def dumps(self) -> bytes:
+        """Сериализация в сжатый npz"""
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            version=np.array(ARTIFACT_VERSION),
+            items=self.items,
+            users=self.users,
+            neighbours_indptr=self.neighbours.indptr,
+            neighbours_indices=self.neighbours.indices,
+            neighbours_data=self.neighbours.data,
+            history_indptr=self.history.indptr,
+            history_indices=self.history.indices,
+            history_data=self.history.data,
+            popularity=self.popularity,
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def loads(cls, payload: bytes) -> "RecommendationModel":
+        data = np.load(io.BytesIO(payload))
+        if int(data["version"]) != ARTIFACT_VERSION:
+            raise ValueError(f"Unknown artifact version {data['version']}")
+
+        items, users = data["items"], data["users"]
+        neighbours = sparse.csr_matrix(
+            (
+                data["neighbours_data"],
+                data["neighbours_indices"],
+                data["neighbours_indptr"],
+            ),
+            shape=(len(items), len(items)),
+        )
+        history = sparse.csr_matrix(
+            (
+                data["history_data"],
+                data["history_indices"],
+                data["history_indptr"],
+            ),
+            shape=(len(users), len(items)),
+        )
+        return cls(items, users, neighbours, history, data["popularity"])
+
+
+def build_interactions_matrix(
+    interactions: Iterable[Interaction],
+) -> tuple[np.ndarray, np.ndarray, sparse.csr_matrix]:
+    """Матрица пользователи x фильмы; веса повторных взаимодействий
+    пользователя с фильмом складываются"""
+    user_positions: dict[str, int] = {}
+    item_positions: dict[str, int] = {}
+    rows, cols, weights = [], [], []
+    for user_id, item_id, weight in interactions:
+        rows.append(user_positions.setdefault(user_id, len(user_positions)))
+        cols.append(item_positions.setdefault(item_id, len(item_positions)))
+        weights.append(weight)
+
+    matrix = sparse.csr_matrix(
+        (
+            np.asarray(weights, dtype=np.float32),
+            (
+                np.asarray(rows, dtype=np.int32),
+                np.asarray(cols, dtype=np.int32),
+            ),
+        ),
+        shape=(len(user_positions), len(item_positions)),
+    )
+    # Повторные пары (пользователь, фильм) суммируются
+    matrix.sum_duplicates()
+    users = np.array(list(user_positions), dtype=str)
+    items = np.array(list(item_positions), dtype=str)
+    return users, items, matrix
+
+
+def keep_top_k(matrix: sparse.csr_matrix, top_k: int) -> sparse.csr_matrix:
+    """Оставляет в каждой строке не более top_k наибольших значений"""
+    indptr = [0]
+    indices, data = [], []
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        row_indices = matrix.indices[start:end]
+        row_data = matrix.data[start:end]
+        if len(row_data) > top_k:
+            best = np.argpartition(-row_data, top_k - 1)[:top_k]
+            row_indices, row_data = row_indices[best], row_data[best]
+        order = np.argsort(-row_data, kind="stable")
+        indices.append(row_indices[order])
+        data.append(row_data[order])
+        indptr.append(indptr[-1] + len(order))
+
+    return sparse.csr_matrix(
+        (
+            np.concatenate(data) if data else np.zeros(0, np.float32),
+            np.concatenate(indices) if indices else np.zeros(0, np.int32),
+            np.asarray(indptr, dtype=np.int32),
+        ),
+        shape=matrix.shape,
+    )
+
+
+def build_model(
+    interactions: Iterable[Interaction],
+    top_k: int,
+    min_cooccurrence: int = 1,
+) -> RecommendationModel:
+    """Считает совместную встречаемость фильмов у одних пользователей.
+
+    Для пар фильмов вычисляется косинусная мера по бинарной матрице
+    взаимодействий; пары, встретившиеся реже min_cooccurrence раз,
+    отбрасываются как шум.
+    """
+    users, items, history = build_interactions_matrix(interactions)
+    logger.info(
+        f"Interactions matrix: {len(users)} users, {len(items)} items, "
+        f"{history.nnz} non-zero"
+    )
+
+    binary = history.copy()
+    binary.data[:] = 1
+    cooccurrence = (binary.T @ binary).tocsr()
+    cooccurrence.setdiag(0)
+    cooccurrence.data[cooccurrence.data < min_cooccurrence] = 0
+    cooccurrence.eliminate_zeros()
+
+    # Косинус: c_ij / sqrt(n_i * n_j), где n_i - число пользователей фильма
+    norms = np.sqrt(np.asarray(binary.sum(axis=0)).ravel())
+    norms[norms == 0] = 1
+    inverse = sparse.diags(1 / norms)
+    similarity = (inverse @ cooccurrence @ inverse).tocsr()
+    similarity.data = similarity.data.astype(np.float32)
+    neighbours = keep_top_k(similarity, top_k)
+
+    popularity = np.argsort(
+        -np.asarray(history.sum(axis=0)).ravel(), kind="stable"
+    ).astype(np.int32)
+    return RecommendationModel(items, users, neighbours, history, popularity)
@@ -0,0 +1,102 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Iterator
+
+from bson import Binary
+from clickhouse_driver import Client
+from pymongo.database import Database
+
+logger = logging.getLogger(__name__)
+
+Interaction = tuple[str, str, float]
+
+
+def uuid_to_str(value) -> str:
+    """Идентификатор документа ugc_crud_service строкой UUID.
+
+    Beanie хранит UUID как Binary подтипа 4. Клиент с
+    uuidRepresentation="standard" сам возвращает uuid.UUID, иначе
+    str() от Binary дал бы байтовую строку вместо UUID.
+    """
+    if isinstance(value, Binary):
+        return str(value.as_uuid())
+    return str(value)
+
+
+class ViewingsSource:
+    """Досмотренные фильмы из ClickHouse (таблица completed_viewings)"""
+
+    def __init__(
+        self,
+        ch_client: Client,
+        lookback_days: int,
+        weight: float,
+        batch_size: int = 100_000,
+    ):
+        self.ch_client = ch_client
+        self.lookback_days = lookback_days
+        self.weight = weight
+        self.batch_size = batch_size
+
+    def fetch(self) -> Iterator[Interaction]:
+        since = datetime.now(timezone.utc) - timedelta(days=self.lookback_days)
+        # Несколько просмотров одного фильма схлопываем на стороне ClickHouse
+        rows = self.ch_client.execute_iter(
+            """
+            SELECT toString(user_id), toString(video_id), count()
+            FROM completed_viewings
+            WHERE event_time >= %(since)s
+            GROUP BY user_id, video_id
+            """,
+            {"since": since},
+            settings={"max_block_size": self.batch_size},
+        )
+        count = 0
+        for user_id, item_id, _ in rows:
+            count += 1
+            yield user_id, item_id, self.weight
+        logger.info(f"Fetched {count} viewing pairs from ClickHouse")
+
+
+class ReactionsSource:
+    """Лайки и закладки из MongoDB сервиса ugc_crud_service"""
+
+    def __init__(
+        self,
+        database: Database,
+        like_weight: float,
+        bookmark_weight: float,
+        batch_size: int = 10_000,
+    ):
+        self.database = database
+        self.like_weight = like_weight
+        self.bookmark_weight = bookmark_weight
+        self.batch_size = batch_size
+
+    def fetch(self) -> Iterator[Interaction]:
+        projection = {"_id": 0, "user_id": 1, "content_id": 1, "rate": 1}
+
+        count = 0
+        for like in self.database["Like"].find(
+            {}, projection, batch_size=self.batch_size
+        ):
+            # Оценка 0..10 масштабирует вес лайка
+            weight = self.like_weight * like.get("rate", 10) / 10
+            if weight > 0:
+                count += 1
+                yield (
+                    uuid_to_str(like["user_id"]),
+                    uuid_to_str(like["content_id"]),
+                    weight,
+                )
+
+        for bookmark in self.database["Bookmark"].find(
+            {}, projection, batch_size=self.batch_size
+        ):
+            count += 1
+            yield (
+                uuid_to_str(bookmark["user_id"]),
+                uuid_to_str(bookmark["content_id"]),
+                self.bookmark_weight,
+            )
+        logger.info(f"Fetched {count} likes and bookmarks from MongoDB")
@@ -0,0 +1,21 @@
+import logging
+import time
+
+from redis import Redis
+
+logger = logging.getLogger(__name__)
+
+
+def publish_model(redis: Redis, key: str, payload: bytes) -> int:
+    """Публикует артефакт модели и его версию одной транзакцией.
+
+    theatre_service опрашивает только ключ версии и перечитывает
+    артефакт, когда версия меняется.
+    """
+    version = int(time.time())
+    with redis.pipeline(transaction=True) as pipe:
+        pipe.set(key, payload)
+        pipe.set(f"{key}:version", version)
+        pipe.execute()
+    logger.info(f"Published model {key} v{version}: {len(payload)} bytes")
+    return version
@@ -0,0 +1,79 @@
+import random
+from unittest.mock import MagicMock, Mock
+from uuid import UUID
+
+import pytest
+from bson import Binary
+from clickhouse_driver import Client
+
+from recommendations_job.sources import Interaction
+
+
+@pytest.fixture
+def synthetic_interactions() -> list[Interaction]:
+    """Два кластера вкусов: пользователи u0..u49 смотрят фильмы
+    a0..a9, пользователи u50..u99 - фильмы b0..b9"""
+    rnd = random.Random(42)
+    interactions = []
+    for user in range(100):
+        prefix = "a" if user < 50 else "b"
+        for item in rnd.sample(range(10), 5):
+            interactions.append((f"u{user}", f"{prefix}{item}", 1.0))
+    return interactions
+
+
+@pytest.fixture
+def mock_ch_client():
+    """Фиктивный клиент ClickHouse"""
+    client = Mock(spec=Client)
+    client.execute_iter.return_value = iter(
+        [("u1", "101", 3), ("u1", "102", 1), ("u2", "101", 1)]
+    )
+    return client
+
+
+def make_mongo_database(likes: list[dict], bookmarks: list[dict]):
+    collections = {
+        "Like": Mock(),
+        "Bookmark": Mock(),
+    }
+    collections["Like"].find.return_value = likes
+    collections["Bookmark"].find.return_value = bookmarks
+    database = MagicMock()
+    database.__getitem__.side_effect = collections.__getitem__
+    return database
+
+
+@pytest.fixture
+def mock_mongo_database():
+    """Фиктивная база ugc_crud_service с коллекциями Like и Bookmark"""
+    return make_mongo_database(
+        likes=[
+            {"user_id": "u1", "content_id": "f1", "rate": 10},
+            {"user_id": "u2", "content_id": "f1", "rate": 5},
+            {"user_id": "u3", "content_id": "f2", "rate": 0},
+        ],
+        bookmarks=[{"user_id": "u1", "content_id": "f2"}],
+    )
+
+
+@pytest.fixture
+def mock_mongo_binary_database():
+    """Идентификаторы так, как их хранит Beanie: Binary подтипа 4"""
+    user_id = UUID("6a1f0c7e-3b4d-4d2a-9c1e-2f5b8a7d9e01")
+    film_id = UUID("0b9e8d7c-6f5a-4e3b-8a2c-1d0e9f8a7b6c")
+    return make_mongo_database(
+        likes=[
+            {
+                "user_id": Binary.from_uuid(user_id),
+                "content_id": Binary.from_uuid(film_id),
+                "rate": 10,
+            }
+        ],
+        bookmarks=[
+            {
+                "user_id": Binary.from_uuid(user_id),
+                "content_id": Binary.from_uuid(film_id),
+            }
+        ],
+    )
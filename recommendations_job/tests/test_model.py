@@ -0,0 +1,79 @@
+import numpy as np
+
+from recommendations_job.model import (
+    RecommendationModel,
+    build_interactions_matrix,
+    build_model,
+)
+
+
+def test_repeated_interactions_are_summed():
+    users, items, matrix = build_interactions_matrix(
+        [("u1", "f1", 1.0), ("u1", "f1", 2.0), ("u2", "f2", 1.0)]
+    )
+
+    assert list(users) == ["u1", "u2"]
+    assert list(items) == ["f1", "f2"]
+    assert matrix[0, 0] == 3.0
+    assert matrix.nnz == 2
+
+
+def test_neighbours_stay_within_cluster(synthetic_interactions):
+    model = build_model(synthetic_interactions, top_k=5)
+    items = list(model.items)
+
+    indptr = model.neighbours.indptr
+    for row, item in enumerate(items):
+        start, end = indptr[row], indptr[row + 1]
+        neighbours = [items[i] for i in model.neighbours.indices[start:end]]
+        assert 0 < len(neighbours) <= 5
+        assert item not in neighbours
+        assert all(n[0] == item[0] for n in neighbours)
+        # Соседи упорядочены по убыванию похожести
+        scores = model.neighbours.data[start:end]
+        assert np.all(scores[:-1] >= scores[1:])
+
+
+def test_min_cooccurrence_drops_rare_pairs():
+    interactions = [
+        ("u1", "f1", 1.0),
+        ("u1", "f2", 1.0),
+        ("u2", "f1", 1.0),
+        ("u2", "f3", 1.0),
+        ("u3", "f1", 1.0),
+        ("u3", "f3", 1.0),
+    ]
+
+    model = build_model(interactions, top_k=10, min_cooccurrence=2)
+    items = list(model.items)
+
+    f1 = items.index("f1")
+    start, end = model.neighbours.indptr[f1], model.neighbours.indptr[f1 + 1]
+    assert [items[i] for i in model.neighbours.indices[start:end]] == ["f3"]
+
+
+def test_popularity_order():
+    interactions = [
+        ("u1", "f1", 1.0),
+        ("u1", "f2", 1.0),
+        ("u2", "f2", 1.0),
+        ("u3", "f2", 1.0),
+        ("u3", "f3", 1.0),
+        ("u4", "f3", 1.0),
+    ]
+
+    model = build_model(interactions, top_k=10)
+
+    assert [model.items[i] for i in model.popularity] == ["f2", "f3", "f1"]
+
+
+def test_artifact_roundtrip(synthetic_interactions):
+    model = build_model(synthetic_interactions, top_k=5)
+
+    loaded = RecommendationModel.loads(model.dumps())
+
+    assert list(loaded.items) == list(model.items)
+    assert list(loaded.users) == list(model.users)
+    assert (loaded.neighbours != model.neighbours).nnz == 0
+    assert (loaded.history != model.history).nnz == 0
+    assert list(loaded.popularity) == list(model.popularity)
@@ -0,0 +1,47 @@
+from recommendations_job.sources import ReactionsSource, ViewingsSource
+
+
+def test_viewings_source(mock_ch_client):
+    source = ViewingsSource(mock_ch_client, lookback_days=30, weight=1.0)
+
+    interactions = list(source.fetch())
+
+    # Повторные просмотры уже схлопнуты запросом, вес не зависит от числа
+    assert interactions == [
+        ("u1", "101", 1.0),
+        ("u1", "102", 1.0),
+        ("u2", "101", 1.0),
+    ]
+    query = mock_ch_client.execute_iter.call_args.args[0]
+    assert "completed_viewings" in query
+
+
+def test_reactions_source(mock_mongo_database):
+    source = ReactionsSource(
+        mock_mongo_database, like_weight=2.0, bookmark_weight=1.5
+    )
+
+    interactions = list(source.fetch())
+
+    # Лайк с нулевой оценкой не учитывается
+    assert interactions == [
+        ("u1", "f1", 2.0),
+        ("u2", "f1", 1.0),
+        ("u1", "f2", 1.5),
+    ]
+
+
+def test_reactions_source_binary_uuids(mock_mongo_binary_database):
+    source = ReactionsSource(
+        mock_mongo_binary_database, like_weight=2.0, bookmark_weight=1.5
+    )
+
+    interactions = list(source.fetch())
+
+    # Строки UUID, а не repr байтов Binary
+    user_id = "6a1f0c7e-3b4d-4d2a-9c1e-2f5b8a7d9e01"
+    film_id = "0b9e8d7c-6f5a-4e3b-8a2c-1d0e9f8a7b6c"
+    assert interactions == [
+        (user_id, film_id, 2.0),
+        (user_id, film_id, 1.5),
+    ]
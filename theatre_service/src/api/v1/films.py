@@ -1,15 +1,99 @@
 from typing import Annotated
 from http import HTTPStatus
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+import orjson
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
 
+from common.conditional import conditional_response, render_models
+from common.cursor import NEXT_CURSOR_HEADER
 from services.film import FilmService, get_film_service
-from services.bearer import security_jwt
-from api.v1.schemes import FilmCommon, PersonCommon, Film
-from api.v1.pagination import PaginatedParams
+from services.bearer import security_internal_or_jwt, security_jwt
+from api.v1.schemes import (
+    FacetedFilms,
+    FilmCommon,
+    GenreFacet,
+    PersonCommon,
+    RatingFacet,
+    Film,
+)
+from api.v1.pagination import CursorParams, PaginatedParams
+from models import models
 
 router = APIRouter()
 
+EMPTY_LIST_PAYLOAD = b"[]"
+MAX_BATCH_SIZE = 100
+
+
+def render_film_list(films: list[models.FilmCommon]) -> bytes:
+    """Готовое тело ответа со списком фильмов для кэша"""
+    return orjson.dumps(
+        [
+            FilmCommon(
+                uuid=film.id, imdb_rating=film.imdb_rating, title=film.title
+            ).model_dump()
+            for film in films
+        ]
+    )
+
+
+def render_faceted_films(result: models.FacetedFilms) -> bytes:
+    """Готовое тело ответа поиска с фасетами для кэша"""
+    return orjson.dumps(
+        FacetedFilms(
+            films=[
+                FilmCommon(
+                    uuid=film.id,
+                    imdb_rating=film.imdb_rating,
+                    title=film.title,
+                )
+                for film in result.films
+            ],
+            total=result.total,
+            genres=[
+                GenreFacet(uuid=g.uuid, name=g.name, count=g.count)
+                for g in result.genres
+            ],
+            ratings=[
+                RatingFacet(key=r.key, count=r.count) for r in result.ratings
+            ],
+        ).model_dump()
+    )
+
+
+def film_to_scheme(film: models.Film) -> Film:
+    return Film(
+        uuid=film.id,
+        imdb_rating=film.imdb_rating,
+        title=film.title,
+        description=film.description,
+        genre=[g.model_dump() for g in film.genres],
+        directors=[
+            PersonCommon(uuid=d.id, full_name=d.full_name)
+            for d in film.directors
+        ],
+        actors=[
+            PersonCommon(uuid=a.id, full_name=a.full_name)
+            for a in film.actors
+        ],
+        writers=[
+            PersonCommon(uuid=w.id, full_name=w.full_name)
+            for w in film.writers
+        ],
+    )
+
+
+def render_film(film: models.Film) -> bytes:
+    """Готовое тело ответа с полной информацией о фильме для кэша"""
+    return orjson.dumps(film_to_scheme(film).model_dump())
+
 
 @router.get(
     "/",
@@ -22,12 +106,19 @@ router = APIRouter()
     summary="Поиск по фильмам",
 )
 async def films_list(
+    request: Request,
     genre_id: str = Query(default=None),
     query: str = Query(default=None),
     sort: str = Query(default="-imdb_rating"),
+    facets: bool = Query(
+        default=False,
+        description="Вернуть вместе со страницей общее число фильмов "
+        "и фасеты по жанрам и рейтингу",
+    ),
     pagination: PaginatedParams = Depends(),
+    cursor_params: CursorParams = Depends(),
     film_service: FilmService = Depends(get_film_service),
-) -> list[FilmCommon]:
+) -> Response:
     parameters = {
         "genre_id": genre_id,
         "query": query,
@@ -35,123 +126,169 @@ async def films_list(
         "page_size": pagination.page_size,
         "page_number": pagination.page_number,
     }
-    films = await film_service.get_by_parameters(parameters)
-    if not films:
+    if cursor_params.cursor is not None:
+        # Глубокий обход по курсору: конец обхода - пустой список
+        films, next_cursor = await film_service.get_page_by_cursor(
+            parameters, cursor_params.cursor
+        )
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        return Response(
+            content=render_film_list(films),
+            media_type="application/json",
+            headers=headers,
+        )
+
+    if facets:
+        # Страница и фасеты одним запросом к search_engine; пустая
+        # выдача - не ошибка, фасеты подскажут, как изменить фильтр
+        payload = await film_service.get_faceted_response_by_parameters(
+            parameters, render_faceted_films
+        )
+        return conditional_response(request, payload)
+
+    # Тело ответа приходит из кэша уже сериализованным
+    payload = await film_service.get_response_by_parameters(
+        parameters, render_film_list
+    )
+    if payload == EMPTY_LIST_PAYLOAD:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail="films not found"
         )
 
-    return [
-        FilmCommon(
-            uuid=film.id, imdb_rating=film.imdb_rating, title=film.title
-        )
-        for film in films
-    ]
+    return conditional_response(request, payload)
 
 
 @router.get(
-    "/{film_id}", response_model=Film, summary="Полная информация по фильму"
+    "/batch",
+    response_model=list[Film],
+    summary="Полная информация по нескольким фильмам",
 )
-async def film_details(
+async def films_batch(
+    request: Request,
     user: Annotated[dict, Depends(security_jwt)],
-    film_id: str,
+    ids: list[str] = Query(
+        ..., description="Идентификаторы фильмов (не более 100)"
+    ),
     film_service: FilmService = Depends(get_film_service),
-) -> Film:
-    roles = user.get("roles") or []
-    film = await film_service.get_by_id(film_id, roles)
-    if not film:
+) -> Response:
+    """Фильмы в порядке переданных идентификаторов.
+    Ненайденные и недоступные фильмы в ответ не попадают"""
+    if len(ids) > MAX_BATCH_SIZE:
         raise HTTPException(
-            status_code=HTTPStatus.NOT_FOUND, detail="film not found"
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=f"no more than {MAX_BATCH_SIZE} ids per request",
         )
 
-    return Film(
-        uuid=film.id,
-        imdb_rating=film.imdb_rating,
-        title=film.title,
-        description=film.description,
-        genre=[g.model_dump() for g in film.genres],
-        directors=[
-            PersonCommon(uuid=d.id, full_name=d.full_name)
-            for d in film.directors
-        ],
-        actors=[
-            PersonCommon(uuid=a.id, full_name=a.full_name) for a in film.actors
-        ],
-        writers=[
-            PersonCommon(uuid=w.id, full_name=w.full_name)
-            for w in film.writers
-        ],
+    roles = user.get("roles") or []
+    films = await film_service.get_by_ids(ids, roles)
+    return conditional_response(
+        request,
+        render_models(film_to_scheme(film) for film in films),
+        private=True,
     )
 
 
-# Похожие фильмы. Похожесть можно оценить с помощью ElasticSearch,
-# но цель модуля не в этом.
-# Сделаем просто: покажем фильмы того же жанра.
-
-
 @router.get(
-    "/{film_id}/similar",
+    "/recommendations/{user_id}",
     response_model=list[FilmCommon],
-    summary="Похожие фильмы",
+    summary="Рекоммендации фильмов пользователю",
 )
-async def similar_films_list(
-    film_id: str,
+async def user_recommendations(
+    request: Request,
+    user: Annotated[dict, Depends(security_internal_or_jwt)],
+    user_id: str,
     pagination: PaginatedParams = Depends(),
     film_service: FilmService = Depends(get_film_service),
-) -> list[FilmCommon]:
+) -> Response:
+    # Персональные рекомендации отдаются их владельцу
+    # и служебным запросам notification_scheduler
+    if not user.get("internal") and user.get("user_id") != user_id:
+        raise HTTPException(
+            status_code=HTTPStatus.FORBIDDEN, detail="forbidden"
+        )
+
     # Преобразуем параметры в словарь
     parameters = {
         "page_size": pagination.page_size,
         "page_number": pagination.page_number,
     }
-    films = await film_service.get_similar_films_by_id(film_id, parameters)
-    if not films:
-        raise HTTPException(
-            status_code=HTTPStatus.NOT_FOUND, detail="films not found"
-        )
+    films = await film_service.get_recommendations(
+        parameters, user_id, user.get("roles") or []
+    )
 
-    return [
-        FilmCommon(
-            uuid=film.id, imdb_rating=film.imdb_rating, title=film.title
-        )
-        for film in films
-    ]
+    return conditional_response(
+        request, render_film_list(films), private=True
+    )
 
 
+# Объявлен до /{film_id}, иначе путь перехватит полная информация по фильму
 @router.get(
-    "/recommendations/{user_id}",
+    "/recommendations",
     response_model=list[FilmCommon],
-    summary="Рекоммендации фильмов пользователю",
+    summary="Рекоммендации фильмов",
 )
-async def user_recommendations(
-    user_id: str,
+async def common_recommendations(
+    request: Request,
     pagination: PaginatedParams = Depends(),
     film_service: FilmService = Depends(get_film_service),
-) -> list[FilmCommon]:
+) -> Response:
     # Преобразуем параметры в словарь
     parameters = {
         "page_size": pagination.page_size,
         "page_number": pagination.page_number,
     }
-    # TODO
+    films = await film_service.get_recommendations(parameters)
 
-    return []
+    return conditional_response(request, render_film_list(films))
 
 
 @router.get(
-    "/recommendations",
+    "/{film_id}", response_model=Film, summary="Полная информация по фильму"
+)
+async def film_details(
+    request: Request,
+    user: Annotated[dict, Depends(security_jwt)],
+    film_id: str,
+    film_service: FilmService = Depends(get_film_service),
+) -> Response:
+    roles = user.get("roles") or []
+    payload = await film_service.get_response_by_id(
+        film_id, roles, render_film
+    )
+    if not payload:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail="film not found"
+        )
+
+    # Состав ответа зависит от ролей пользователя
+    return conditional_response(request, payload, private=True)
+
+
+# Похожие фильмы. Похожесть можно оценить с помощью ElasticSearch,
+# но цель модуля не в этом.
+# Сделаем просто: покажем фильмы того же жанра.
+
+
+@router.get(
+    "/{film_id}/similar",
     response_model=list[FilmCommon],
-    summary="Рекоммендации фильмов",
+    summary="Похожие фильмы",
 )
-async def common_recommendations(
+async def similar_films_list(
+    request: Request,
+    film_id: str,
     pagination: PaginatedParams = Depends(),
     film_service: FilmService = Depends(get_film_service),
-) -> list[FilmCommon]:
+) -> Response:
     # Преобразуем параметры в словарь
     parameters = {
         "page_size": pagination.page_size,
         "page_number": pagination.page_number,
     }
-    # TODO
+    films = await film_service.get_similar_films_by_id(film_id, parameters)
+    if not films:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail="films not found"
+        )
 
-    return []
+    return conditional_response(request, render_film_list(films))
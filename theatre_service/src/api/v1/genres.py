@@ -1,11 +1,20 @@
 import uuid
 from http import HTTPStatus
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
 
+from common.conditional import conditional_response, render_models
+from common.cursor import NEXT_CURSOR_HEADER
 from services.genre import GenreService, get_genre_service
 from api.v1.schemes import FilmCommon, GenreCommon, Genre
-from api.v1.pagination import PaginatedParams
+from api.v1.pagination import CursorParams, PaginatedParams
 
 router = APIRouter()
 
@@ -21,26 +30,43 @@ router = APIRouter()
     summary="Поиск по жанрам",
 )
 async def genres_list(
+    request: Request,
     query: str = Query(default=None, description="Поиск по названию жанра"),
     pagination: PaginatedParams = Depends(),
+    cursor_params: CursorParams = Depends(),
     genre_service: GenreService = Depends(get_genre_service),
-) -> list[GenreCommon]:
+) -> Response:
     parameters = {
         "query": query,  # Поиск по имени жанра
         "page_size": pagination.page_size,
         "page_number": pagination.page_number,
     }
-    genres = await genre_service.get_by_parameters(parameters)
-    if not genres:
+    next_cursor = None
+    if cursor_params.cursor is not None:
+        # Глубокий обход по курсору: конец обхода - пустой список
+        genres, next_cursor = await genre_service.get_page_by_cursor(
+            parameters, cursor_params.cursor
+        )
+    else:
+        genres = await genre_service.get_by_parameters(parameters)
+    if not genres and cursor_params.cursor is None:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail="Genres not found"
         )
 
     # Возвращаем список жанров, теперь без поля 'description'
-    return [
+    result = [
         GenreCommon(uuid=genre.uuid, name=genre.name)  # Без description
         for genre in genres
     ]
+    if cursor_params.cursor is not None:
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        return Response(
+            content=render_models(result),
+            media_type="application/json",
+            headers=headers,
+        )
+    return conditional_response(request, render_models(result))
 
 
 @router.get(
@@ -49,11 +75,12 @@ async def genres_list(
     summary="Данные по конкретному жанру с фильмами",
 )
 async def genre_details(
+    request: Request,
     genre_id: uuid.UUID,
     pagination: PaginatedParams = Depends(),
     sort: str = Query("-imdb_rating", description="Сортировка по imdb_rating"),
     genre_service: GenreService = Depends(get_genre_service),
-) -> Genre:
+) -> Response:
     """Получаем жанр и связанные с ним фильмы
     с параметрами пагинации и сортировки."""
 
@@ -72,11 +99,16 @@ async def genre_details(
             status_code=HTTPStatus.NOT_FOUND, detail="Genre not found"
         )
 
-    return Genre(
-        uuid=genre.uuid,
-        name=genre.name,
-        films=[
-            FilmCommon(uuid=f.id, imdb_rating=f.imdb_rating, title=f.title)
-            for f in genre.films
-        ],
+    return conditional_response(
+        request,
+        Genre(
+            uuid=genre.uuid,
+            name=genre.name,
+            films=[
+                FilmCommon(
+                    uuid=f.id, imdb_rating=f.imdb_rating, title=f.title
+                )
+                for f in genre.films
+            ],
+        ).model_dump_json().encode(),
     )
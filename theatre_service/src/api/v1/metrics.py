@@ -0,0 +1,12 @@
+from typing import Any
+
+from fastapi import APIRouter
+
+from core.metrics import collect_metrics
+
+router = APIRouter()
+
+
+@router.get("/", summary="Метрики кэшей и внутренних компонентов сервиса")
+async def service_metrics() -> dict[str, Any]:
+    return collect_metrics()
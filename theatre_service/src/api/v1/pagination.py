@@ -1,3 +1,5 @@
+from typing import Optional
+
 from fastapi import Query
 
 class PaginatedParams:
@@ -7,4 +9,18 @@ class PaginatedParams:
         page_number: int = Query(1, ge=1, description="Номер страницы"),
     ):
         self.page_size = page_size
-        self.page_number = page_number
\ No newline at end of file
+        self.page_number = page_number
+
+
+class CursorParams:
+    """Пагинация по курсору. Пустой cursor начинает обход,
+    токен следующей страницы возвращается в заголовке X-Next-Cursor.
+    Если cursor не передан, работает пагинация по номеру страницы."""
+
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(
+            None, description="Токен продолжения из заголовка X-Next-Cursor"
+        ),
+    ):
+        self.cursor = cursor
@@ -1,9 +1,26 @@
 from http import HTTPStatus
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Annotated
 
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+
+from common.conditional import conditional_response, render_models
+from common.cursor import NEXT_CURSOR_HEADER
+from services.bearer import security_optional_jwt
 from services.person import PersonService, get_person_service
-from api.v1.schemes import FilmCommon, FilmOfPerson, PersonCommon, Person
-from api.v1.pagination import PaginatedParams
+from api.v1.schemes import (
+    FilmOfPerson,
+    PersonCommon,
+    PersonFilm,
+    Person,
+)
+from api.v1.pagination import CursorParams, PaginatedParams
 
 router = APIRouter()
 
@@ -19,13 +36,15 @@ router = APIRouter()
     summary="Поиск по людям",
 )
 async def persons_list(
+    request: Request,
     query: str = Query(
         default=None, description="Поиск по названию или описанию"
     ),
     pagination: PaginatedParams = Depends(),
     sort: str = Query(default="-full_name", description="Сортировка по имени"),
+    cursor_params: CursorParams = Depends(),
     person_service: PersonService = Depends(get_person_service),
-) -> list[Person]:
+) -> Response:
     # Параметры запроса
     parameters = {
         "query": query,  # Поиск по имени
@@ -34,14 +53,21 @@ async def persons_list(
         "sort": sort,  # Сортировка
     }
 
-    # Получаем данные через сервис
-    persons = await person_service.get_by_parameters(parameters)
-    if not persons:
+    next_cursor = None
+    if cursor_params.cursor is not None:
+        # Глубокий обход по курсору: конец обхода - пустой список
+        persons, next_cursor = await person_service.get_page_by_cursor(
+            parameters, cursor_params.cursor
+        )
+    else:
+        # Получаем данные через сервис
+        persons = await person_service.get_by_parameters(parameters)
+    if not persons and cursor_params.cursor is None:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail="persons not found"
         )
 
-    return [
+    result = [
         Person(
             uuid=person.id,
             full_name=person.full_name,
@@ -51,6 +77,20 @@ async def persons_list(
         )
         for person in persons
     ]  # Возвращаем уже список объектов Person, а не PersonCommon
+    if not request.url.path.endswith("/search"):
+        # Без поиска отдаются краткие данные персон, как в response_model
+        result = [
+            PersonCommon(uuid=person.uuid, full_name=person.full_name)
+            for person in result
+        ]
+    if cursor_params.cursor is not None:
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        return Response(
+            content=render_models(result),
+            media_type="application/json",
+            headers=headers,
+        )
+    return conditional_response(request, render_models(result))
 
 
 @router.get(
@@ -59,38 +99,70 @@ async def persons_list(
     summary="Данные по конкретному человеку",
 )
 async def person_details(
+    request: Request,
     person_id: str,
     person_service: PersonService = Depends(get_person_service),
-) -> Person:
+) -> Response:
     person = await person_service.get_by_id(person_id)
     if not person:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail="person not found"
         )
 
-    return Person(
-        uuid=person.id,
-        full_name=person.full_name,
-        films=[FilmOfPerson(uuid=f.id, roles=f.roles) for f in person.films],
+    return conditional_response(
+        request,
+        Person(
+            uuid=person.id,
+            full_name=person.full_name,
+            films=[
+                FilmOfPerson(uuid=f.id, roles=f.roles) for f in person.films
+            ],
+        ).model_dump_json().encode(),
     )
 
 
 @router.get(
     "/{person_id}/films",
-    response_model=list[FilmCommon],
+    response_model=list[PersonFilm],
     summary="Список фильмов персоны",
 )
 async def person_films_list(
+    request: Request,
+    user: Annotated[dict, Depends(security_optional_jwt)],
     person_id: str,
+    pagination: PaginatedParams = Depends(),
+    sort: str = Query(
+        default="-imdb_rating",
+        pattern="^-?(imdb_rating|creation_date)$",
+        description="Сортировка по рейтингу или дате выхода",
+    ),
     person_service: PersonService = Depends(get_person_service),
-) -> list[FilmCommon]:
-    person = await person_service.get_by_id(person_id)
-    if not person:
+) -> Response:
+    parameters = {
+        "page_size": pagination.page_size,
+        "page_number": pagination.page_number,
+        "sort": sort,
+    }
+    films = await person_service.get_filmography(
+        person_id, parameters, user.get("roles") or []
+    )
+    if films is None:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail="person not found"
         )
 
-    return [
-        FilmCommon(uuid=f.id, title=f.title, imdb_rating=f.imdb_rating)
-        for f in person.films
-    ]
+    return conditional_response(
+        request,
+        render_models(
+            PersonFilm(
+                uuid=f.id,
+                title=f.title,
+                imdb_rating=f.imdb_rating,
+                roles=f.roles,
+                creation_date=f.creation_date,
+            )
+            for f in films
+        ),
+        # С токеном в ответ попадают фильмы, доступные по ролям
+        private=bool(user),
+    )
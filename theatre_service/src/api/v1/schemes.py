@@ -1,3 +1,4 @@
+from datetime import date
 from typing import Optional
 
 from pydantic import BaseModel
@@ -19,6 +20,37 @@ class PersonCommon(BaseModel):
     full_name: Optional[str] = None
 
 
+class FilmSuggestion(BaseModel):
+    uuid: str = ""
+    title: Optional[str] = None
+
+
+class Suggestions(BaseModel):
+    films: list[FilmSuggestion] = []
+    persons: list[PersonCommon] = []
+
+
+class GenreFacet(GenreCommon):
+    count: int = 0
+
+
+class RatingFacet(BaseModel):
+    key: str = ""
+    count: int = 0
+
+
+class FacetedFilms(BaseModel):
+    films: list[FilmCommon] = []
+    total: int = 0
+    genres: list[GenreFacet] = []
+    ratings: list[RatingFacet] = []
+
+
+class PersonFilm(FilmCommon):
+    roles: list[str] = []
+    creation_date: Optional[date] = None
+
+
 class Film(FilmCommon):
     description: Optional[str] = None
     genre: list[GenreCommon] = []
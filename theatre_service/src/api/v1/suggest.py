@@ -0,0 +1,48 @@
+import orjson
+from fastapi import APIRouter, Depends, Query, Request, Response
+
+from api.v1.schemes import FilmSuggestion, PersonCommon, Suggestions
+from common.conditional import conditional_response
+from models import models
+from services.suggest import SuggestService, get_suggest_service
+
+router = APIRouter()
+
+
+def render_suggestions(
+    films: list[models.FilmCommon], persons: list[models.PersonCommon]
+) -> bytes:
+    """Готовое тело ответа с подсказками для кэша"""
+    return orjson.dumps(
+        Suggestions(
+            films=[
+                FilmSuggestion(uuid=film.id, title=film.title)
+                for film in films
+            ],
+            persons=[
+                PersonCommon(uuid=person.id, full_name=person.full_name)
+                for person in persons
+            ],
+        ).model_dump()
+    )
+
+
+@router.get(
+    "/",
+    response_model=Suggestions,
+    summary="Подсказки фильмов и персон при наборе запроса",
+)
+async def suggest(
+    request: Request,
+    query: str = Query(
+        ..., min_length=1, max_length=50, description="Начало запроса"
+    ),
+    size: int = Query(
+        10, ge=1, le=20, description="Количество подсказок каждого вида"
+    ),
+    suggest_service: SuggestService = Depends(get_suggest_service),
+) -> Response:
+    payload = await suggest_service.get_response(
+        query, size, render_suggestions
+    )
+    return conditional_response(request, payload)
@@ -0,0 +1,336 @@
+"""Нагрузочный замер API theatre_service без внешних сервисов.
+
+Приложение запускается со своим lifespan, но вместо Elasticsearch
+получает InMemorySearchEngine с синтетическим каталогом, а вместо Redis -
+fakeredis или Redis по --redis-url (его база очищается). Запросы идут
+через ASGI, без сети. Замер состоит из двух фаз:
+
+- cold: кэши очищены, каждый адрес запрашивается один раз;
+- warm: те же адреса повторяются в пропорциях смеси эндпоинтов,
+  популярные адреса запрашиваются чаще.
+
+Для каждой фазы и каждого эндпоинта сохраняются RPS и p50/p95/p99.
+
+Запуск из каталога src:
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.api --requests 5000
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+from benchmarks.catalogue import LAST_NAMES, WORDS, make_catalogue
+
+# Доля каждого эндпоинта в фазе warm
+DEFAULT_MIX = "detail=35,list=25,search=15,similar=15,genre=10"
+# Эндпоинты, требующие токена
+AUTHORIZED_ENDPOINTS = {"detail"}
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Без этих переменных настройки приложения не загрузятся;
+# прогреватель отключён, чтобы фаза cold начиналась с пустого кэша
+APP_ENVIRONMENT = {
+    "REDIS_HOST": "localhost",
+    "ES_HOST": "localhost",
+    "AUTH_SECRET_KEY": "benchmark",
+    "SENTRY_DSN_THEATRE": "",
+    "THEATRE_CACHE_WARMER_ENABLED": "false",
+}
+
+Request = tuple[str, str]
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def make_pools(
+    catalogue: dict[str, dict[str, dict]], distinct: int, rnd: random.Random
+) -> dict[str, list[str]]:
+    """Адреса каждого эндпоинта в порядке убывания популярности"""
+    film_ids = rnd.sample(
+        list(catalogue["movies"]), min(distinct, len(catalogue["movies"]))
+    )
+    genre_ids = list(catalogue["genres"])
+    pools = {
+        "detail": [f"/api/v1/films/{film_id}" for film_id in film_ids],
+        "similar": [
+            f"/api/v1/films/{film_id}/similar" for film_id in film_ids
+        ],
+        "list": [
+            f"/api/v1/films/?page_number={page}&page_size=50"
+            for page in range(1, 11)
+        ]
+        + [
+            f"/api/v1/films/?genre_id={genre_id}&page_number={page}"
+            for genre_id in genre_ids
+            for page in range(1, 4)
+        ],
+        "search": [
+            f"/api/v1/films/search?query={word}&page_size=20"
+            for word in WORDS
+        ]
+        + [f"/api/v1/persons/search?query={name}" for name in LAST_NAMES],
+        "genre": ["/api/v1/genres/"]
+        + [f"/api/v1/genres/{genre_id}" for genre_id in genre_ids],
+    }
+    for name in ("list", "search", "genre"):
+        # Первые страницы популярнее остальных, но не абсолютно
+        head, tail = pools[name][:3], pools[name][3:]
+        rnd.shuffle(tail)
+        pools[name] = head + tail
+    return pools
+
+
+def make_requests(
+    pools: dict[str, list[str]],
+    mix: dict[str, float],
+    count: int,
+    rnd: random.Random,
+) -> list[Request]:
+    """Смесь запросов: эндпоинт по весам mix, адрес по закону Ципфа"""
+    names = [name for name in mix if pools.get(name)]
+    endpoints = rnd.choices(names, weights=[mix[n] for n in names], k=count)
+    zipf = {
+        name: [1 / rank for rank in range(1, len(pools[name]) + 1)]
+        for name in names
+    }
+    return [
+        (name, rnd.choices(pools[name], weights=zipf[name])[0])
+        for name in endpoints
+    ]
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Процентиль по ближайшему рангу; values отсортированы"""
+    rank = max(math.ceil(p / 100 * len(values)) - 1, 0)
+    return round(values[rank], 3)
+
+
+def summarize(
+    results: list[tuple[str, float, int]], elapsed: float
+) -> dict[str, Any]:
+    by_endpoint: dict[str, list[tuple[float, int]]] = {}
+    for endpoint, latency, status in results:
+        by_endpoint.setdefault(endpoint, []).append((latency, status))
+
+    endpoints = {}
+    for endpoint, items in sorted(by_endpoint.items()):
+        latencies = sorted(latency for latency, _ in items)
+        endpoints[endpoint] = {
+            "requests": len(items),
+            "rps": round(len(items) / elapsed, 1),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "statuses": dict(Counter(str(status) for _, status in items)),
+        }
+    return {
+        "requests": len(results),
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(results) / elapsed, 1),
+        "endpoints": endpoints,
+    }
+
+
+async def replay(
+    client: Any,
+    requests: list[Request],
+    concurrency: int,
+    token: str,
+) -> dict[str, Any]:
+    """Выполняет запросы concurrency параллельными клиентами"""
+    pending = iter(requests)
+    results: list[tuple[str, float, int]] = []
+    auth = {"Authorization": f"Bearer {token}"}
+
+    async def worker():
+        for endpoint, url in pending:
+            headers = auth if endpoint in AUTHORIZED_ENDPOINTS else None
+            started = time.perf_counter()
+            response = await client.get(url, headers=headers)
+            latency = (time.perf_counter() - started) * 1000
+            results.append((endpoint, latency, response.status_code))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(results, time.perf_counter() - started)
+
+
+async def reset_caches(redis: Any) -> None:
+    """Пустые L1 и L2: состояние кэша после перезапуска сервиса"""
+    from db.cache import generation_memo, memory_cache
+    from services.suggest import suggest_cache
+
+    await redis.flushdb()
+    memory_cache.clear()
+    suggest_cache.clear()
+    generation_memo.clear()
+
+
+async def wait_ready(timeout: float) -> None:
+    """Ждёт загрузки индексов, которые lifespan строит в фоне"""
+    from services.genre_catalogue import genre_catalogue
+    from services.similarity import similarity_index
+
+    deadline = time.monotonic() + timeout
+    while not (similarity_index.ready and genre_catalogue.ready):
+        if time.monotonic() > deadline:
+            raise TimeoutError("In-memory indexes are not ready")
+        await asyncio.sleep(0.05)
+
+
+def make_redis(url: Optional[str]) -> Any:
+    if url:
+        from redis.asyncio import Redis
+
+        return Redis.from_url(url)
+    from fakeredis import FakeAsyncRedis
+
+    return FakeAsyncRedis()
+
+
+def git_commit() -> dict[str, Any]:
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, check=True
+        ).stdout.strip()
+
+    try:
+        return {
+            "sha": git("rev-parse", "HEAD"),
+            "dirty": bool(git("status", "--porcelain")),
+        }
+    except (OSError, subprocess.CalledProcessError):
+        return {"sha": None, "dirty": None}
+
+
+def configure_environment() -> None:
+    """Вызывается до импорта модулей приложения: они читают настройки"""
+    for name, value in APP_ENVIRONMENT.items():
+        os.environ.setdefault(name, value)
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    configure_environment()
+    import httpx
+    from jose import jwt
+
+    import main as app_module
+    from benchmarks.in_memory_engine import InMemorySearchEngine
+    from core.config import settings
+
+    catalogue = make_catalogue(args.films, args.persons, args.seed)
+    engine = InMemorySearchEngine(catalogue, latency=args.latency_ms / 1000)
+    redis = make_redis(args.redis_url)
+
+    async def init_redis():
+        return redis
+
+    async def init_elastic():
+        return engine
+
+    # Приложение стартует с собственным lifespan,
+    # подменяются только подключения
+    app_module.init_redis = init_redis
+    app_module.init_elastic = init_elastic
+
+    rnd = random.Random(args.seed)
+    pools = make_pools(catalogue, args.distinct, rnd)
+    mix = parse_mix(args.mix)
+    cold = [(name, url) for name in mix for url in pools.get(name, [])]
+    rnd.shuffle(cold)
+    warm = make_requests(pools, mix, args.requests, rnd)
+    token = jwt.encode(
+        {"sub": "benchmark", "roles": []},
+        settings.jwt_secret_key,
+        algorithm=settings.jwt_algorithm,
+    )
+
+    phases = {}
+    async with app_module.lifespan(app_module.app):
+        await wait_ready(args.ready_timeout)
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app_module.app),
+            base_url="http://benchmark",
+        ) as client:
+            await reset_caches(redis)
+            phases["cold"] = await replay(
+                client, cold, args.concurrency, token
+            )
+            phases["warm"] = await replay(
+                client, warm, args.concurrency, token
+            )
+
+    return {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "parameters": vars(args),
+        "search_engine": engine.metrics(),
+        "phases": phases,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--films", type=int, default=5000)
+    parser.add_argument("--persons", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument(
+        "--distinct",
+        type=int,
+        default=300,
+        help="число разных фильмов в запросах карточек и похожих",
+    )
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=2.0,
+        help="задержка каждого обращения к search_engine",
+    )
+    parser.add_argument(
+        "--redis-url",
+        default=None,
+        help="Redis вместо fakeredis; его база будет очищена",
+    )
+    parser.add_argument("--ready-timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="файл результатов, по умолчанию results/<commit>.json",
+    )
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        output = RESULTS_DIR / f"{report['commit']['sha'] or 'local'}.json"
+    report["parameters"]["output"] = str(output)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(json.dumps(report["phases"], indent=2))
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Синтетический каталог фильмов, персон и жанров для замеров.
+
+Документы повторяют то, что etl_service записывает в индексы movies,
+persons и genres, включая completion-поля подсказок. Каталог зависит
+только от seed, поэтому запуски на разных коммитах сравнимы.
+"""
+
+import random
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Any
+
+WORDS = (
+    "star dark night city love war last road king river blood shadow "
+    "moon secret dream house fire storm ghost world time space iron "
+    "silent wild black golden lost hidden empire winter summer ocean"
+).split()
+FIRST_NAMES = (
+    "John Mary James Anna Robert Linda Michael Sarah David Emma Peter "
+    "Olga Ivan Maria Thomas Laura Daniel Sofia Alex Nina"
+).split()
+LAST_NAMES = (
+    "Smith Brown Taylor Wilson Clark Lewis Walker Young King Green "
+    "Baker Hill Adams Scott Turner Parker Evans Moore Ivanov Petrova"
+).split()
+GENRE_NAMES = (
+    "Action Adventure Animation Biography Comedy Crime Documentary "
+    "Drama Family Fantasy History Horror Music Musical Mystery News "
+    "Reality Romance Scifi Sport Talk Thriller War Western"
+).split()
+
+# Ограничение длины входа completion-поля, как в etl_service
+MAX_SUGGEST_INPUT_LENGTH = 50
+
+
+def completion_input(text: str, weight: float) -> dict:
+    words = text.split()
+    return {
+        "input": [
+            " ".join(words[i:])[:MAX_SUGGEST_INPUT_LENGTH]
+            for i in range(len(words))
+        ],
+        "weight": max(int(round(weight)), 0),
+    }
+
+
+def make_id(rnd: random.Random) -> str:
+    return str(uuid.UUID(int=rnd.getrandbits(128)))
+
+
+def make_catalogue(
+    films: int, persons: int, seed: int
+) -> dict[str, dict[str, dict[str, Any]]]:
+    """Индексы movies, persons и genres: идентификатор -> документ"""
+    rnd = random.Random(seed)
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    genres = {
+        make_id(rnd): {"name": name, "description": f"{name} films"}
+        for name in GENRE_NAMES
+    }
+    people = {
+        make_id(rnd): {
+            "full_name": f"{rnd.choice(FIRST_NAMES)} "
+            f"{rnd.choice(LAST_NAMES)}",
+            "films": [],
+        }
+        for _ in range(persons)
+    }
+    person_ids = list(people)
+    genre_ids = list(genres)
+
+    movies = {}
+    for _ in range(films):
+        film_id = make_id(rnd)
+        title = " ".join(rnd.sample(WORDS, rnd.randint(1, 4))).title()
+        rating = round(rnd.uniform(1, 10), 1)
+        roles = {
+            "directors": rnd.sample(person_ids, 1),
+            "writers": rnd.sample(person_ids, rnd.randint(1, 2)),
+            "actors": rnd.sample(person_ids, rnd.randint(2, 5)),
+        }
+        film_genres = rnd.sample(genre_ids, rnd.randint(1, 3))
+        movies[film_id] = {
+            "id": film_id,
+            "title": title,
+            "title_suggest": completion_input(title, rating * 10),
+            "description": " ".join(rnd.choices(WORDS, k=15)),
+            "imdb_rating": rating,
+            "creation_date": (
+                date(1950, 1, 1) + timedelta(days=rnd.randint(0, 27000))
+            ).isoformat(),
+            "genres": [
+                {"uuid": genre_id, "name": genres[genre_id]["name"]}
+                for genre_id in film_genres
+            ],
+            **{
+                role: [
+                    {"id": person_id, "name": people[person_id]["full_name"]}
+                    for person_id in ids
+                ]
+                for role, ids in roles.items()
+            },
+            **{
+                f"{role}_names": [
+                    people[person_id]["full_name"] for person_id in ids
+                ]
+                for role, ids in roles.items()
+            },
+            "access": [],
+            "last_change_date": (
+                now - timedelta(minutes=rnd.randint(0, 60 * 24 * 365))
+            ).isoformat(),
+        }
+
+        film_roles: dict[str, list[str]] = {}
+        for role, ids in roles.items():
+            for person_id in ids:
+                film_roles.setdefault(person_id, []).append(role[:-1])
+        for person_id, person_roles in film_roles.items():
+            people[person_id]["films"].append(
+                {
+                    "id": film_id,
+                    "title": title,
+                    "imdb_rating": rating,
+                    "roles": person_roles,
+                }
+            )
+        for genre_id in film_genres:
+            genres[genre_id].setdefault("films", []).append(
+                {"id": film_id, "title": title, "imdb_rating": rating}
+            )
+
+    for person_id, person in people.items():
+        person["id"] = person_id
+        person["full_name_suggest"] = completion_input(
+            person["full_name"], len(person["films"])
+        )
+        person["last_change_date"] = now.isoformat()
+    for genre_id, genre in genres.items():
+        genre["id"] = genre_id
+        genre.setdefault("films", [])
+        genre["last_change_date"] = now.isoformat()
+
+    return {"movies": movies, "persons": people, "genres": genres}
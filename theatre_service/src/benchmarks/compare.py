@@ -0,0 +1,79 @@
+"""Сравнение двух результатов benchmarks.api.
+
+Печатает изменение RPS и p50/p95/p99 по фазам и эндпоинтам и завершается
+с кодом 1, если p95 какого-либо эндпоинта вырос или его RPS упал больше
+чем на --threshold процентов.
+
+Запуск из каталога src:
+    python -m benchmarks.compare results/<old>.json results/<new>.json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Optional
+
+METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms")
+
+
+def change(old: float, new: float) -> Optional[float]:
+    if not old:
+        return None
+    return (new - old) / old * 100
+
+
+def compare(
+    old: dict[str, Any], new: dict[str, Any], threshold: float
+) -> list[str]:
+    """Печатает таблицу сравнения и возвращает найденные регрессии"""
+    regressions = []
+    print(
+        f"{'phase':<6} {'endpoint':<10} {'metric':<7} "
+        f"{'old':>10} {'new':>10} {'change':>8}"
+    )
+    for phase, results in new["phases"].items():
+        old_endpoints = old["phases"].get(phase, {}).get("endpoints", {})
+        for endpoint, metrics in results["endpoints"].items():
+            if endpoint not in old_endpoints:
+                continue
+            for metric in METRICS:
+                before = old_endpoints[endpoint][metric]
+                after = metrics[metric]
+                delta = change(before, after)
+                shown = f"{delta:+.1f}%" if delta is not None else "-"
+                print(
+                    f"{phase:<6} {endpoint:<10} {metric:<7} "
+                    f"{before:>10} {after:>10} {shown:>8}"
+                )
+                if delta is None:
+                    continue
+                if (metric == "p95_ms" and delta > threshold) or (
+                    metric == "rps" and delta < -threshold
+                ):
+                    regressions.append(
+                        f"{phase}/{endpoint} {metric}: {shown}"
+                    )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--threshold", type=float, default=10.0)
+    args = parser.parse_args()
+
+    old = json.loads(args.old.read_text())
+    new = json.loads(args.new.read_text())
+    print(f"old: {old['commit']['sha']}  new: {new['commit']['sha']}")
+    regressions = compare(old, new, args.threshold)
+    if regressions:
+        print("Regressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+"""Search engine в памяти процесса для замеров theatre_service.
+
+Запросы строит ElasticsearchEngine, а выполняет небольшой интерпретатор
+того подмножества DSL, которое использует сервис: match_all, bool,
+nested, term, range, match и multi_match, сортировка с search_after
+по point in time, агрегации range и terms, фильтр _source,
+docvalue_fields и completion-подсказки. Анализ текста упрощён:
+слово запроса должно совпасть со словом поля.
+Задержка сети задаётся параметром latency, а время, потраченное
+самим интерпретатором, учитывается в busy_seconds, чтобы его можно было
+отделить от времени сервиса.
+"""
+
+import asyncio
+import re
+import time
+import uuid
+from collections import Counter
+from typing import Any, Optional
+
+from db.elasticsearch_engine import ElasticsearchEngine
+from db.search_engine import Projection, SearchContextMissing
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Документ индекса: позиция в индексе, идентификатор и содержимое
+Doc = tuple[int, str, dict[str, Any]]
+
+
+def tokenize(text: Any) -> set[str]:
+    return set(TOKEN_RE.findall(str(text).lower()))
+
+
+def field_values(source: dict[str, Any], field: str) -> list[Any]:
+    """Значения поля по пути через вложенные объекты и списки"""
+    values = [source]
+    for part in field.split("."):
+        found = []
+        for value in values:
+            if isinstance(value, dict) and part in value:
+                item = value[part]
+                found.extend(item if isinstance(item, list) else [item])
+        values = found
+    return values
+
+
+def in_range(value: Any, bounds: dict[str, Any]) -> bool:
+    if value is None:
+        return False
+    if bounds.get("gt") is not None and not value > bounds["gt"]:
+        return False
+    if bounds.get("gte") is not None and not value >= bounds["gte"]:
+        return False
+    if bounds.get("lt") is not None and not value < bounds["lt"]:
+        return False
+    if bounds.get("lte") is not None and not value <= bounds["lte"]:
+        return False
+    return True
+
+
+def text_matches(text: str, source: dict[str, Any], fields: list[str]):
+    tokens = tokenize(text)
+    return any(
+        tokens & tokenize(value)
+        for field in fields
+        for value in field_values(source, field)
+    )
+
+
+def matches(doc_id: str, source: dict[str, Any], query: dict) -> bool:
+    ((kind, params),) = query.items()
+    if kind == "match_all":
+        return True
+
+    if kind == "bool":
+        required = [*params.get("must", []), *params.get("filter", [])]
+        if not all(matches(doc_id, source, q) for q in required):
+            return False
+        if any(matches(doc_id, source, q) for q in params.get("must_not", [])):
+            return False
+        should = params.get("should", [])
+        minimum = params.get("minimum_should_match", 0 if required else 1)
+        if should and minimum:
+            return sum(matches(doc_id, source, q) for q in should) >= minimum
+        return True
+
+    if kind == "nested":
+        path = params["path"]
+        return any(
+            matches(doc_id, {**source, path: [element]}, params["query"])
+            for element in source.get(path) or []
+        )
+
+    if kind == "term":
+        ((field, value),) = params.items()
+        if isinstance(value, dict):
+            value = value["value"]
+        if field == "_id":
+            return doc_id == value
+        return value in field_values(source, field)
+
+    if kind == "range":
+        ((field, bounds),) = params.items()
+        return any(in_range(v, bounds) for v in field_values(source, field))
+
+    if kind == "match":
+        ((field, value),) = params.items()
+        if isinstance(value, dict):
+            value = value["query"]
+        return text_matches(value, source, [field])
+
+    if kind == "multi_match":
+        return text_matches(params["query"], source, params["fields"])
+
+    raise ValueError(f"Unsupported query: {kind}")
+
+
+def sort_values(doc: Doc, sort: list[dict[str, Any]]) -> list[Any]:
+    position, _, source = doc
+    values = []
+    for item in sort:
+        ((field, _),) = item.items()
+        if field == "_shard_doc":
+            values.append(position)
+        else:
+            found = field_values(source, field)
+            values.append(found[0] if found else None)
+    return values
+
+
+def sort_docs(docs: list[Doc], sort: list[dict[str, Any]]) -> list[Doc]:
+    """Многоключевая сортировка; документы без значения идут последними"""
+    docs = list(docs)
+    for i in reversed(range(len(sort))):
+        ((field, order),) = sort[i].items()
+        if isinstance(order, dict):
+            order = order.get("order", "asc")
+        reverse = order == "desc"
+
+        def key(doc: Doc, i: int = i, reverse: bool = reverse):
+            value = sort_values(doc, [sort[i]])[0]
+            missing = value is None
+            return (not missing if reverse else missing, value or 0)
+
+        docs.sort(key=key, reverse=reverse)
+    return docs
+
+
+def aggregate(
+    sources: list[dict[str, Any]], aggs: dict[str, Any]
+) -> dict[str, Any]:
+    result = {}
+    for name, agg in aggs.items():
+        if "nested" in agg:
+            path = agg["nested"]["path"]
+            elements = [
+                {path: [element]}
+                for source in sources
+                for element in source.get(path) or []
+            ]
+            result[name] = {
+                "doc_count": len(elements),
+                **aggregate(elements, agg.get("aggs", {})),
+            }
+        elif "range" in agg:
+            field = agg["range"]["field"]
+            buckets = []
+            for bucket in agg["range"]["ranges"]:
+                bounds = {"gte": bucket.get("from"), "lt": bucket.get("to")}
+                count = sum(
+                    any(in_range(v, bounds) for v in field_values(s, field))
+                    for s in sources
+                )
+                buckets.append({**bucket, "doc_count": count})
+            result[name] = {"buckets": buckets}
+        elif "terms" in agg:
+            field = agg["terms"]["field"]
+            counts = Counter(
+                value
+                for source in sources
+                for value in set(field_values(source, field))
+            )
+            top = sorted(counts.items(), key=lambda kv: (-kv[1], str(kv[0])))
+            result[name] = {
+                "buckets": [
+                    {"key": key, "doc_count": count}
+                    for key, count in top[: agg["terms"].get("size", 10)]
+                ]
+            }
+        else:
+            raise ValueError(f"Unsupported aggregation: {name}")
+    return result
+
+
+def filter_fields(
+    value: Any, includes: list[str], excludes: list[str], prefix: str = ""
+) -> Any:
+    if isinstance(value, list):
+        return [
+            filter_fields(item, includes, excludes, prefix) for item in value
+        ]
+    if not isinstance(value, dict):
+        return value
+    result = {}
+    for key, item in value.items():
+        path = f"{prefix}{key}"
+        if path in excludes:
+            continue
+        if includes and not any(
+            path == field
+            or field.startswith(f"{path}.")
+            or path.startswith(f"{field}.")
+            for field in includes
+        ):
+            continue
+        result[key] = filter_fields(item, includes, excludes, f"{path}.")
+    return result
+
+
+def project(source: dict[str, Any], fields: Any) -> dict[str, Any]:
+    """Фильтр _source: список полей, includes/excludes или False"""
+    if fields is None or fields is True:
+        return source
+    if fields is False:
+        return {}
+    if isinstance(fields, str):
+        fields = [fields]
+    if isinstance(fields, list):
+        fields = {"includes": fields}
+    return filter_fields(
+        source, fields.get("includes", []), fields.get("excludes", [])
+    )
+
+
+def docvalues(source: dict[str, Any], field: str) -> list[Any]:
+    """Значения из doc values; ключевое подполе .raw - копия исходного"""
+    values = field_values(source, field)
+    if not values and field.endswith(".raw"):
+        values = field_values(source, field[: -len(".raw")])
+    return values
+
+
+class InMemoryClient:
+    """Заглушка клиента: lifespan приложения закрывает engine.client"""
+
+    async def close(self) -> None:
+        pass
+
+
+class InMemorySearchEngine(ElasticsearchEngine):
+    """Индексы в памяти вместо кластера Elasticsearch.
+
+    Построение запросов наследуется от ElasticsearchEngine, поэтому
+    сервис получает ответы той же формы на те же тела запросов,
+    что и в работе с кластером.
+    """
+
+    def __init__(
+        self,
+        indexes: dict[str, dict[str, dict[str, Any]]],
+        latency: float = 0.0,
+    ):
+        self.client = InMemoryClient()
+        self.indexes = indexes
+        self.latency = latency
+        # point in time -> снимок документов индекса
+        self._pits: dict[str, list[Doc]] = {}
+        self.requests = 0
+        self.busy_seconds = 0.0
+
+    async def _round_trip(self) -> None:
+        self.requests += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+
+    def _docs(self, index: str) -> list[Doc]:
+        return [
+            (position, doc_id, source)
+            for position, (doc_id, source) in enumerate(
+                self.indexes.get(index, {}).items()
+            )
+        ]
+
+    @staticmethod
+    def _hit(index: str, doc_id: str, source: dict, fields: Any = None):
+        return {
+            "_index": index,
+            "_id": doc_id,
+            "_source": project(source, fields),
+        }
+
+    async def search(self, index: str, body: dict) -> dict:
+        await self._round_trip()
+        return self._timed(self._search, index, body)
+
+    async def msearch(self, index: str, bodies: list[dict]) -> list[dict]:
+        await self._round_trip()
+        responses = []
+        for body in bodies:
+            try:
+                responses.append(self._timed(self._search, index, body))
+            except (SearchContextMissing, ValueError) as e:
+                responses.append({"error": {"reason": str(e)}})
+        return responses
+
+    async def mget(
+        self,
+        index: str,
+        ids: list[str],
+        projection: Optional[Projection] = None,
+    ) -> list[dict]:
+        if not ids:
+            return []
+        await self._round_trip()
+        docs = self.indexes.get(index, {})
+        fields = projection.source_filter() if projection else None
+        return [
+            {**self._hit(index, doc_id, docs[doc_id], fields), "found": True}
+            for doc_id in ids
+            if doc_id in docs
+        ]
+
+    async def get(
+        self, index: str, id: str, projection: Optional[Projection] = None
+    ) -> Optional[dict]:
+        await self._round_trip()
+        source = self.indexes.get(index, {}).get(id)
+        if source is None:
+            return None
+        fields = projection.source_filter() if projection else None
+        return {**self._hit(index, id, source, fields), "found": True}
+
+    async def open_point_in_time(self, index: str, keep_alive: str) -> str:
+        await self._round_trip()
+        pit_id = uuid.uuid4().hex
+        self._pits[pit_id] = self._docs(index)
+        return pit_id
+
+    async def close_point_in_time(self, pit_id: str) -> None:
+        self._pits.pop(pit_id, None)
+
+    async def suggest(
+        self,
+        index: str,
+        field: str,
+        prefix: str,
+        size: int,
+        source: list[str],
+    ) -> list[dict]:
+        await self._round_trip()
+        return self._timed(self._suggest, index, field, prefix, size, source)
+
+    def _timed(self, func, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.busy_seconds += time.perf_counter() - started
+
+    def _search(self, index: str, body: dict) -> dict:
+        if "pit" in body:
+            docs = self._pits.get(body["pit"]["id"])
+            if docs is None:
+                raise SearchContextMissing(body["pit"]["id"])
+        else:
+            docs = self._docs(index)
+
+        query = body.get("query") or {"match_all": {}}
+        found = [doc for doc in docs if matches(doc[1], doc[2], query)]
+        sort = body.get("sort", [])
+        if sort:
+            found = sort_docs(found, sort)
+
+        start = body.get("from", 0)
+        if body.get("search_after"):
+            # Сортировка в PIT заканчивается _shard_doc, поэтому значения
+            # сортировки однозначно указывают на документ
+            start = next(
+                (
+                    i + 1
+                    for i, doc in enumerate(found)
+                    if sort_values(doc, sort) == body["search_after"]
+                ),
+                len(found),
+            )
+        page = found[start : start + body.get("size", 10)]
+
+        hits = []
+        for doc in page:
+            hit = self._hit(index, doc[1], doc[2], body.get("_source"))
+            values = {
+                field: docvalues(doc[2], field)
+                for field in body.get("docvalue_fields", [])
+            }
+            if any(values.values()):
+                hit["fields"] = {k: v for k, v in values.items() if v}
+            if sort:
+                hit["sort"] = sort_values(doc, sort)
+            hits.append(hit)
+
+        response: dict[str, Any] = {
+            "took": 0,
+            "timed_out": False,
+            "hits": {"hits": hits},
+        }
+        if body.get("track_total_hits", True) is not False:
+            response["hits"]["total"] = {"value": len(found), "relation": "eq"}
+        if "pit" in body:
+            response["pit_id"] = body["pit"]["id"]
+        if "aggs" in body:
+            response["aggregations"] = aggregate(
+                [doc[2] for doc in found], body["aggs"]
+            )
+        return response
+
+    def _suggest(
+        self,
+        index: str,
+        field: str,
+        prefix: str,
+        size: int,
+        source: list[str],
+    ) -> list[dict]:
+        options = []
+        for doc_id, doc in self.indexes.get(index, {}).items():
+            completion = doc.get(field)
+            if completion and any(
+                value.lower().startswith(prefix)
+                for value in completion["input"]
+            ):
+                options.append((completion["weight"], doc_id, doc))
+        options.sort(key=lambda option: -option[0])
+        return [
+            {**self._hit(index, doc_id, doc, source), "_score": weight}
+            for weight, doc_id, doc in options[:size]
+        ]
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "documents": {
+                index: len(docs) for index, docs in self.indexes.items()
+            },
+            "requests": self.requests,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "open_pits": len(self._pits),
+        }
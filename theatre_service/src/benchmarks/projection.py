@@ -0,0 +1,173 @@
+"""Размер ответов Elasticsearch и время их разбора с проекцией полей и без.
+
+Для каждого эндпоинта запрос строится так же, как в сервисе, и
+выполняется дважды: с полным _source и с набором полей эндпоинта.
+Замеряются размер тела ответа, время запроса и время разбора JSON
+стандартным json и orjson.
+
+Запуск из каталога src (индексы заполнены etl_service):
+    python -m benchmarks.projection --host http://localhost:9200
+"""
+
+import argparse
+import json
+import statistics
+import time
+import urllib.request
+from typing import Any, Callable, Optional
+
+import orjson
+
+from benchmarks.api import configure_environment
+
+Request = tuple[str, str, Optional[dict]]
+
+
+def request(host: str, method: str, path: str, body: Optional[dict]):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(
+        f"{host}{path}",
+        data=data,
+        method=method,
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(req) as response:
+        return response.read()
+
+
+def query_value(value: Any) -> str:
+    if isinstance(value, list):
+        return ",".join(value)
+    return str(value).lower()
+
+
+def median_us(func: Callable[[], Any], repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1_000_000)
+    return round(statistics.median(timings), 1)
+
+
+def measure(
+    host: str, method: str, path: str, body: Optional[dict], repeats: int
+) -> dict[str, Any]:
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        raw = request(host, method, path, body)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return {
+        "bytes": len(raw),
+        "request_ms": round(statistics.median(latencies), 2),
+        "json_decode_us": median_us(lambda: json.loads(raw), repeats),
+        "orjson_decode_us": median_us(lambda: orjson.loads(raw), repeats),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="http://localhost:9200")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--query", default="star")
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    configure_environment()
+    from benchmarks.in_memory_engine import InMemorySearchEngine
+    from db.elasticsearch_engine import source_params
+    from services.film import (
+        FILM_DETAIL_PROJECTION,
+        FILM_ES_INDEX,
+        FILM_LIST_PROJECTION,
+    )
+    from services.genre import GENRE_ES_INDEX, GENRE_LIST_PROJECTION
+    from services.person import (
+        PERSON_DETAIL_PROJECTION,
+        PERSON_ES_INDEX,
+        PERSON_LIST_PROJECTION,
+    )
+
+    # Тела запросов строит ElasticsearchEngine, клиент не нужен
+    builder = InMemorySearchEngine({})
+    page = {"page_size": args.page_size, "page_number": 1}
+
+    def search_case(index, to_body, make_query, parameters, projection):
+        def make_request(with_projection: bool) -> Request:
+            body = to_body(parameters, make_query(parameters))
+            if with_projection:
+                builder.project_body(body, projection)
+            return "POST", f"/{index}/_search", body
+
+        return make_request
+
+    def get_case(index, projection):
+        # Карточка первого документа индекса через GET _doc
+        hits = orjson.loads(
+            request(args.host, "POST", f"/{index}/_search", {"size": 1})
+        )["hits"]["hits"]
+        path = f"/{index}/_doc/{hits[0]['_id']}"
+        params = "&".join(
+            f"_{key}={query_value(value)}"
+            for key, value in source_params(projection).items()
+        )
+
+        def make_request(with_projection: bool) -> Request:
+            if with_projection:
+                return "GET", f"{path}?{params}", None
+            return "GET", path, None
+
+        return make_request
+
+    cases = {
+        "films list": search_case(
+            FILM_ES_INDEX,
+            builder.film_parameters_to_body,
+            builder.make_film_query_by_params,
+            page,
+            FILM_LIST_PROJECTION,
+        ),
+        "films search": search_case(
+            FILM_ES_INDEX,
+            builder.film_parameters_to_body,
+            builder.make_film_query_by_params,
+            {**page, "query": args.query},
+            FILM_LIST_PROJECTION,
+        ),
+        "persons list": search_case(
+            PERSON_ES_INDEX,
+            builder.person_parameters_to_body,
+            builder.make_persons_query_by_params,
+            page,
+            PERSON_LIST_PROJECTION,
+        ),
+        "genres list": search_case(
+            GENRE_ES_INDEX,
+            builder.genre_parameters_to_body,
+            builder.make_genres_query_by_params,
+            page,
+            GENRE_LIST_PROJECTION,
+        ),
+        "film detail": get_case(FILM_ES_INDEX, FILM_DETAIL_PROJECTION),
+        "person detail": get_case(PERSON_ES_INDEX, PERSON_DETAIL_PROJECTION),
+    }
+
+    results = []
+    for name, make_request in cases.items():
+        row = {"endpoint": name}
+        for variant, with_projection in (("full", False), ("projected", True)):
+            method, path, body = make_request(with_projection)
+            row[variant] = measure(args.host, method, path, body, args.repeats)
+        full, projected = row["full"], row["projected"]
+        row["bytes_ratio"] = round(projected["bytes"] / full["bytes"], 3)
+        row["orjson_decode_ratio"] = round(
+            projected["orjson_decode_us"] / full["orjson_decode_us"], 3
+        )
+        results.append(row)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
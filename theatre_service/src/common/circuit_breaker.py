@@ -0,0 +1,148 @@
+import time
+from functools import wraps
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable, TypeVar
+
+from fastapi import HTTPException
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(HTTPException):
+    """Источник недоступен: предохранитель разомкнут"""
+
+    def __init__(self, name: str):
+        super().__init__(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail=f"{name} is unavailable",
+        )
+
+
+class CircuitBreaker:
+    """Предохранитель для вызовов внешнего источника.
+
+    После failure_threshold ошибок подряд предохранитель размыкается,
+    и вызовы сразу завершаются CircuitOpenError, не дожидаясь таймаутов.
+    Через recovery_timeout секунд пропускается не более
+    half_open_max_calls пробных вызовов: успех замыкает предохранитель,
+    ошибка снова размыкает его.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        recovery_timeout: float,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if (
+            self._state == OPEN
+            and time.monotonic() - self._opened_at >= self.recovery_timeout
+        ):
+            self._state = HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == OPEN
+
+    async def call(
+        self,
+        func: Callable[[], Awaitable[T]],
+        is_failure: Callable[[Exception], bool] = lambda _: True,
+    ) -> T:
+        """Выполняет func; is_failure отделяет отказы источника
+        от штатных исключений (например, документ не найден)"""
+        state = self.state
+        if state == OPEN or (
+            state == HALF_OPEN and self._probes >= self.half_open_max_calls
+        ):
+            self.rejected += 1
+            raise CircuitOpenError(self.name)
+
+        probe = state == HALF_OPEN
+        if probe:
+            self._probes += 1
+        opened_at = self._opened_at
+        try:
+            result = await func()
+        except Exception as e:
+            if is_failure(e):
+                self._on_failure()
+            else:
+                self._on_success()
+            raise
+        finally:
+            # Место пробного вызова освобождается при любом исходе,
+            # в том числе при отмене запроса, иначе после
+            # half_open_max_calls отменённых проб предохранитель
+            # остался бы полуоткрытым и отклонял все вызовы
+            if (
+                probe
+                and self._state == HALF_OPEN
+                and self._opened_at == opened_at
+            ):
+                self._probes -= 1
+        self._on_success()
+        return result
+
+    def protect(
+        self, is_failure: Callable[[Exception], bool] = lambda _: True
+    ) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+        """Декоратор асинхронных методов источника"""
+
+        def decorator(
+            func: Callable[..., Awaitable[T]]
+        ) -> Callable[..., Awaitable[T]]:
+            @wraps(func)
+            async def wrapper(*args: Any, **kwargs: Any) -> T:
+                return await self.call(
+                    lambda: func(*args, **kwargs), is_failure
+                )
+
+            return wrapper
+
+        return decorator
+
+    def _on_success(self) -> None:
+        self._failures = 0
+        self._state = CLOSED
+
+    def _on_failure(self) -> None:
+        if self._state == OPEN:
+            # Вызов начался до размыкания - время восстановления не сдвигаем
+            return
+        self._failures += 1
+        if (
+            self._state == HALF_OPEN
+            or self._failures >= self.failure_threshold
+        ):
+            self._state = OPEN
+            self._opened_at = time.monotonic()
+            self.opened += 1
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
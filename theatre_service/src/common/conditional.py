@@ -0,0 +1,62 @@
+import hashlib
+from http import HTTPStatus
+from typing import Any, Iterable, Optional
+
+import orjson
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+from core.config import settings
+
+
+def make_etag(payload: bytes) -> str:
+    """Сильный ETag по содержимому тела ответа"""
+    return f'"{hashlib.blake2b(payload, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Слабое сравнение из If-None-Match (RFC 9110, 13.1.2)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+def render_models(models: Iterable[BaseModel]) -> bytes:
+    return orjson.dumps([model.model_dump() for model in models])
+
+
+def conditional_response(
+    request: Request,
+    payload: bytes,
+    private: bool = False,
+    headers: Optional[dict[str, Any]] = None,
+) -> Response:
+    """Ответ с ETag и Cache-Control; если клиент прислал совпадающий
+    If-None-Match, тело не отправляется и возвращается 304.
+
+    Ответы, зависящие от пользователя (private), не должны храниться
+    в общих кэшах и различаются по заголовку Authorization.
+    """
+    etag = make_etag(payload)
+    scope = "private" if private else "public"
+    cache_headers = {
+        "ETag": etag,
+        "Cache-Control": f"{scope}, max-age={settings.http_cache_max_age}",
+    }
+    if private:
+        cache_headers["Vary"] = "Authorization"
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(
+            status_code=HTTPStatus.NOT_MODIFIED, headers=cache_headers
+        )
+    return Response(
+        content=payload,
+        media_type="application/json",
+        headers={**cache_headers, **(headers or {})},
+    )
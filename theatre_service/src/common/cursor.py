@@ -0,0 +1,71 @@
+import base64
+import binascii
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable, Optional
+
+import orjson
+from fastapi import HTTPException
+
+from core.config import settings
+from db.search_engine import SearchEngine, SearchContextMissing
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(pit_id: str, search_after: list[Any]) -> str:
+    """Непрозрачный токен продолжения: PIT и значения сортировки
+    последнего документа страницы"""
+    raw = orjson.dumps({"pit": pit_id, "after": search_after})
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, list[Any]]:
+    try:
+        data = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return data["pit"], data["after"]
+    except (binascii.Error, orjson.JSONDecodeError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+async def search_by_cursor(
+    search_engine: SearchEngine,
+    index: str,
+    parameters: dict[str, Any],
+    cursor: str,
+    search: Callable[[dict[str, Any], str], Awaitable[Any]],
+) -> tuple[list[dict[str, Any]], Optional[str]]:
+    """Постраничный обход индекса через point in time и search_after.
+
+    Пустой cursor открывает новый PIT, иначе обход продолжается
+    с места, записанного в токене. Стоимость страницы не зависит
+    от её глубины. Возвращает найденные документы и токен следующей
+    страницы (None, если документы закончились).
+    """
+    if cursor:
+        pit_id, search_after = decode_cursor(cursor)
+    else:
+        pit_id = await search_engine.open_point_in_time(
+            index=index, keep_alive=settings.es_pit_keep_alive
+        )
+        search_after = None
+
+    try:
+        response = await search(
+            {**parameters, "pit_id": pit_id, "search_after": search_after},
+            index,
+        )
+    except SearchContextMissing:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST, detail="Cursor expired"
+        )
+    hits = response["hits"]["hits"]
+    # ES может вернуть обновлённый идентификатор PIT
+    pit_id = response.get("pit_id", pit_id)
+
+    if len(hits) < parameters["page_size"]:
+        await search_engine.close_point_in_time(pit_id)
+        return hits, None
+
+    return hits, encode_cursor(pit_id, hits[-1]["sort"])
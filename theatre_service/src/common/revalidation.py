@@ -0,0 +1,84 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+from core.metrics import register_metrics
+from db.cache import CachePolicy, CacheStats, CacheStorage
+from db.search_engine import search_engine_breaker
+
+
+class Revalidator:
+    """Фоновое обновление устаревших записей кэша.
+
+    На один ключ одновременно выполняется не более одного обновления.
+    Ссылки на задачи храним, чтобы их не собрал сборщик мусора.
+    """
+
+    def __init__(self):
+        self._tasks: dict[str, asyncio.Task] = {}
+        self.stale_hits = 0
+        self.refreshed = 0
+        self.failed = 0
+
+    def schedule(self, key: str, refresh: Callable[[], Awaitable[Any]]):
+        self.stale_hits += 1
+        if key in self._tasks:
+            return
+
+        task = asyncio.create_task(self._run(key, refresh))
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+
+    async def _run(self, key: str, refresh: Callable[[], Awaitable[Any]]):
+        try:
+            await refresh()
+            self.refreshed += 1
+        except Exception as e:
+            self.failed += 1
+            logging.warning(f"Background refresh of {key} failed: {e}")
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "stale_hits": self.stale_hits,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "in_progress": len(self._tasks),
+        }
+
+
+revalidator = Revalidator()
+register_metrics("revalidation", revalidator.metrics)
+# Ответы из копий last known good при разомкнутом предохранителе
+last_known_good_stats = CacheStats()
+register_metrics("last_known_good", last_known_good_stats.as_dict)
+
+
+async def get_or_revalidate(
+    cache: CacheStorage,
+    key: str,
+    policy: CachePolicy,
+    refresh: Optional[Callable[[], Awaitable[Any]]] = None,
+) -> Optional[Any]:
+    """Читает ключ из кэша; устаревшее значение отдаёт сразу,
+    а обновление из источника запускает в фоне.
+
+    Пока предохранитель search_engine разомкнут, промах закрывается
+    копией last known good, а фоновые обновления не запускаются.
+    """
+    data, ttl = await cache.get_with_ttl(key)
+    if data is None:
+        if search_engine_breaker.is_open:
+            data = await cache.get_last_known_good(key)
+            if data is not None:
+                last_known_good_stats.hits += 1
+            else:
+                last_known_good_stats.misses += 1
+        return data
+
+    if (
+        refresh is not None
+        and policy.is_stale(ttl)
+        and not search_engine_breaker.is_open
+    ):
+        revalidator.schedule(key, refresh)
+    return data
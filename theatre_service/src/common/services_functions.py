@@ -1,20 +1,49 @@
-from typing import Dict, Any
+import hashlib
+from typing import Dict, Any, Optional
 from http import HTTPStatus
 
 import aiohttp
 
 
+def normalize_cache_param(value: Any) -> str:
+    """Приводит значение параметра к каноническому строковому виду"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (list, tuple, set)):
+        return ",".join(sorted(normalize_cache_param(item) for item in value))
+    return " ".join(str(value).split())
+
+
+def sort_order(sort: Optional[str]) -> str:
+    """Направление сортировки списка фильмов по параметру sort:
+    imdb_rating - по возрастанию, -imdb_rating или без параметра -
+    по убыванию. Одно правило для search_engine и множеств в Redis"""
+    return "asc" if sort and not sort.startswith("-") else "desc"
+
+
 def make_cache_key(
     key: str,
     params: Dict[str, Any],
+    generation: Optional[int] = None,
 ) -> str:
     """Создание ключа для CacheStorage по первоначальному ключу
-    с добавленными к нему параметрами"""
-    params_to_key = []
-    for param in params:
-        params_to_key.append(f"{param}={params[param]}")
+    и параметрам запроса.
 
-    return key + "?" + "&".join(params_to_key)
+    Параметры сортируются по имени, пустые (None) отбрасываются,
+    значения нормализуются, поэтому эквивалентные запросы попадают
+    в один ключ. Параметры хэшируются в строку фиксированной длины.
+    generation - поколение пространства ключей: его увеличение
+    разом делает недоступными все ключи прежнего поколения.
+    """
+    canonical = "&".join(
+        f"{name}={normalize_cache_param(value)}"
+        for name, value in sorted(params.items())
+        if value is not None
+    )
+    digest = hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+    if generation is not None:
+        key = f"{key}@{generation}"
+    return f"{key}?{digest}"
 
 
 async def check_access(accesses: list[str], roles: list[str] = []) -> str:
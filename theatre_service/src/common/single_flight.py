@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from redis.asyncio import Redis
+
+T = TypeVar("T")
+
+# Снятие блокировки только её владельцем
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLock:
+    """Блокировка ключа между воркерами через SET NX PX"""
+
+    def __init__(self, redis: Redis, ttl_ms: int, poll_interval: float = 0.05):
+        self.redis = redis
+        self.ttl_ms = ttl_ms
+        self.poll_interval = poll_interval
+
+    async def acquire(self, key: str) -> Optional[str]:
+        token = uuid.uuid4().hex
+        if await self.redis.set(f"lock:{key}", token, nx=True, px=self.ttl_ms):
+            return token
+        return None
+
+    async def is_locked(self, key: str) -> bool:
+        return bool(await self.redis.exists(f"lock:{key}"))
+
+    async def release(self, key: str, token: str) -> None:
+        await self.redis.eval(RELEASE_LOCK_SCRIPT, 1, f"lock:{key}", token)
+
+
+class SingleFlight:
+    """Схлопывание одновременных запросов к источнику по ключу.
+
+    Пока для ключа выполняется загрузка, остальные вызывающие
+    ждут её результат, а не запускают собственный запрос.
+    Загрузка выполняется отдельной задачей, поэтому отмена запроса
+    клиента-лидера не прерывает ожидание остальных.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Task] = {}
+        self.executed = 0
+        self.coalesced = 0
+        self.remote_waits = 0
+        self.remote_hits = 0
+
+    async def do(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[T]],
+        lock: Optional[RedisLock] = None,
+        recheck: Optional[Callable[[], Awaitable[Optional[T]]]] = None,
+    ) -> T:
+        """Выполняет func один раз на ключ в пределах воркера.
+
+        Если передан lock, загрузку выполняет только воркер, взявший
+        блокировку; остальные воркеры опрашивают кэш через recheck.
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+
+        if lock is not None and recheck is not None:
+            coroutine = self._locked_call(key, func, lock, recheck)
+        else:
+            coroutine = func()
+
+        task = asyncio.ensure_future(coroutine)
+        self._calls[key] = task
+        task.add_done_callback(lambda _: self._calls.pop(key, None))
+        self.executed += 1
+        return await asyncio.shield(task)
+
+    async def _locked_call(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[T]],
+        lock: RedisLock,
+        recheck: Callable[[], Awaitable[Optional[T]]],
+    ) -> T:
+        token = await lock.acquire(key)
+        if token is None:
+            # Загрузку уже выполняет другой воркер: ждём, пока он
+            # положит результат в кэш, но не дольше времени жизни блокировки
+            self.remote_waits += 1
+            deadline = time.monotonic() + lock.ttl_ms / 1000
+            while time.monotonic() < deadline:
+                await asyncio.sleep(lock.poll_interval)
+                if (result := await recheck()) is not None:
+                    self.remote_hits += 1
+                    return result
+                if not await lock.is_locked(key):
+                    # Блокировку сняли, а в кэше пусто (например,
+                    # документ не найден) - загружаем сами
+                    break
+            else:
+                logging.warning(f"Lock wait timed out, loading {key} directly")
+            return await func()
+
+        try:
+            return await func()
+        finally:
+            await lock.release(key, token)
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+            "remote_waits": self.remote_waits,
+            "remote_hits": self.remote_hits,
+        }
@@ -1,5 +1,6 @@
 import os
 from logging import config as logging_config
+from typing import Optional
 from core.logger import LOGGING
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -25,10 +26,155 @@ class Settings(BaseSettings):
     redis_host: str = Field(..., alias="REDIS_HOST")
     redis_port: int = Field(6379, alias="REDIS_PORT")
 
+    # Настройки L1-кэша в памяти процесса
+    l1_cache_max_bytes: int = Field(
+        64 * 1024 * 1024, alias="THEATRE_L1_CACHE_MAX_BYTES"
+    )
+    l1_cache_ttl: int = Field(30, alias="THEATRE_L1_CACHE_TTL")
+
+    # Политики stale-while-revalidate: после soft_ttl запись отдаётся
+    # из кэша и обновляется в фоне, после hard_ttl удаляется из Redis.
+    # Изменённые в ETL документы удаляются из кэша сразу по событию,
+    # поэтому сроки жизни записей по идентификатору длинные
+    cache_films_soft_ttl: int = Field(
+        60 * 60, alias="THEATRE_CACHE_FILMS_SOFT_TTL"
+    )
+    cache_films_hard_ttl: int = Field(
+        60 * 60 * 6, alias="THEATRE_CACHE_FILMS_HARD_TTL"
+    )
+    cache_persons_soft_ttl: int = Field(
+        60 * 60, alias="THEATRE_CACHE_PERSONS_SOFT_TTL"
+    )
+    cache_persons_hard_ttl: int = Field(
+        60 * 60 * 6, alias="THEATRE_CACHE_PERSONS_HARD_TTL"
+    )
+    cache_genres_soft_ttl: int = Field(
+        60 * 60, alias="THEATRE_CACHE_GENRES_SOFT_TTL"
+    )
+    cache_genres_hard_ttl: int = Field(
+        60 * 60 * 6, alias="THEATRE_CACHE_GENRES_HARD_TTL"
+    )
+    cache_lists_soft_ttl: int = Field(
+        60 * 5, alias="THEATRE_CACHE_LISTS_SOFT_TTL"
+    )
+    cache_lists_hard_ttl: int = Field(
+        60 * 15, alias="THEATRE_CACHE_LISTS_HARD_TTL"
+    )
+
+    # Сколько секунд воркер доверяет своей копии номера поколения ключей
+    cache_generation_ttl: float = Field(
+        1.0, alias="THEATRE_CACHE_GENERATION_TTL"
+    )
+
+    # Сколько секунд хранится копия ответа, которую отдают, пока
+    # search_engine недоступен; 0 отключает копии
+    cache_last_known_good_ttl: int = Field(
+        60 * 60 * 24, alias="THEATRE_CACHE_LAST_KNOWN_GOOD_TTL"
+    )
+
+    # Схлопывание промахов кэша между воркерами через блокировку в Redis
+    single_flight_redis_lock: bool = Field(
+        False, alias="THEATRE_SINGLE_FLIGHT_REDIS_LOCK"
+    )
+    single_flight_lock_ttl_ms: int = Field(
+        5000, alias="THEATRE_SINGLE_FLIGHT_LOCK_TTL_MS"
+    )
+
+    # Индекс похожих фильмов в памяти процесса
+    similarity_top_k: int = Field(500, alias="THEATRE_SIMILARITY_TOP_K")
+    similarity_memo_size: int = Field(
+        10000, alias="THEATRE_SIMILARITY_MEMO_SIZE"
+    )
+    similarity_refresh_interval: int = Field(
+        60, alias="THEATRE_SIMILARITY_REFRESH_INTERVAL"
+    )
+    # Как часто индекс сверяется с полным списком фильмов, чтобы
+    # удалить фильмы, которых больше нет в Elasticsearch
+    similarity_reconcile_interval: int = Field(
+        60 * 60, alias="THEATRE_SIMILARITY_RECONCILE_INTERVAL"
+    )
+
+    # Кэш подсказок по префиксам в памяти процесса
+    suggest_cache_max_bytes: int = Field(
+        16 * 1024 * 1024, alias="THEATRE_SUGGEST_CACHE_MAX_BYTES"
+    )
+    suggest_cache_ttl: int = Field(60, alias="THEATRE_SUGGEST_CACHE_TTL")
+
+    # Справочник жанров в памяти процесса
+    genre_catalogue_refresh_interval: int = Field(
+        300, alias="THEATRE_GENRE_CATALOGUE_REFRESH_INTERVAL"
+    )
+
+    # Модель рекомендаций, которую публикует recommendations_job
+    recommendations_model_key: str = Field(
+        "recommendations:model", alias="THEATRE_RECOMMENDATIONS_MODEL_KEY"
+    )
+    recommendations_refresh_interval: int = Field(
+        60, alias="THEATRE_RECOMMENDATIONS_REFRESH_INTERVAL"
+    )
+
+    # Cache-Control: сколько секунд клиенты и CDN могут не перепроверять
+    # ответ; после этого ответ перепроверяется по ETag
+    http_cache_max_age: int = Field(60, alias="THEATRE_HTTP_CACHE_MAX_AGE")
+
+    # Прогрев кэша при старте и по расписанию
+    cache_warmer_enabled: bool = Field(
+        True, alias="THEATRE_CACHE_WARMER_ENABLED"
+    )
+    # Запросы, которые прогреваются всегда: первые страницы фильмов
+    # с сортировкой по умолчанию, жанры и персоны
+    cache_warmer_queries: list[str] = Field(
+        default_factory=lambda: [
+            *(
+                f"/api/v1/films/?page_number={page_number}"
+                for page_number in range(1, 11)
+            ),
+            "/api/v1/genres/",
+            "/api/v1/persons/",
+        ],
+        alias="THEATRE_CACHE_WARMER_QUERIES",
+    )
+    # Сколько самых частых запросов живого трафика прогревать
+    cache_warmer_top_n: int = Field(100, alias="THEATRE_CACHE_WARMER_TOP_N")
+    cache_warmer_max_tracked: int = Field(
+        10000, alias="THEATRE_CACHE_WARMER_MAX_TRACKED"
+    )
+    cache_warmer_concurrency: int = Field(
+        4, alias="THEATRE_CACHE_WARMER_CONCURRENCY"
+    )
+    cache_warmer_interval: int = Field(
+        240, alias="THEATRE_CACHE_WARMER_INTERVAL"
+    )
+    # Сколько секунд старт приложения ждёт первого прогрева
+    cache_warmer_startup_timeout: float = Field(
+        30.0, alias="THEATRE_CACHE_WARMER_STARTUP_TIMEOUT"
+    )
+
+    # Поток Redis, в который etl_service пишет изменённые документы
+    etl_changes_stream: str = Field(
+        "etl:changes", alias="THEATRE_ETL_CHANGES_STREAM"
+    )
+
     # Настройки Elasticsearch
     es_schema: str = "http://"
     es_host: str = Field(..., alias="ES_HOST")
     es_port: int = Field(9200, alias="ES_PORT")
+    # Время жизни point in time между страницами обхода по курсору
+    es_pit_keep_alive: str = Field("1m", alias="ES_PIT_KEEP_ALIVE")
+    # Таймаут одного запроса и общее время повторов при обрыве соединения
+    es_request_timeout: float = Field(5.0, alias="ES_REQUEST_TIMEOUT")
+    es_backoff_max_time: float = Field(5.0, alias="ES_BACKOFF_MAX_TIME")
+    # Предохранитель: число отказов подряд до размыкания, секунды
+    # до пробного запроса и число одновременных пробных запросов
+    es_breaker_failure_threshold: int = Field(
+        5, alias="ES_BREAKER_FAILURE_THRESHOLD"
+    )
+    es_breaker_recovery_timeout: float = Field(
+        10.0, alias="ES_BREAKER_RECOVERY_TIMEOUT"
+    )
+    es_breaker_half_open_max_calls: int = Field(
+        1, alias="ES_BREAKER_HALF_OPEN_MAX_CALLS"
+    )
 
     # auth-server
     auth_service_schema: str = "http://"
@@ -36,6 +182,11 @@ class Settings(BaseSettings):
     auth_service_port: int = Field(8000, alias="AUTH_SERVICE_PORT")
     jwt_secret_key: str = Field(..., alias="AUTH_SECRET_KEY")
     jwt_algorithm: str = Field("HS256", alias="JWT_ALGORITHM")
+    # Ключ служебных запросов notification_scheduler в X-Internal-Auth;
+    # без ключа служебные запросы не принимаются
+    notification_api_secret_key: Optional[str] = Field(
+        None, alias="NOTIFICATION_API_SECRET_KEY"
+    )
 
     # Sentry configuration
     sentry_dsn_theatre: str = Field(..., alias="SENTRY_DSN_THEATRE")
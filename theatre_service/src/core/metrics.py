@@ -0,0 +1,14 @@
+from typing import Any, Callable
+
+# Реестр метрик сервиса: имя группы -> функция, возвращающая словарь
+# с текущими значениями счётчиков. Компоненты регистрируют себя сами,
+# а эндпоинт /api/v1/metrics просто собирает все группы вместе.
+_collectors: dict[str, Callable[[], dict[str, Any]]] = {}
+
+
+def register_metrics(name: str, collector: Callable[[], dict[str, Any]]):
+    _collectors[name] = collector
+
+
+def collect_metrics() -> dict[str, Any]:
+    return {name: collector() for name, collector in _collectors.items()}
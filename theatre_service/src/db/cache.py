@@ -1,4 +1,7 @@
 import logging
+import sys
+import time
+from collections import OrderedDict
 from typing import Optional, Any, Protocol
 
 import redis.exceptions
@@ -7,20 +10,79 @@ from redis.asyncio import Redis
 from redis.exceptions import ConnectionError
 import backoff
 
+from core import config
+from core.metrics import register_metrics
+
 NO_CACHE_AFTER_PAGE_NUMBER = 10
+# Счётчик поколения пространства ключей, его увеличивает etl_service
+GENERATION_KEY = "cache_generation:{namespace}"
+# Долгоживущая копия записи на время недоступности search_engine
+LAST_KNOWN_GOOD_KEY = "lkg:{key}"
+# Ключей в одной команде DEL
+DELETE_CHUNK_SIZE = 1000
 
 
 class CacheStorage(Protocol):
     async def get(self, key: str) -> Optional[Any]:
         pass
 
+    async def get_with_ttl(
+        self, key: str
+    ) -> tuple[Optional[Any], Optional[float]]:
+        """Значение и оставшееся время жизни ключа в секундах"""
+        pass
+
     async def set(self, key: str, value: Any, expire: int) -> None:
         pass
 
+    async def delete(self, key: str) -> None:
+        pass
+
+    async def delete_many(self, keys: list[str]) -> None:
+        pass
+
+    async def mget(self, keys: list[str]) -> list[Optional[Any]]:
+        pass
+
+    async def mget_with_ttl(
+        self, keys: list[str]
+    ) -> list[tuple[Optional[Any], Optional[float]]]:
+        """Значения ключей и оставшееся время их жизни в секундах"""
+        pass
+
+    async def set_many(self, items: dict[str, Any], expire: int) -> None:
+        pass
+
+    async def get_last_known_good(self, key: str) -> Optional[Any]:
+        """Последнее записанное значение ключа, даже если запись
+        уже истекла или удалена"""
+        pass
+
+
+class CacheStats:
+    """Счётчики попаданий и промахов одного уровня кэша"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
 
 class RedisCacheStorage(CacheStorage):
-    def __init__(self, redis: Redis):
+    """Кэш в Redis. При last_known_good_ttl > 0 каждая запись
+    дублируется в копию, которая живёт дольше записи и не удаляется
+    при инвалидации"""
+
+    def __init__(self, redis: Redis, last_known_good_ttl: int = 0):
         self.redis = redis
+        self.last_known_good_ttl = last_known_good_ttl
 
     @backoff.on_exception(backoff.expo, exception=ConnectionError, max_time=60)
     async def get(self, key: str) -> Optional[Any]:
@@ -28,11 +90,333 @@ class RedisCacheStorage(CacheStorage):
         logging.info(f"Get from cache: {key}")
         return data
 
+    @backoff.on_exception(backoff.expo, exception=ConnectionError, max_time=60)
+    async def get_with_ttl(
+        self, key: str
+    ) -> tuple[Optional[Any], Optional[float]]:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.pttl(key)
+            data, ttl_ms = await pipe.execute()
+        logging.info(f"Get from cache: {key}")
+        if data is None:
+            return None, None
+        return data, ttl_ms / 1000 if ttl_ms > 0 else None
+
     @backoff.on_exception(backoff.expo, exception=ConnectionError, max_time=60)
     async def set(self, key: str, value: Any, expire: int) -> None:
-        await self.redis.set(key, value, ex=expire)
+        if self.last_known_good_ttl > 0:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(key, value, ex=expire)
+                pipe.set(
+                    LAST_KNOWN_GOOD_KEY.format(key=key),
+                    value,
+                    ex=max(self.last_known_good_ttl, expire),
+                )
+                await pipe.execute()
+        else:
+            await self.redis.set(key, value, ex=expire)
         logging.info(f"Put to cache: {key}")
 
+    @backoff.on_exception(backoff.expo, exception=ConnectionError, max_time=60)
+    async def delete(self, key: str) -> None:
+        await self.redis.delete(key)
+        logging.info(f"Delete from cache: {key}")
+
+    @backoff.on_exception(backoff.expo, exception=ConnectionError, max_time=60)
+    async def delete_many(self, keys: list[str]) -> None:
+        # Один DEL на пачку ключей вместо обращения на каждый ключ
+        for start in range(0, len(keys), DELETE_CHUNK_SIZE):
+            await self.redis.delete(*keys[start : start + DELETE_CHUNK_SIZE])
+        logging.info(f"Delete from cache: {len(keys)} keys")
+
+    @backoff.on_exception(backoff.expo, exception=ConnectionError, max_time=60)
+    async def mget(self, keys: list[str]) -> list[Optional[Any]]:
+        if not keys:
+            return []
+        data = await self.redis.mget(keys)
+        logging.info(f"Get from cache: {len(keys)} keys")
+        return data
+
+    @backoff.on_exception(backoff.expo, exception=ConnectionError, max_time=60)
+    async def mget_with_ttl(
+        self, keys: list[str]
+    ) -> list[tuple[Optional[Any], Optional[float]]]:
+        if not keys:
+            return []
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.mget(keys)
+            for key in keys:
+                pipe.pttl(key)
+            data, *ttls_ms = await pipe.execute()
+        logging.info(f"Get from cache: {len(keys)} keys")
+        return [
+            (value, ttl_ms / 1000 if ttl_ms > 0 else None)
+            for value, ttl_ms in zip(data, ttls_ms)
+        ]
+
+    @backoff.on_exception(backoff.expo, exception=ConnectionError, max_time=60)
+    async def set_many(self, items: dict[str, Any], expire: int) -> None:
+        if not items:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(key, value, ex=expire)
+                if self.last_known_good_ttl > 0:
+                    pipe.set(
+                        LAST_KNOWN_GOOD_KEY.format(key=key),
+                        value,
+                        ex=max(self.last_known_good_ttl, expire),
+                    )
+            await pipe.execute()
+        logging.info(f"Put to cache: {len(items)} keys")
+
+    @backoff.on_exception(backoff.expo, exception=ConnectionError, max_time=60)
+    async def get_last_known_good(self, key: str) -> Optional[Any]:
+        if self.last_known_good_ttl <= 0:
+            return None
+        data = await self.redis.get(LAST_KNOWN_GOOD_KEY.format(key=key))
+        logging.info(f"Get last known good from cache: {key}")
+        return data
+
+
+class MemoryCacheStorage(CacheStorage):
+    """Внутрипроцессный LRU-кэш с TTL и ограничением по занимаемой памяти.
+
+    Размер записи считается как размер ключа и значения в байтах;
+    при превышении max_bytes вытесняются давно не использованные записи.
+    """
+
+    def __init__(self, max_bytes: int, max_ttl: int):
+        self.max_bytes = max_bytes
+        self.max_ttl = max_ttl
+        self.size_bytes = 0
+        self.stats = CacheStats()
+        self.evictions = 0
+        # key -> (значение, время истечения в L1, размер записи,
+        # время истечения исходной записи)
+        self._entries: OrderedDict[
+            str, tuple[bytes, float, int, float]
+        ] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        data, _ = await self.get_with_ttl(key)
+        return data
+
+    async def get_with_ttl(
+        self, key: str
+    ) -> tuple[Optional[bytes], Optional[float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None, None
+
+        value, expire_at, _, origin_expire_at = entry
+        now = time.monotonic()
+        if expire_at <= now:
+            self._remove(key)
+            self.stats.misses += 1
+            return None, None
+
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return value, origin_expire_at - now
+
+    async def set(self, key: str, value: Any, expire: float) -> None:
+        if isinstance(value, str):
+            value = value.encode()
+
+        self._remove(key)
+        ttl = min(expire, self.max_ttl)
+        entry_size = sys.getsizeof(key) + sys.getsizeof(value)
+        if ttl <= 0 or entry_size > self.max_bytes:
+            # L1 отключён или запись больше всего кэша
+            return
+
+        now = time.monotonic()
+        self._entries[key] = (value, now + ttl, entry_size, now + expire)
+        self.size_bytes += entry_size
+
+        while self.size_bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    async def delete(self, key: str) -> None:
+        self._remove(key)
+
+    async def delete_many(self, keys: list[str]) -> None:
+        for key in keys:
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size_bytes = 0
+
+    async def mget(self, keys: list[str]) -> list[Optional[bytes]]:
+        return [await self.get(key) for key in keys]
+
+    async def mget_with_ttl(
+        self, keys: list[str]
+    ) -> list[tuple[Optional[bytes], Optional[float]]]:
+        return [await self.get_with_ttl(key) for key in keys]
+
+    async def set_many(self, items: dict[str, Any], expire: int) -> None:
+        for key, value in items.items():
+            await self.set(key, value, expire)
+
+    async def get_last_known_good(self, key: str) -> Optional[bytes]:
+        # Копии хранятся только в общем кэше
+        return None
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= entry[2]
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            **self.stats.as_dict(),
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+class TwoTierCacheStorage(CacheStorage):
+    """Двухуровневый кэш: L1 в памяти процесса перед общим L2 (Redis)"""
+
+    def __init__(
+        self,
+        local: MemoryCacheStorage,
+        remote: CacheStorage,
+        stats: CacheStats,
+    ):
+        self.local = local
+        self.remote = remote
+        self.stats = stats
+
+    async def get(self, key: str) -> Optional[Any]:
+        data, _ = await self.get_with_ttl(key)
+        return data
+
+    async def get_with_ttl(
+        self, key: str
+    ) -> tuple[Optional[Any], Optional[float]]:
+        data, ttl = await self.local.get_with_ttl(key)
+        if data is not None:
+            return data, ttl
+
+        data, ttl = await self.remote.get_with_ttl(key)
+        if data is None:
+            self.stats.misses += 1
+            return None, None
+
+        self.stats.hits += 1
+        await self.local.set(key, data, ttl or self.local.max_ttl)
+        return data, ttl
+
+    async def set(self, key: str, value: Any, expire: int) -> None:
+        await self.remote.set(key, value, expire)
+        await self.local.set(key, value, expire)
+
+    async def delete(self, key: str) -> None:
+        await self.remote.delete(key)
+        await self.local.delete(key)
+
+    async def delete_many(self, keys: list[str]) -> None:
+        await self.remote.delete_many(keys)
+        await self.local.delete_many(keys)
+
+    async def mget(self, keys: list[str]) -> list[Optional[Any]]:
+        return [data for data, _ in await self.mget_with_ttl(keys)]
+
+    async def mget_with_ttl(
+        self, keys: list[str]
+    ) -> list[tuple[Optional[Any], Optional[float]]]:
+        """Ключи, которых нет в L1, запрашиваются из L2 одним запросом"""
+        result = await self.local.mget_with_ttl(keys)
+        missing = [key for key, (data, _) in zip(keys, result) if data is None]
+        if not missing:
+            return result
+
+        remote_data = dict(
+            zip(missing, await self.remote.mget_with_ttl(missing))
+        )
+        found = 0
+        for key, (data, ttl) in remote_data.items():
+            if data:
+                found += 1
+                # Как в get_with_ttl: запись L1 знает, сколько осталось
+                # жить исходной, иначе она выглядела бы устаревшей
+                await self.local.set(key, data, ttl or self.local.max_ttl)
+        self.stats.hits += found
+        self.stats.misses += len(missing) - found
+        return [
+            entry if entry[0] is not None else remote_data[key]
+            for key, entry in zip(keys, result)
+        ]
+
+    async def set_many(self, items: dict[str, Any], expire: int) -> None:
+        await self.remote.set_many(items, expire)
+        await self.local.set_many(items, expire)
+
+    async def get_last_known_good(self, key: str) -> Optional[Any]:
+        return await self.remote.get_last_known_good(key)
+
+
+class CachePolicy:
+    """Политика stale-while-revalidate для пространства ключей.
+
+    До soft_ttl запись считается свежей, после - устаревшей: её всё ещё
+    отдают клиенту, но параллельно обновляют из search_engine.
+    По истечении hard_ttl запись удаляется из кэша.
+    """
+
+    def __init__(self, soft_ttl: int, hard_ttl: int):
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = max(hard_ttl, soft_ttl)
+
+    def is_stale(self, ttl: Optional[float]) -> bool:
+        if ttl is None:
+            return False
+        return self.hard_ttl - ttl > self.soft_ttl
+
+
+class CacheGenerations:
+    """Поколения пространств ключей списков.
+
+    Номер поколения входит в ключ каждой страницы списка, поэтому
+    увеличение счётчика в Redis одной командой INCR делает недоступными
+    все страницы пространства без SCAN; старые записи истекают по TTL.
+    Чтобы не ходить в Redis на каждый запрос, номер кэшируется
+    в процессе на ttl секунд.
+    """
+
+    def __init__(
+        self, redis: Redis, local: dict[str, tuple[int, float]], ttl: float
+    ):
+        self.redis = redis
+        self.local = local
+        self.ttl = ttl
+
+    @backoff.on_exception(backoff.expo, exception=ConnectionError, max_time=60)
+    async def get(self, namespace: str) -> int:
+        now = time.monotonic()
+        cached = self.local.get(namespace)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+
+        key = GENERATION_KEY.format(namespace=namespace)
+        generation = int(await self.redis.get(key) or 0)
+        self.local[namespace] = (generation, now + self.ttl)
+        return generation
+
+    def forget(self, namespace: str) -> None:
+        """Сбрасывает локальную копию номера после события об изменении"""
+        self.local.pop(namespace, None)
+
 
 class CacheRules:
     def need_cache(self, page_number: Optional[int] = None) -> bool:
@@ -41,9 +425,58 @@ class CacheRules:
         )
 
 
+CACHE_POLICIES = {
+    "films": CachePolicy(
+        config.settings.cache_films_soft_ttl,
+        config.settings.cache_films_hard_ttl,
+    ),
+    "persons": CachePolicy(
+        config.settings.cache_persons_soft_ttl,
+        config.settings.cache_persons_hard_ttl,
+    ),
+    "genres": CachePolicy(
+        config.settings.cache_genres_soft_ttl,
+        config.settings.cache_genres_hard_ttl,
+    ),
+    "lists": CachePolicy(
+        config.settings.cache_lists_soft_ttl,
+        config.settings.cache_lists_hard_ttl,
+    ),
+}
+
+# L1-кэш живёт всё время работы процесса и общий для всех запросов
+memory_cache = MemoryCacheStorage(
+    max_bytes=config.settings.l1_cache_max_bytes,
+    max_ttl=config.settings.l1_cache_ttl,
+)
+redis_cache_stats = CacheStats()
+# Локальные копии номеров поколений: namespace -> (номер, срок годности)
+generation_memo: dict[str, tuple[int, float]] = {}
+
+register_metrics(
+    "cache",
+    lambda: {"l1": memory_cache.metrics(), "l2": redis_cache_stats.as_dict()},
+)
+
+
 async def get_redis(request: Request) -> Redis:
     return request.app.state.cache_engine
 
 
 def get_cache_storage(redis: Redis = Depends(get_redis)) -> CacheStorage:
-    return RedisCacheStorage(redis)
+    return TwoTierCacheStorage(
+        local=memory_cache,
+        remote=RedisCacheStorage(
+            redis,
+            last_known_good_ttl=config.settings.cache_last_known_good_ttl,
+        ),
+        stats=redis_cache_stats,
+    )
+
+
+def get_cache_generations(
+    redis: Redis = Depends(get_redis),
+) -> CacheGenerations:
+    return CacheGenerations(
+        redis, local=generation_memo, ttl=config.settings.cache_generation_ttl
+    )
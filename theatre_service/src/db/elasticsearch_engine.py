@@ -1,64 +1,245 @@
-from typing import Dict, Any
+from typing import AsyncIterator, Dict, Any, Optional
 
 from elastic_transport import ObjectApiResponse
-from elasticsearch import AsyncElasticsearch, NotFoundError
+from elasticsearch import (
+    ApiError,
+    AsyncElasticsearch,
+    NotFoundError,
+    TransportError,
+)
 from elasticsearch.exceptions import ConnectionError
 import backoff
 
-from .search_engine import SearchEngine
+from .search_engine import (
+    Projection,
+    SearchEngine,
+    SearchContextMissing,
+    search_engine_breaker,
+)
+from common.services_functions import sort_order
 from core import config
 
+# Корзины фасета рейтингов фильмов
+RATING_FACET_RANGES = [
+    {"key": "0-2", "to": 2},
+    {"key": "2-4", "from": 2, "to": 4},
+    {"key": "4-6", "from": 4, "to": 6},
+    {"key": "6-8", "from": 6, "to": 8},
+    {"key": "8-10", "from": 8},
+]
+GENRE_FACET_SIZE = 100
+
+
+def is_unavailable(e: Exception) -> bool:
+    """Отказ кластера, в отличие от ошибки в самом запросе"""
+    if isinstance(e, ApiError):
+        return e.status_code >= 500 or e.status_code == 429
+    return isinstance(e, TransportError)
+
+
+def source_params(projection: Optional[Projection]) -> dict[str, Any]:
+    """Фильтр _source в виде параметров запросов get и mget"""
+    if projection is None:
+        return {}
+    source_filter = projection.source_filter()
+    if isinstance(source_filter, bool):
+        return {"source": source_filter}
+    return {f"source_{key}": value for key, value in source_filter.items()}
+
+
+protected = search_engine_breaker.protect(is_failure=is_unavailable)
+retried = backoff.on_exception(
+    backoff.expo,
+    exception=ConnectionError,
+    max_time=config.settings.es_backoff_max_time,
+)
+
 
 class ElasticsearchEngine(SearchEngine):
     def __init__(self, hosts: list[str]):
-        self.client = AsyncElasticsearch(hosts=hosts)
+        self.client = AsyncElasticsearch(
+            hosts=hosts, request_timeout=config.settings.es_request_timeout
+        )
 
-    @backoff.on_exception(backoff.expo, exception=ConnectionError, max_time=60)
+    @protected
+    @retried
     async def search(self, index: str, body: Dict) -> ObjectApiResponse:
+        if "pit" in body:
+            # Запрос по point in time не должен указывать индекс
+            try:
+                return await self.client.search(body=body)
+            except NotFoundError as e:
+                raise SearchContextMissing(str(e))
         response = await self.client.search(index=index, body=body)
         return response
 
-    @backoff.on_exception(backoff.expo, exception=ConnectionError, max_time=60)
-    async def get(self, index: str, id: str) -> ObjectApiResponse:
+    @protected
+    @retried
+    async def mget(
+        self,
+        index: str,
+        ids: list[str],
+        projection: Optional[Projection] = None,
+    ) -> list[dict]:
+        if not ids:
+            return []
+        response = await self.client.mget(
+            index=index, ids=ids, **source_params(projection)
+        )
+        return [doc for doc in response["docs"] if doc.get("found")]
+
+    @protected
+    @retried
+    async def msearch(self, index: str, bodies: list[dict]) -> list[dict]:
+        searches = []
+        for body in bodies:
+            searches.extend(({"index": index}, body))
+        response = await self.client.msearch(searches=searches)
+        return response["responses"]
+
+    @protected
+    @retried
+    async def open_point_in_time(self, index: str, keep_alive: str) -> str:
+        response = await self.client.open_point_in_time(
+            index=index, keep_alive=keep_alive
+        )
+        return response["id"]
+
+    async def close_point_in_time(self, pit_id: str) -> None:
         try:
-            response = await self.client.get(index=index, id=id)
+            await self.client.close_point_in_time(id=pit_id)
+        except NotFoundError:
+            pass
+
+    @protected
+    @retried
+    async def get(
+        self, index: str, id: str, projection: Optional[Projection] = None
+    ) -> ObjectApiResponse:
+        try:
+            response = await self.client.get(
+                index=index, id=id, **source_params(projection)
+            )
             return response
         except NotFoundError:
             return None
 
-    def film_parameters_to_body(
-        self, parameters: dict[str, Any], query: dict[str, Any]
-    ) -> dict:
-        order = parameters.get("sort_order", "desc")
+    async def scan(
+        self,
+        index: str,
+        fields: list[str],
+        query: Optional[dict[str, Any]] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[list[dict]]:
+        pit_id = await self.open_point_in_time(
+            index=index, keep_alive=config.settings.es_pit_keep_alive
+        )
+        search_after = None
+        try:
+            while True:
+                body = self.paginate_body(
+                    {"query": query or {"match_all": {}}, "_source": fields},
+                    {
+                        "page_size": batch_size,
+                        "pit_id": pit_id,
+                        "search_after": search_after,
+                    },
+                    sort=[],
+                )
+                response = await self.search(index=index, body=body)
+                pit_id = response.get("pit_id", pit_id)
+                hits = response["hits"]["hits"]
+                if not hits:
+                    break
+                yield hits
+                search_after = hits[-1]["sort"]
+        finally:
+            await self.close_point_in_time(pit_id)
+
+    async def suggest(
+        self,
+        index: str,
+        field: str,
+        prefix: str,
+        size: int,
+        source: list[str],
+    ) -> list[dict]:
         body = {
-            "from": (parameters["page_number"] - 1) * parameters["page_size"],
-            "size": parameters["page_size"],
-            "query": query,
-            "sort": [{"imdb_rating": {"order": order}}],
+            # Подсказкам нужны только варианты completion, обычные
+            # результаты поиска не запрашиваются
+            "size": 0,
+            "_source": source,
+            "suggest": {
+                "suggestions": {
+                    "prefix": prefix,
+                    "completion": {"field": field, "size": size},
+                }
+            },
         }
+        response = await self.search(index=index, body=body)
+        return response["suggest"]["suggestions"][0]["options"]
+
+    def project_body(
+        self, body: dict[str, Any], projection: Optional[Projection]
+    ) -> dict:
+        """Ограничивает поля документов в ответе"""
+        if projection is None:
+            return body
+        body["_source"] = projection.source_filter()
+        if projection.docvalue_fields:
+            body["docvalue_fields"] = list(projection.docvalue_fields)
+        return body
+
+    def paginate_body(
+        self,
+        body: dict[str, Any],
+        parameters: dict[str, Any],
+        sort: list[dict[str, Any]],
+    ) -> dict:
+        """Добавляет в запрос пагинацию: по номеру страницы (from/size)
+        или по курсору (point in time + search_after)"""
+        body["size"] = parameters["page_size"]
+        if parameters.get("pit_id"):
+            body["pit"] = {
+                "id": parameters["pit_id"],
+                "keep_alive": config.settings.es_pit_keep_alive,
+            }
+            # _shard_doc - уникальный в пределах PIT порядок документов
+            body["sort"] = [*sort, {"_shard_doc": "asc"}]
+            if parameters.get("search_after"):
+                body["search_after"] = parameters["search_after"]
+            return body
+
+        page_number = parameters["page_number"]
+        body["from"] = (page_number - 1) * parameters["page_size"]
+        if sort:
+            body["sort"] = sort
         return body
 
+    def film_parameters_to_body(
+        self, parameters: dict[str, Any], query: dict[str, Any]
+    ) -> dict:
+        order = sort_order(parameters.get("sort"))
+        # Индекс фильмов отсортирован по убыванию рейтинга: без подсчёта
+        # общего числа совпадений такой запрос читает из каждого сегмента
+        # только первые документы
+        return self.paginate_body(
+            {"query": query, "track_total_hits": False},
+            parameters,
+            sort=[{"imdb_rating": {"order": order}}],
+        )
+
     def genre_parameters_to_body(
         self, parameters: dict[str, Any], query: dict[str, Any]
     ) -> dict:
-        body = {
-            "from": (parameters["page_number"] - 1) * parameters["page_size"],
-            "size": parameters["page_size"],
-            "query": query,
-        }
-        return body
+        return self.paginate_body({"query": query}, parameters, sort=[])
 
     def person_parameters_to_body(
         self, parameters: dict[str, Any], query: dict[str, Any]
     ) -> dict:
         # order = parameters.get("sort_order", "desc")
-        body = {
-            "from": (parameters["page_number"] - 1) * parameters["page_size"],
-            "size": parameters["page_size"],
-            "query": query,
-            # "sort": [{"full_name": {"order": order}}]
-        }
-        return body
+        # "sort": [{"full_name": {"order": order}}]
+        return self.paginate_body({"query": query}, parameters, sort=[])
 
     def make_similar_films_query(self, parameters):
         query = {
@@ -84,19 +265,25 @@ class ElasticsearchEngine(SearchEngine):
         return query
 
     def make_film_query_by_params(self, parameters: dict[str, Any]) -> dict:
-        query = {"bool": {"must": []}}
-        genres_query = {
-            "nested": {"path": "genres", "query": {"bool": {"must": []}}}
-        }
+        # Выдача сортируется по рейтингу, поэтому условия работают
+        # в контексте фильтра: релевантность не вычисляется
+        filters = []
         # Фильтр по жанру
         if parameters.get("genre_id"):
-            genres_query["nested"]["query"]["bool"]["must"].append(
-                {"term": {"genres.uuid": parameters["genre_id"]}}
+            filters.append(
+                {
+                    "nested": {
+                        "path": "genres",
+                        "query": {
+                            "term": {"genres.uuid": parameters["genre_id"]}
+                        },
+                    }
+                }
             )
 
         # Поиск по запросу (название или описание)
         if parameters.get("query"):
-            query["bool"]["must"].append(
+            filters.append(
                 {
                     "multi_match": {
                         "query": parameters["query"],
@@ -105,38 +292,105 @@ class ElasticsearchEngine(SearchEngine):
                 }
             )
 
-        final_query = {"bool": {"must": [query]}}
-        if parameters.get("genre_id"):
-            final_query["bool"]["must"].append(genres_query)
-
-        return final_query
+        if not filters:
+            # Запрос без условий совпадает с сортировкой индекса
+            # и завершается досрочно
+            return {"match_all": {}}
+        return {"bool": {"filter": filters}}
 
     async def search_similar_films(
-        self, parameters: dict[str, Any], index: str
+        self,
+        parameters: dict[str, Any],
+        index: str,
+        projection: Optional[Projection] = None,
     ):
         body = self.film_parameters_to_body(
             parameters=parameters,
             query=self.make_similar_films_query(parameters),
         )
-        return await self.search(index=index, body=body)
+        return await self.search(
+            index=index, body=self.project_body(body, projection)
+        )
 
     async def search_films_by_params(
-        self, parameters: dict[str, Any], index: str
+        self,
+        parameters: dict[str, Any],
+        index: str,
+        projection: Optional[Projection] = None,
     ):
         body = self.film_parameters_to_body(
             parameters=parameters,
             query=self.make_film_query_by_params(parameters),
         )
-        return await self.search(index=index, body=body)
+        return await self.search(
+            index=index, body=self.project_body(body, projection)
+        )
+
+    async def search_films_with_facets(
+        self,
+        parameters: dict[str, Any],
+        index: str,
+        projection: Optional[Projection] = None,
+    ) -> tuple[dict, dict]:
+        """Оба запроса уходят в Elasticsearch одним _msearch.
+
+        Фасет рейтингов считается вместе со страницей фильмов. Фасет
+        жанров считается без фильтра по жанру: он показывает, сколько
+        фильмов найдётся в каждом жанре при смене фильтра.
+        """
+        hits_body = self.film_parameters_to_body(
+            parameters=parameters,
+            query=self.make_film_query_by_params(parameters),
+        )
+        self.project_body(hits_body, projection)
+        hits_body["track_total_hits"] = True
+        hits_body["aggs"] = {
+            "ratings": {
+                "range": {
+                    "field": "imdb_rating",
+                    "ranges": RATING_FACET_RANGES,
+                }
+            }
+        }
+        genres_body = {
+            "size": 0,
+            "query": self.make_film_query_by_params(
+                {**parameters, "genre_id": None}
+            ),
+            "aggs": {
+                "genres": {
+                    "nested": {"path": "genres"},
+                    "aggs": {
+                        "ids": {
+                            "terms": {
+                                "field": "genres.uuid",
+                                "size": GENRE_FACET_SIZE,
+                            }
+                        }
+                    },
+                }
+            },
+        }
+        responses = await self.msearch(index, [hits_body, genres_body])
+        for response in responses:
+            if "error" in response:
+                raise RuntimeError(response["error"])
+        hits, genres = responses
+        return hits, genres
 
     async def search_genres_by_params(
-        self, parameters: dict[str, Any], index: str
+        self,
+        parameters: dict[str, Any],
+        index: str,
+        projection: Optional[Projection] = None,
     ):
         body = self.genre_parameters_to_body(
             parameters=parameters,
             query=self.make_genres_query_by_params(parameters),
         )
-        return await self.search(index=index, body=body)
+        return await self.search(
+            index=index, body=self.project_body(body, projection)
+        )
 
     def make_genres_query_by_params(self, parameters: dict[str, Any]):
         query = {"bool": {"must": []}}
@@ -171,13 +425,18 @@ class ElasticsearchEngine(SearchEngine):
         return query
 
     async def search_persons_by_params(
-        self, parameters: dict[str, Any], index: str
+        self,
+        parameters: dict[str, Any],
+        index: str,
+        projection: Optional[Projection] = None,
     ):
         body = self.person_parameters_to_body(
             parameters=parameters,
             query=self.make_persons_query_by_params(parameters),
         )
-        return await self.search(index=index, body=body)
+        return await self.search(
+            index=index, body=self.project_body(body, projection)
+        )
 
 
 async def init_elastic() -> ElasticsearchEngine:
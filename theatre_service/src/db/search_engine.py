@@ -1,5 +1,53 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Optional, Any
+from typing import AsyncIterator, Dict, Optional, Any, Union
+
+from common.circuit_breaker import CircuitBreaker
+from core import config
+from core.metrics import register_metrics
+
+
+class SearchContextMissing(Exception):
+    """Point in time, по которому продолжается обход, уже закрыт"""
+
+
+class Projection:
+    """Поля документа, которые читает вызывающий код.
+
+    includes и excludes ограничивают возвращаемый _source, source=False
+    отключает его совсем. docvalue_fields читаются из doc values
+    и возвращаются в hit["fields"] списками значений; у get и mget их нет,
+    там действует только фильтр _source.
+    """
+
+    def __init__(
+        self,
+        includes: tuple[str, ...] = (),
+        excludes: tuple[str, ...] = (),
+        docvalue_fields: tuple[str, ...] = (),
+        source: bool = True,
+    ):
+        self.includes = includes
+        self.excludes = excludes
+        self.docvalue_fields = docvalue_fields
+        self.source = source
+
+    def source_filter(self) -> Union[bool, dict[str, list[str]]]:
+        if not self.source:
+            return False
+        if not self.includes and not self.excludes:
+            return True
+        source_filter = {}
+        if self.includes:
+            source_filter["includes"] = list(self.includes)
+        if self.excludes:
+            source_filter["excludes"] = list(self.excludes)
+        return source_filter
+
+
+def docvalue(hit: dict, field: str) -> Any:
+    """Первое значение поля из docvalue_fields или None"""
+    values = hit.get("fields", {}).get(field)
+    return values[0] if values else None
 
 
 class SearchEngine(ABC):
@@ -8,7 +56,68 @@ class SearchEngine(ABC):
         pass
 
     @abstractmethod
-    async def get(self, index: str, id: str):
+    async def mget(
+        self,
+        index: str,
+        ids: list[str],
+        projection: Optional[Projection] = None,
+    ) -> list[dict]:
+        """Документы по списку идентификаторов за один запрос.
+        Ненайденные документы в результат не попадают"""
+        pass
+
+    @abstractmethod
+    def scan(
+        self,
+        index: str,
+        fields: list[str],
+        query: Optional[dict[str, Any]] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[list[dict]]:
+        """Обход всех документов индекса пачками (только поля fields)"""
+        pass
+
+    @abstractmethod
+    async def open_point_in_time(self, index: str, keep_alive: str) -> str:
+        pass
+
+    @abstractmethod
+    async def close_point_in_time(self, pit_id: str) -> None:
+        pass
+
+    @abstractmethod
+    async def get(
+        self, index: str, id: str, projection: Optional[Projection] = None
+    ):
+        pass
+
+    @abstractmethod
+    async def msearch(self, index: str, bodies: list[dict]) -> list[dict]:
+        """Несколько поисковых запросов к индексу за один вызов;
+        ответы в порядке запросов"""
+        pass
+
+    @abstractmethod
+    async def search_films_with_facets(
+        self,
+        parameters: dict[str, Any],
+        index: str,
+        projection: Optional[Projection] = None,
+    ) -> tuple[dict, dict]:
+        """Страница фильмов с фасетом рейтингов и фасет жанров"""
+        pass
+
+    @abstractmethod
+    async def suggest(
+        self,
+        index: str,
+        field: str,
+        prefix: str,
+        size: int,
+        source: list[str],
+    ) -> list[dict]:
+        """Документы, у которых один из входов completion-поля field
+        начинается с prefix, по убыванию веса"""
         pass
 
     @abstractmethod
@@ -31,7 +140,10 @@ class SearchEngine(ABC):
 
     @abstractmethod
     async def search_similar_films(
-        self, parameters: dict[str, Any], index: str
+        self,
+        parameters: dict[str, Any],
+        index: str,
+        projection: Optional[Projection] = None,
     ):
         pass
 
@@ -45,13 +157,19 @@ class SearchEngine(ABC):
 
     @abstractmethod
     async def search_films_by_params(
-        self, parameters: dict[str, Any], index: str
+        self,
+        parameters: dict[str, Any],
+        index: str,
+        projection: Optional[Projection] = None,
     ):
         pass
 
     @abstractmethod
     async def search_genres_by_params(
-        self, parameters: dict[str, Any], index: str
+        self,
+        parameters: dict[str, Any],
+        index: str,
+        projection: Optional[Projection] = None,
     ):
         pass
 
@@ -61,7 +179,10 @@ class SearchEngine(ABC):
 
     @abstractmethod
     async def search_persons_by_params(
-        self, parameters: dict[str, Any], index: str
+        self,
+        parameters: dict[str, Any],
+        index: str,
+        projection: Optional[Projection] = None,
     ):
         pass
 
@@ -75,3 +196,12 @@ async def get_search_engine() -> SearchEngine:
 
 
 engine: Optional[SearchEngine] = None
+
+# Предохранитель общий для всех запросов процесса к search_engine
+search_engine_breaker = CircuitBreaker(
+    "search engine",
+    failure_threshold=config.settings.es_breaker_failure_threshold,
+    recovery_timeout=config.settings.es_breaker_recovery_timeout,
+    half_open_max_calls=config.settings.es_breaker_half_open_max_calls,
+)
+register_metrics("search_engine_breaker", search_engine_breaker.metrics)
@@ -1,15 +1,27 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.responses import ORJSONResponse
 import sentry_sdk
 
-from api.v1 import films, genres, persons
+from api.v1 import films, genres, metrics, persons, suggest
 from core.config import settings
 from db.redis import init_redis
 from db import search_engine
 from db.elasticsearch_engine import init_elastic
+from services.cache_warmer import cache_warmer, run_cache_warmer
+from services.genre_catalogue import (
+    genre_catalogue,
+    run_genre_catalogue_updater,
+)
+from services.invalidation import cache_invalidator, run_invalidation_consumer
+from services.recommendations import (
+    recommendation_index,
+    run_recommendation_index_updater,
+)
+from services.similarity import run_similarity_index_updater, similarity_index
 
 sentry_sdk.init(dsn=settings.sentry_dsn_theatre)
 
@@ -20,7 +32,38 @@ async def lifespan(app: FastAPI):
         # Код, выполняемый при запуске приложения
         app.state.cache_engine = await init_redis()
         search_engine.engine = await init_elastic()
+        similarity_updater = asyncio.create_task(
+            run_similarity_index_updater(
+                similarity_index, search_engine.engine
+            )
+        )
+        genre_catalogue_updater = asyncio.create_task(
+            run_genre_catalogue_updater(genre_catalogue, search_engine.engine)
+        )
+        recommendations_updater = asyncio.create_task(
+            run_recommendation_index_updater(
+                recommendation_index, app.state.cache_engine
+            )
+        )
+        invalidation_consumer = asyncio.create_task(
+            run_invalidation_consumer(
+                cache_invalidator, app.state.cache_engine
+            )
+        )
+        warmer = None
+        if settings.cache_warmer_enabled:
+            await warm_cache_on_startup(app)
+            warmer = asyncio.create_task(
+                run_cache_warmer(cache_warmer, app, app.state.cache_engine)
+            )
         yield
+        if warmer is not None:
+            warmer.cancel()
+            await cache_warmer.flush(app.state.cache_engine)
+        invalidation_consumer.cancel()
+        similarity_updater.cancel()
+        genre_catalogue_updater.cancel()
+        recommendations_updater.cancel()
     except Exception as e:
         logging.error(f"Lifespan error: {e}")
         raise
@@ -30,6 +73,17 @@ async def lifespan(app: FastAPI):
         await search_engine.engine.client.close()
 
 
+async def warm_cache_on_startup(app: FastAPI):
+    """Первый прогрев до приёма трафика, но не дольше таймаута"""
+    try:
+        await asyncio.wait_for(
+            cache_warmer.warm(app, app.state.cache_engine),
+            timeout=settings.cache_warmer_startup_timeout,
+        )
+    except Exception as e:
+        logging.warning(f"Startup cache warming incomplete: {e!r}")
+
+
 app = FastAPI(
     title=settings.project_name,
     description=settings.project_description,
@@ -41,8 +95,17 @@ app = FastAPI(
 )
 
 
+@app.middleware("http")
+async def record_hot_requests(request: Request, call_next):
+    response = await call_next(request)
+    cache_warmer.record(request, response.status_code)
+    return response
+
+
 # Подключаем роутер к серверу, указав префикс
 # Теги указываем для удобства навигации по документации
 app.include_router(films.router, prefix="/api/v1/films", tags=["films"])
 app.include_router(persons.router, prefix="/api/v1/persons", tags=["persons"])
 app.include_router(genres.router, prefix="/api/v1/genres", tags=["genres"])
+app.include_router(suggest.router, prefix="/api/v1/suggest", tags=["suggest"])
+app.include_router(metrics.router, prefix="/api/v1/metrics", tags=["metrics"])
@@ -1,5 +1,6 @@
 # Используем pydantic для упрощения работы
 # при перегонке данных из json в объекты
+from datetime import date
 from typing import Optional
 
 from pydantic import BaseModel
@@ -35,6 +36,12 @@ class Genre(GenreCommon, FilmList):
 
 class FilmOfPerson(FilmCommon):
     roles: list[str] = []
+    creation_date: Optional[date] = None
+    access: list[Access] = []
+
+
+class Filmography(BaseModel):
+    films: list[FilmOfPerson] = []
 
 
 class Person(PersonCommon):
@@ -43,6 +50,7 @@ class Person(PersonCommon):
 
 class Film(FilmCommon):
     description: Optional[str] = None
+    creation_date: Optional[date] = None
     genres: list[GenreCommon] = []
     directors: list[PersonCommon] = []
     actors: list[PersonCommon] = []
@@ -50,6 +58,21 @@ class Film(FilmCommon):
     access: list[Access] = []
 
 
+class GenreFacet(GenreCommon):
+    count: int = 0
+
+
+class RatingFacet(BaseModel):
+    key: str = ""
+    count: int = 0
+
+
+class FacetedFilms(FilmList):
+    total: int = 0
+    genres: list[GenreFacet] = []
+    ratings: list[RatingFacet] = []
+
+
 class PersonList(BaseModel):
     persons: list[Person] = []
 
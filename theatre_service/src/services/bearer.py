@@ -1,11 +1,23 @@
+import hmac
 import http
 from typing import Optional
 
 from jose import jwt
 from fastapi import HTTPException, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from verified_tokens import VerifiedTokenCache
 
 from core.config import settings
+from core.metrics import register_metrics
+
+# Сколько проверенных токенов помнит процесс
+VERIFIED_TOKENS_MAX_ENTRIES = 10_000
+
+# Заголовок с ключом служебных запросов других сервисов
+INTERNAL_AUTH_HEADER = "X-Internal-Auth"
+
+verified_tokens = VerifiedTokenCache(VERIFIED_TOKENS_MAX_ENTRIES)
+register_metrics("verified_tokens", verified_tokens.metrics)
 
 
 def decode_token(token: str) -> Optional[dict]:
@@ -15,15 +27,22 @@ def decode_token(token: str) -> Optional[dict]:
     Возвращает содержимое токена в виде словаря или None,
     если токен невалиден или при декодировании
     было выброшено исключение.
+    Подпись токена, уже проверенного ранее, повторно не проверяется,
+    пока не наступит его exp.
     """
+    payload = verified_tokens.get(token)
+    if payload is not None:
+        return payload
     try:
-        return jwt.decode(
+        payload = jwt.decode(
             token,
             settings.jwt_secret_key,
             algorithms=[settings.jwt_algorithm],
         )
     except Exception:
         return None
+    verified_tokens.set(token, payload)
+    return payload
 
 
 class JWTBearer(HTTPBearer):
@@ -78,4 +97,42 @@ class JWTBearer(HTTPBearer):
         return decode_token(jwt_token)
 
 
+class InternalOrJWTBearer(JWTBearer):
+    """
+    Пропускает служебный запрос с ключом в заголовке X-Internal-Auth
+    или запрос пользователя с токеном. Для служебного запроса
+    возвращается содержимое без user_id и ролей с флагом internal.
+    """
+
+    async def __call__(self, request: Request) -> dict:
+        internal_key = request.headers.get(INTERNAL_AUTH_HEADER)
+        if internal_key is None:
+            return await super().__call__(request)
+
+        secret_key = settings.notification_api_secret_key
+        if not secret_key or not hmac.compare_digest(
+            internal_key.encode(), secret_key.encode()
+        ):
+            raise HTTPException(
+                status_code=http.HTTPStatus.FORBIDDEN,
+                detail="Invalid authentication",
+            )
+        return {"internal": True, "roles": []}
+
+
+class OptionalJWTBearer(JWTBearer):
+    """
+    Токен необязателен: без заголовка Authorization возвращается
+    пустое содержимое, как у анонимного пользователя без ролей.
+    Переданный токен проверяется так же, как в JWTBearer.
+    """
+
+    async def __call__(self, request: Request) -> dict:
+        if "authorization" not in request.headers:
+            return {}
+        return await super().__call__(request)
+
+
 security_jwt = JWTBearer()
+security_optional_jwt = OptionalJWTBearer()
+security_internal_or_jwt = InternalOrJWTBearer()
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from http import HTTPStatus
+from typing import Any, Iterable
+from urllib.parse import parse_qsl, urlencode
+
+import httpx
+from fastapi import FastAPI, Request
+from redis.asyncio import Redis
+
+from core.config import settings
+from core.metrics import register_metrics
+from db.search_engine import search_engine_breaker
+
+# Частоты запросов живого трафика, общие для всех воркеров
+HOT_REQUESTS_KEY = "cache_warmer:hot_requests"
+# При каждой выгрузке старые частоты уменьшаются вдвое,
+# чтобы в топ попадали запросы, популярные сейчас
+HOT_REQUESTS_DECAY = 0.5
+# Затухание за период выполняет один воркер - тот, кто первым
+# создал ключ периода
+HOT_REQUESTS_DECAY_LOCK_KEY = "cache_warmer:decay:{period}"
+# Прогрев за период тоже выполняет один воркер: кэш в Redis общий,
+# и повторять те же запросы в каждом воркере незачем
+WARM_LOCK_KEY = "cache_warmer:warm:{period}"
+# Запросы самого прогревателя в частоты не попадают
+WARMER_HEADER = "X-Cache-Warmer"
+WARMED_PREFIXES = ("/api/v1/films", "/api/v1/persons", "/api/v1/genres")
+
+
+class CacheWarmer:
+    """Прогрев кэша популярными запросами.
+
+    Прогреватель выполняет запросы через само приложение (ASGI),
+    поэтому ключи кэша получаются ровно такими же, как у клиентов.
+    Кроме постоянного списка запросов он прогревает top_n самых частых
+    запросов живого трафика: воркеры считают их в памяти и периодически
+    выгружают в ZSET Redis, который переживает перезапуск.
+    За период прогрев выполняет только один воркер, и одновременно
+    выполняется не более concurrency запросов, а при разомкнутом
+    предохранителе search_engine прогрев не выполняется.
+    """
+
+    def __init__(
+        self,
+        queries: Iterable[str],
+        top_n: int,
+        concurrency: int,
+        max_tracked: int,
+        interval: int,
+    ):
+        self.queries = list(queries)
+        self.interval = max(interval, 1)
+        self.top_n = top_n
+        self.concurrency = concurrency
+        self.max_tracked = max_tracked
+        self._counts: Counter[str] = Counter()
+        self.runs = 0
+        self.warmed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.delegated = 0
+        self.last_duration = 0.0
+
+    def record(self, request: Request, status_code: int) -> None:
+        """Учитывает успешный анонимный GET-запрос к спискам и карточкам"""
+        if (
+            request.method != "GET"
+            or status_code not in (HTTPStatus.OK, HTTPStatus.NOT_MODIFIED)
+            or not request.url.path.startswith(WARMED_PREFIXES)
+            or WARMER_HEADER in request.headers
+            or "authorization" in request.headers
+        ):
+            return
+        params = parse_qsl(request.url.query)
+        if any(name == "cursor" for name, _ in params):
+            # Курсоры ссылаются на point in time и быстро истекают
+            return
+
+        key = request.url.path
+        if params:
+            key = f"{key}?{urlencode(sorted(params))}"
+        if key in self._counts or len(self._counts) < self.max_tracked:
+            self._counts[key] += 1
+
+    async def flush(self, redis: Redis) -> None:
+        """Выгружает накопленные частоты в Redis.
+
+        Частоты уменьшаются один раз за период независимо от числа
+        воркеров, остальные воркеры только добавляют свои счётчики.
+        """
+        counts, self._counts = self._counts, Counter()
+        elected = await self._elect(redis, HOT_REQUESTS_DECAY_LOCK_KEY)
+        async with redis.pipeline(transaction=False) as pipe:
+            if elected:
+                pipe.zunionstore(
+                    HOT_REQUESTS_KEY, {HOT_REQUESTS_KEY: HOT_REQUESTS_DECAY}
+                )
+            for key, count in counts.items():
+                pipe.zincrby(HOT_REQUESTS_KEY, count, key)
+            pipe.zremrangebyrank(HOT_REQUESTS_KEY, 0, -self.max_tracked - 1)
+            await pipe.execute()
+
+    async def hot_requests(self, redis: Redis) -> list[str]:
+        if self.top_n <= 0:
+            return []
+        keys = await redis.zrevrange(HOT_REQUESTS_KEY, 0, self.top_n - 1)
+        return [key.decode() for key in keys]
+
+    async def _elect(self, redis: Redis, lock_key: str) -> bool:
+        """Первый воркер, создавший ключ текущего периода"""
+        period = int(time.time() // self.interval)
+        return bool(
+            await redis.set(
+                lock_key.format(period=period),
+                1,
+                nx=True,
+                ex=self.interval * 2,
+            )
+        )
+
+    async def warm(self, app: FastAPI, redis: Redis) -> None:
+        """Прогревает кэш, если в этом периоде его ещё не прогрел
+        другой воркер"""
+        try:
+            elected = await self._elect(redis, WARM_LOCK_KEY)
+        except Exception as e:
+            # Без Redis воркеры не договорятся, прогрев идёт в каждом
+            logging.warning(f"Cache warming lock is unavailable: {e}")
+            elected = True
+        if not elected:
+            self.delegated += 1
+            return
+
+        started = time.monotonic()
+        try:
+            hot = await self.hot_requests(redis)
+        except Exception as e:
+            logging.warning(f"Hot requests are unavailable: {e}")
+            hot = []
+        requests = list(dict.fromkeys([*self.queries, *hot]))
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://cache-warmer",
+            headers={WARMER_HEADER: "1"},
+        ) as client:
+            await asyncio.gather(
+                *(self._fetch(client, semaphore, url) for url in requests)
+            )
+
+        self.runs += 1
+        self.last_duration = time.monotonic() - started
+        logging.info(
+            f"Cache warmed: {len(requests)} requests "
+            f"in {self.last_duration:.2f}s"
+        )
+
+    async def _fetch(
+        self,
+        client: httpx.AsyncClient,
+        semaphore: asyncio.Semaphore,
+        url: str,
+    ) -> None:
+        async with semaphore:
+            if search_engine_breaker.is_open:
+                self.skipped += 1
+                return
+            try:
+                response = await client.get(url)
+            except Exception as e:
+                self.failed += 1
+                logging.warning(f"Cache warming of {url} failed: {e}")
+                return
+        if response.status_code == HTTPStatus.OK:
+            self.warmed += 1
+        else:
+            self.failed += 1
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "warmed": self.warmed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "delegated": self.delegated,
+            "tracked": len(self._counts),
+            "last_duration": self.last_duration,
+        }
+
+
+async def run_cache_warmer(warmer: CacheWarmer, app: FastAPI, redis: Redis):
+    """Периодически выгружает частоты запросов и прогревает кэш"""
+    while True:
+        await asyncio.sleep(settings.cache_warmer_interval)
+        try:
+            await warmer.flush(redis)
+            await warmer.warm(app, redis)
+        except Exception as e:
+            logging.error(f"Cache warming failed: {e}")
+
+
+cache_warmer = CacheWarmer(
+    queries=settings.cache_warmer_queries,
+    top_n=settings.cache_warmer_top_n,
+    concurrency=settings.cache_warmer_concurrency,
+    max_tracked=settings.cache_warmer_max_tracked,
+    interval=settings.cache_warmer_interval,
+)
+register_metrics("cache_warmer", cache_warmer.metrics)
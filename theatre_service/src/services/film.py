@@ -1,26 +1,101 @@
-from functools import lru_cache
-from typing import Optional, Dict, Any
+from functools import lru_cache, partial
+from typing import Optional, Dict, Any, Awaitable, Callable
 from http import HTTPStatus
 import logging
 
 from fastapi import Depends, HTTPException
+from redis.asyncio import Redis
 
+from common.cursor import search_by_cursor
+from common.revalidation import get_or_revalidate
 from common.services_functions import make_cache_key, check_access
-from db.search_engine import get_search_engine, SearchEngine
-from db.cache import get_cache_storage, CacheRules, CacheStorage
-from models.models import Film, FilmCommon, FilmList
+from common.single_flight import RedisLock, SingleFlight
+from core.config import settings
+from core.metrics import register_metrics
+from db.search_engine import get_search_engine, Projection, SearchEngine
+from db.cache import (
+    get_cache_generations,
+    get_cache_storage,
+    get_redis,
+    CacheGenerations,
+    CacheRules,
+    CacheStorage,
+    CachePolicy,
+    CACHE_POLICIES,
+)
+from models.models import (
+    FacetedFilms,
+    Film,
+    FilmCommon,
+    FilmList,
+    GenreFacet,
+    RatingFacet,
+)
+from services.genre_catalogue import genre_catalogue
+from services.genre_films import GenreFilmsIndex
+from services.recommendations import recommendation_index
+from services.similarity import similarity_index
 
-FILM_CACHE_EXPIRE_IN_SECONDS = 60 * 5  # 5 минут
 FILM_ES_INDEX = "movies"
+# Готовые тела ответов API хранятся отдельно от моделей фильмов
+FILM_RESPONSE_PREFIX = f"{FILM_ES_INDEX}_response"
+# Списки похожих фильмов кэшируются отдельно для каждого фильма
+FILM_SIMILAR_PREFIX = f"{FILM_ES_INDEX}_similar"
+# Ответы поиска с фасетами
+FILM_FACETED_PREFIX = f"{FILM_ES_INDEX}_faceted"
+FILM_CACHE_POLICY = CACHE_POLICIES["films"]
+# Поля документов фильмов, которые читает каждый эндпоинт: списку нужны
+# только название и рейтинг, карточке - всё, кроме служебных полей ETL
+FILM_LIST_PROJECTION = Projection(includes=("title", "imdb_rating"))
+FILM_GENRES_PROJECTION = Projection(includes=("id", "title", "genres"))
+FILM_DETAIL_PROJECTION = Projection(
+    excludes=(
+        "title_suggest",
+        "directors_names",
+        "actors_names",
+        "writers_names",
+        "last_change_date",
+    )
+)
+FILM_LIST_CACHE_POLICY = CACHE_POLICIES["lists"]
+
+Refresh = Optional[Callable[[], Awaitable[Any]]]
+FilmRender = Callable[[Film], bytes]
+FilmListRender = Callable[[list[FilmCommon]], bytes]
+FacetedFilmsRender = Callable[[FacetedFilms], bytes]
+
+# Одна загрузка из search_engine на ключ кэша в пределах воркера
+film_single_flight = SingleFlight()
+register_metrics("films_single_flight", film_single_flight.metrics)
 
 
 class FilmCacheService:
-    def __init__(self, cache: CacheStorage, cache_rules: CacheRules):
+    def __init__(
+        self,
+        cache: CacheStorage,
+        cache_rules: CacheRules,
+        generations: CacheGenerations,
+    ):
         self.cache = cache
         self.cache_rules = cache_rules
+        self.generations = generations
 
-    async def get_film_from_cache(self, film_id: str) -> Optional[Film]:
-        data = await self.cache.get(f"{FILM_ES_INDEX}?{film_id}")
+    async def make_list_key(
+        self, prefix: str, parameters: Dict[str, Any]
+    ) -> str:
+        """Ключ страницы списка в текущем поколении списков фильмов"""
+        generation = await self.generations.get(FILM_ES_INDEX)
+        return make_cache_key(prefix, parameters, generation)
+
+    async def get_film_from_cache(
+        self, film_id: str, refresh: Refresh = None
+    ) -> Optional[Film]:
+        data = await get_or_revalidate(
+            self.cache,
+            f"{FILM_ES_INDEX}?{film_id}",
+            FILM_CACHE_POLICY,
+            refresh,
+        )
         if not data:
             return None
 
@@ -31,11 +106,37 @@ class FilmCacheService:
         await self.cache.set(
             key=f"{FILM_ES_INDEX}?{film.id}",
             value=film.model_dump_json(),
-            expire=FILM_CACHE_EXPIRE_IN_SECONDS,
+            expire=FILM_CACHE_POLICY.hard_ttl,
+        )
+
+    async def get_films_from_cache(
+        self, film_ids: list[str]
+    ) -> dict[str, Film]:
+        """Получение нескольких фильмов из кэша одним MGET"""
+        data = await self.cache.mget(
+            [f"{FILM_ES_INDEX}?{film_id}" for film_id in film_ids]
+        )
+        return {
+            film_id: Film.model_validate_json(item)
+            for film_id, item in zip(film_ids, data)
+            if item
+        }
+
+    async def put_films_to_cache(self, films: list[Film]):
+        """Запись нескольких фильмов в кэш одним пайплайном"""
+        await self.cache.set_many(
+            {
+                f"{FILM_ES_INDEX}?{film.id}": film.model_dump_json()
+                for film in films
+            },
+            expire=FILM_CACHE_POLICY.hard_ttl,
         )
 
     async def get_film_list_from_cache(
-        self, parameters: Dict[str, Any]
+        self,
+        parameters: Dict[str, Any],
+        refresh: Refresh = None,
+        prefix: str = FILM_ES_INDEX,
     ) -> list[Optional[FilmCommon]]:
         """Получение списка фильмов по параметрам из кэша"""
         if not self.cache_rules.need_cache(
@@ -43,7 +144,12 @@ class FilmCacheService:
         ):
             return None
 
-        data = await self.cache.get(make_cache_key(FILM_ES_INDEX, parameters))
+        data = await get_or_revalidate(
+            self.cache,
+            await self.make_list_key(prefix, parameters),
+            FILM_LIST_CACHE_POLICY,
+            refresh,
+        )
         if not data:
             return None
 
@@ -54,6 +160,7 @@ class FilmCacheService:
         self,
         film_list: list[Optional[FilmCommon]],
         parameters: Dict[str, Any],
+        prefix: str = FILM_ES_INDEX,
     ):
         """Запись списка фильмов по параметрам в кэш"""
 
@@ -63,11 +170,25 @@ class FilmCacheService:
             return None
 
         await self.cache.set(
-            key=make_cache_key(FILM_ES_INDEX, parameters),
+            key=await self.make_list_key(prefix, parameters),
             value=FilmList(films=film_list).model_dump_json(),
-            expire=FILM_CACHE_EXPIRE_IN_SECONDS,
+            expire=FILM_LIST_CACHE_POLICY.hard_ttl,
         )
 
+    async def get_response_from_cache(
+        self, key: str, policy: CachePolicy, refresh: Refresh = None
+    ) -> Optional[bytes]:
+        """Получение готового тела ответа API из кэша без разбора JSON"""
+        return await get_or_revalidate(self.cache, key, policy, refresh)
+
+    async def put_response_to_cache(
+        self, key: str, payload: bytes, policy: CachePolicy
+    ):
+        await self.cache.set(key=key, value=payload, expire=policy.hard_ttl)
+
+    async def delete_response_from_cache(self, key: str):
+        await self.cache.delete(key)
+
 
 class FilmSearchEngineService:
     def __init__(self, search_engine: SearchEngine):
@@ -77,26 +198,43 @@ class FilmSearchEngineService:
         self, film_id: str
     ) -> Optional[Film]:
         if doc := await self.search_engine.get(
-            index=FILM_ES_INDEX, id=film_id
+            index=FILM_ES_INDEX, id=film_id, projection=FILM_DETAIL_PROJECTION
         ):
-            result = {**doc["_source"]}
-            for x in ["directors", "writers", "actors"]:
-                result[x] = [
-                    {"id": person["id"], "full_name": person["name"]}
-                    for person in result[x]
-                ]
-            logging.debug(f" результат поиска фильма в эластике {result}")
-            film = Film(**result)
+            film = self.doc_to_film(doc)
+            logging.debug(f" результат поиска фильма в эластике {film}")
             return film
         return None
 
+    async def get_films_from_search_engine_by_ids(
+        self, film_ids: list[str]
+    ) -> list[Film]:
+        """Загрузка нескольких фильмов одним запросом _mget"""
+        docs = await self.search_engine.mget(
+            index=FILM_ES_INDEX,
+            ids=film_ids,
+            projection=FILM_DETAIL_PROJECTION,
+        )
+        return [self.doc_to_film(doc) for doc in docs]
+
+    @staticmethod
+    def doc_to_film(doc: dict[str, Any]) -> Film:
+        result = {**doc["_source"]}
+        for x in ["directors", "writers", "actors"]:
+            result[x] = [
+                {"id": person["id"], "full_name": person["name"]}
+                for person in result[x]
+            ]
+        return Film(**result)
+
     async def get_similar_films_from_search_engine(
         self, film_id: str, parameters: dict[str, str]
     ) -> list[Optional[FilmCommon]]:
         try:
             # Получаем информацию о фильме
             film_response = await self.search_engine.get(
-                index=FILM_ES_INDEX, id=film_id
+                index=FILM_ES_INDEX,
+                id=film_id,
+                projection=FILM_GENRES_PROJECTION,
             )
             if not film_response:
                 raise HTTPException(
@@ -124,6 +262,7 @@ class FilmSearchEngineService:
                     "film_id": film_id,
                 },
                 index=FILM_ES_INDEX,
+                projection=FILM_LIST_PROJECTION,
             )
 
             if not response["hits"]["hits"]:
@@ -143,6 +282,8 @@ class FilmSearchEngineService:
             ]
             return films
 
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail=str(e)
@@ -153,8 +294,12 @@ class FilmSearchEngineService:
     ) -> list[Optional[FilmCommon]]:
         try:
             response = await self.search_engine.search_films_by_params(
-                parameters=parameters, index=FILM_ES_INDEX
+                parameters=parameters,
+                index=FILM_ES_INDEX,
+                projection=FILM_LIST_PROJECTION,
             )
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail=str(e)
@@ -174,15 +319,98 @@ class FilmSearchEngineService:
         ]
         return films
 
+    async def get_faceted_films_from_search_engine(
+        self, parameters: dict[str, Any]
+    ) -> FacetedFilms:
+        try:
+            (
+                hits,
+                genre_counts,
+            ) = await self.search_engine.search_films_with_facets(
+                parameters=parameters,
+                index=FILM_ES_INDEX,
+                projection=FILM_LIST_PROJECTION,
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail=str(e)
+            )
+
+        genres = []
+        for bucket in genre_counts["aggregations"]["genres"]["ids"]["buckets"]:
+            # Названия жанров берём из справочника в памяти
+            genre = genre_catalogue.get(bucket["key"])
+            genres.append(
+                GenreFacet(
+                    uuid=bucket["key"],
+                    name=genre.name if genre else None,
+                    count=bucket["doc_count"],
+                )
+            )
+
+        return FacetedFilms(
+            films=[
+                FilmCommon(
+                    id=hit["_id"],
+                    title=hit["_source"].get("title"),
+                    imdb_rating=hit["_source"].get("imdb_rating"),
+                )
+                for hit in hits["hits"]["hits"]
+            ],
+            total=hits["hits"]["total"]["value"],
+            genres=genres,
+            ratings=[
+                RatingFacet(key=bucket["key"], count=bucket["doc_count"])
+                for bucket in hits["aggregations"]["ratings"]["buckets"]
+            ],
+        )
+
+    async def get_films_from_search_engine_by_cursor(
+        self, parameters: dict[str, Any], cursor: str
+    ) -> tuple[list[FilmCommon], Optional[str]]:
+        try:
+            hits, next_cursor = await search_by_cursor(
+                self.search_engine,
+                FILM_ES_INDEX,
+                parameters,
+                cursor,
+                partial(
+                    self.search_engine.search_films_by_params,
+                    projection=FILM_LIST_PROJECTION,
+                ),
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail=str(e)
+            )
+
+        films = [
+            FilmCommon(
+                id=hit["_id"],
+                title=hit["_source"].get("title"),
+                imdb_rating=hit["_source"].get("imdb_rating"),
+            )
+            for hit in hits
+        ]
+        return films, next_cursor
+
 
 class FilmService:
     def __init__(
         self,
         cache_service: FilmCacheService,
         search_engine_service: FilmSearchEngineService,
+        lock: Optional[RedisLock] = None,
+        genre_films: Optional[GenreFilmsIndex] = None,
     ):
         self.cache_service = cache_service
         self.search_engine_service = search_engine_service
+        self.lock = lock
+        self.genre_films = genre_films
 
     async def get_by_id(
         self, film_id: str, roles: list[str]
@@ -190,61 +418,367 @@ class FilmService:
         """Возвращает объект фильма.
         Он опционален, так как фильм может отсутствовать в базе"""
         # Пытаемся получить данные из кеша, потому что оно работает быстрее
-        film = await self.cache_service.get_film_from_cache(film_id)
+        film = await self.cache_service.get_film_from_cache(
+            film_id, refresh=lambda: self._load_film(film_id)
+        )
         if not film:
-            # Если фильма нет в кеше, то ищем его в search_engine
-            film = (
-                await self.search_engine_service.get_film_from_search_engine(
+            # Если фильма нет в кеше, то ищем его в search_engine.
+            # Одновременные запросы одного фильма ждут общую загрузку
+            film = await film_single_flight.do(
+                f"{FILM_ES_INDEX}?{film_id}",
+                lambda: self._load_film(film_id),
+                lock=self.lock,
+                recheck=lambda: self.cache_service.get_film_from_cache(
                     film_id
-                )
+                ),
             )
+        if not film or (
+            film.access and not await check_access(film.access, roles)
+        ):
+            # Если он отсутствует в search_engine,
+            # значит, фильма вообще нет в базе
+            return None
+
+        return film
+
+    async def get_response_by_id(
+        self, film_id: str, roles: list[str], render: FilmRender
+    ) -> Optional[bytes]:
+        """Возвращает готовое тело ответа с фильмом.
+        Для общедоступных фильмов байты ответа отдаются прямо из кэша,
+        без валидации моделей и повторной сериализации"""
+        key = f"{FILM_RESPONSE_PREFIX}?{film_id}"
+        payload = await self.cache_service.get_response_from_cache(
+            key,
+            FILM_CACHE_POLICY,
+            refresh=lambda: self._render_film(film_id, render),
+        )
+        if payload is not None:
+            return payload
+
+        film = await self.get_by_id(film_id, roles)
+        if not film:
+            return None
+
+        payload = render(film)
+        if not film.access:
+            # Ответ с ограниченным доступом зависит от ролей пользователя,
+            # поэтому в общий кэш попадают только открытые фильмы
+            await self.cache_service.put_response_to_cache(
+                key, payload, FILM_CACHE_POLICY
+            )
+        return payload
+
+    async def _render_film(self, film_id: str, render: FilmRender):
+        key = f"{FILM_RESPONSE_PREFIX}?{film_id}"
+        film = await self._load_film(film_id)
+        if not film or film.access:
+            await self.cache_service.delete_response_from_cache(key)
+            return
+        await self.cache_service.put_response_to_cache(
+            key, render(film), FILM_CACHE_POLICY
+        )
+
+    async def get_by_ids(
+        self, film_ids: list[str], roles: list[str]
+    ) -> list[Film]:
+        """Возвращает фильмы по списку идентификаторов в порядке запроса.
+        Из кэша фильмы читаются одним MGET, недостающие загружаются
+        из search_engine одним _mget и дописываются в кэш.
+        Ненайденные и недоступные пользователю фильмы пропускаются"""
+        film_ids = list(dict.fromkeys(film_ids))
+        films = await self.cache_service.get_films_from_cache(film_ids)
+
+        missing_ids = [film_id for film_id in film_ids if film_id not in films]
+        if missing_ids:
+            loaded = await self.search_engine_service.get_films_from_search_engine_by_ids(
+                missing_ids
+            )
+            await self.cache_service.put_films_to_cache(loaded)
+            films.update({film.id: film for film in loaded})
+
+        result = []
+        for film_id in film_ids:
+            film = films.get(film_id)
             if not film or (
                 film.access and not await check_access(film.access, roles)
             ):
-                # Если он отсутствует в search_engine,
-                # значит, фильма вообще нет в базе
-                return None
+                continue
+            result.append(film)
+        return result
+
+    async def _load_film(self, film_id: str) -> Optional[Film]:
+        film = await self.search_engine_service.get_film_from_search_engine(
+            film_id
+        )
+        if film:
             # Сохраняем фильм в кеш
             await self.cache_service.put_film_to_cache(film)
-
         return film
 
     async def get_similar_films_by_id(
         self, film_id: str, parameters: dict[str, str]
     ) -> Optional[list[Any]]:
         """Возвращает список объектов фильмов похожих на фильм"""
-        films = await self.cache_service.get_film_list_from_cache(parameters)
+        if similarity_index.ready:
+            films = similarity_index.similar(
+                film_id,
+                page_size=int(parameters.get("page_size", 50)),
+                page_number=int(parameters.get("page_number", 1)),
+            )
+            if films is not None:
+                return films
+
+        # Индекс ещё строится или фильм появился после его обновления
+        prefix = f"{FILM_SIMILAR_PREFIX}:{film_id}"
+        films = await self.cache_service.get_film_list_from_cache(
+            parameters,
+            refresh=lambda: self._load_similar_films(film_id, parameters),
+            prefix=prefix,
+        )
         if films is None:
-            films = await self.search_engine_service.get_similar_films_from_search_engine(
-                film_id, parameters
+            films = await film_single_flight.do(
+                make_cache_key(prefix, parameters),
+                lambda: self._load_similar_films(film_id, parameters),
             )
-            if films is None:
-                return None
-            await self.cache_service.put_film_list_to_cache(films, parameters)
         return films
 
+    async def _load_similar_films(
+        self, film_id: str, parameters: dict[str, str]
+    ) -> Optional[list[FilmCommon]]:
+        films = await self.search_engine_service.get_similar_films_from_search_engine(
+            film_id, parameters
+        )
+        if films is None:
+            return None
+        await self.cache_service.put_film_list_to_cache(
+            films, parameters, prefix=f"{FILM_SIMILAR_PREFIX}:{film_id}"
+        )
+        return films
+
+    async def get_recommendations(
+        self,
+        parameters: dict[str, Any],
+        user_id: Optional[str] = None,
+        roles: Optional[list[str]] = None,
+    ) -> list[FilmCommon]:
+        """Рекомендации пользователю или популярные фильмы.
+
+        Пока модель рекомендаций не загружена, отдаются фильмы
+        с наибольшим рейтингом. Недоступные по ролям и удалённые фильмы
+        отбрасываются до разбиения на страницы: если после фильтрации
+        фильмов не хватает, кандидатов запрашивается вдвое больше."""
+        page_size = int(parameters.get("page_size", 50))
+        page_number = int(parameters.get("page_number", 1))
+        if not recommendation_index.ready:
+            return (
+                await self.get_by_parameters(
+                    {
+                        "genre_id": None,
+                        "query": None,
+                        "sort": "-imdb_rating",
+                        "page_size": page_size,
+                        "page_number": page_number,
+                    }
+                )
+                or []
+            )
+
+        limit = page_size * page_number
+        fetch = limit
+        while True:
+            if user_id is None:
+                film_ids = recommendation_index.popular(fetch, 1)
+            else:
+                film_ids = recommendation_index.recommend(user_id, fetch, 1)
+            films = await self.get_by_ids(film_ids, roles or [])
+            if len(films) >= limit or len(film_ids) < fetch:
+                break
+            fetch *= 2
+
+        return films[limit - page_size : limit]
+
     async def get_by_parameters(
         self, parameters: dict[str, str]
     ) -> Optional[list[Any]]:
         """Возвращает список объектов фильма"""
-        films = await self.cache_service.get_film_list_from_cache(parameters)
+        films = await self.cache_service.get_film_list_from_cache(
+            parameters,
+            refresh=lambda: self._load_films_by_parameters(parameters),
+        )
         if films is None:
-            films = await self.search_engine_service.get_films_from_search_engine_by_params(
-                parameters
+            # Некэшируемые страницы нет смысла ждать из кэша другого воркера
+            need_cache = self.cache_service.cache_rules.need_cache(
+                parameters.get("page_number", None)
+            )
+            films = await film_single_flight.do(
+                make_cache_key(FILM_ES_INDEX, parameters),
+                lambda: self._load_films_by_parameters(parameters),
+                lock=self.lock if need_cache else None,
+                recheck=lambda: self.cache_service.get_film_list_from_cache(
+                    parameters
+                ),
             )
-            if films is None:
-                return None
-            await self.cache_service.put_film_list_to_cache(films, parameters)
         return films
 
+    async def get_response_by_parameters(
+        self, parameters: dict[str, str], render: FilmListRender
+    ) -> bytes:
+        """Возвращает готовое тело ответа со списком фильмов"""
+        key = await self.cache_service.make_list_key(
+            FILM_RESPONSE_PREFIX, parameters
+        )
+        need_cache = self.cache_service.cache_rules.need_cache(
+            parameters.get("page_number", None)
+        )
+        if need_cache:
+            payload = await self.cache_service.get_response_from_cache(
+                key,
+                FILM_LIST_CACHE_POLICY,
+                refresh=lambda: self._render_films_by_parameters(
+                    parameters, render, need_cache, key
+                ),
+            )
+            if payload is not None:
+                return payload
+
+        return await film_single_flight.do(
+            key,
+            lambda: self._render_films_by_parameters(
+                parameters, render, need_cache, key
+            ),
+            lock=self.lock if need_cache else None,
+            recheck=lambda: self.cache_service.get_response_from_cache(
+                key, FILM_LIST_CACHE_POLICY
+            ),
+        )
+
+    async def _render_films_by_parameters(
+        self,
+        parameters: dict[str, str],
+        render: FilmListRender,
+        need_cache: bool,
+        key: str,
+    ) -> bytes:
+        # Ключ вычислен до загрузки: если поколение списков сменится
+        # во время запроса, устаревший ответ уйдёт в старое поколение
+        films = await self._fetch_films_by_parameters(parameters)
+        payload = render(films or [])
+        if need_cache:
+            await self.cache_service.put_response_to_cache(
+                key,
+                payload,
+                FILM_LIST_CACHE_POLICY,
+            )
+        return payload
+
+    async def get_faceted_response_by_parameters(
+        self, parameters: dict[str, str], render: FacetedFilmsRender
+    ) -> bytes:
+        """Готовое тело ответа поиска со страницей фильмов и фасетами"""
+        key = await self.cache_service.make_list_key(
+            FILM_FACETED_PREFIX, parameters
+        )
+        need_cache = self.cache_service.cache_rules.need_cache(
+            parameters.get("page_number", None)
+        )
+        if need_cache:
+            payload = await self.cache_service.get_response_from_cache(
+                key,
+                FILM_LIST_CACHE_POLICY,
+                refresh=lambda: self._render_faceted_films(
+                    parameters, render, need_cache, key
+                ),
+            )
+            if payload is not None:
+                return payload
+
+        return await film_single_flight.do(
+            key,
+            lambda: self._render_faceted_films(
+                parameters, render, need_cache, key
+            ),
+            lock=self.lock if need_cache else None,
+            recheck=lambda: self.cache_service.get_response_from_cache(
+                key, FILM_LIST_CACHE_POLICY
+            ),
+        )
+
+    async def _render_faceted_films(
+        self,
+        parameters: dict[str, str],
+        render: FacetedFilmsRender,
+        need_cache: bool,
+        key: str,
+    ) -> bytes:
+        result = await self.search_engine_service.get_faceted_films_from_search_engine(
+            parameters
+        )
+        payload = render(result)
+        if need_cache:
+            await self.cache_service.put_response_to_cache(
+                key, payload, FILM_LIST_CACHE_POLICY
+            )
+        return payload
+
+    async def get_page_by_cursor(
+        self, parameters: dict[str, Any], cursor: str
+    ) -> tuple[list[FilmCommon], Optional[str]]:
+        """Возвращает страницу фильмов и токен следующей страницы.
+        Обход по курсору не кэшируется: его стоимость и так постоянна"""
+        return await self.search_engine_service.get_films_from_search_engine_by_cursor(
+            parameters, cursor
+        )
+
+    async def _load_films_by_parameters(
+        self, parameters: dict[str, str]
+    ) -> Optional[list[FilmCommon]]:
+        films = await self._fetch_films_by_parameters(parameters)
+        if films is None:
+            return None
+        await self.cache_service.put_film_list_to_cache(films, parameters)
+        return films
+
+    async def _fetch_films_by_parameters(
+        self, parameters: dict[str, Any]
+    ) -> Optional[list[FilmCommon]]:
+        """Фильтр только по жанру обслуживается срезом множества фильмов
+        жанра в Redis, остальные запросы - search_engine"""
+        if (
+            self.genre_films is not None
+            and parameters.get("genre_id")
+            and not parameters.get("query")
+        ):
+            films = await self.genre_films.get_films(
+                parameters["genre_id"],
+                parameters.get("sort", "-imdb_rating"),
+                int(parameters.get("page_size", 50)),
+                int(parameters.get("page_number", 1)),
+            )
+            if films is not None:
+                return films
+
+        return await self.search_engine_service.get_films_from_search_engine_by_params(
+            parameters
+        )
+
 
 @lru_cache()
 def get_film_service(
     cache_storage: CacheStorage = Depends(get_cache_storage),
     search_engine: SearchEngine = Depends(get_search_engine),
+    redis: Redis = Depends(get_redis),
+    generations: CacheGenerations = Depends(get_cache_generations),
 ) -> FilmService:
     cache_service = FilmCacheService(
-        cache=cache_storage, cache_rules=CacheRules()
+        cache=cache_storage, cache_rules=CacheRules(), generations=generations
     )
     search_engine_service = FilmSearchEngineService(search_engine)
-    return FilmService(cache_service, search_engine_service)
+    lock = (
+        RedisLock(redis, settings.single_flight_lock_ttl_ms)
+        if settings.single_flight_redis_lock
+        else None
+    )
+    return FilmService(
+        cache_service, search_engine_service, lock, GenreFilmsIndex(redis)
+    )
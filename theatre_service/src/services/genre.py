@@ -1,25 +1,62 @@
-from functools import lru_cache
-from typing import Optional, Dict, Any
+from functools import lru_cache, partial
+from typing import Optional, Dict, Any, Awaitable, Callable
 from http import HTTPStatus
 
 from fastapi import Depends, HTTPException
+from redis.asyncio import Redis
 
+from common.cursor import search_by_cursor
+from common.revalidation import get_or_revalidate
 from common.services_functions import make_cache_key
-from db.search_engine import get_search_engine, SearchEngine
-from db.cache import CacheRules, CacheStorage, get_cache_storage
+from db.search_engine import (
+    docvalue,
+    get_search_engine,
+    Projection,
+    SearchEngine,
+)
+from db.cache import (
+    CacheGenerations,
+    CacheRules,
+    CacheStorage,
+    get_cache_generations,
+    get_cache_storage,
+    get_redis,
+    CACHE_POLICIES,
+)
 from models.models import Genre, GenreCommon, FilmCommon, GenreList
+from services.genre_catalogue import genre_catalogue
+from services.genre_films import GenreFilmsIndex
 
-GENRE_CACHE_EXPIRE_IN_SECONDS = 60 * 5  # 5 минут
 GENRE_ES_INDEX = "genres"
+GENRE_CACHE_POLICY = CACHE_POLICIES["genres"]
+GENRE_LIST_CACHE_POLICY = CACHE_POLICIES["lists"]
+# Списку жанров нужно только название: оно читается из doc values
+# ключевого подполя, _source не загружается
+GENRE_LIST_PROJECTION = Projection(docvalue_fields=("name.raw",), source=False)
+
+Refresh = Optional[Callable[[], Awaitable[Any]]]
 
 
 class GenreCacheService:
-    def __init__(self, cache: CacheStorage, cache_rules: CacheRules):
+    def __init__(
+        self,
+        cache: CacheStorage,
+        cache_rules: CacheRules,
+        generations: CacheGenerations,
+    ):
         self.cache = cache
         self.cache_rules = cache_rules
+        self.generations = generations
+
+    async def make_list_key(
+        self, prefix: str, parameters: Dict[str, Any]
+    ) -> str:
+        """Ключ страницы в текущем поколении ключей жанров"""
+        generation = await self.generations.get(GENRE_ES_INDEX)
+        return make_cache_key(prefix, parameters, generation)
 
     async def get_genre_list_from_cache(
-        self, parameters: Dict[str, Any]
+        self, parameters: Dict[str, Any], refresh: Refresh = None
     ) -> list[Optional[Genre]]:
         """Получение списка жанров по параметрам из кэша"""
         if not self.cache_rules.need_cache(
@@ -27,7 +64,12 @@ class GenreCacheService:
         ):
             return None
 
-        data = await self.cache.get(make_cache_key(GENRE_ES_INDEX, parameters))
+        data = await get_or_revalidate(
+            self.cache,
+            await self.make_list_key(GENRE_ES_INDEX, parameters),
+            GENRE_LIST_CACHE_POLICY,
+            refresh,
+        )
         if not data:
             return None
 
@@ -46,16 +88,23 @@ class GenreCacheService:
             return None
 
         await self.cache.set(
-            key=make_cache_key(GENRE_ES_INDEX, parameters),
+            key=await self.make_list_key(GENRE_ES_INDEX, parameters),
             value=GenreList(genres=genre_list).model_dump_json(),
-            expire=GENRE_CACHE_EXPIRE_IN_SECONDS,
+            expire=GENRE_LIST_CACHE_POLICY.hard_ttl,
         )
 
     async def get_genre_from_cache(
-        self, genre_id: str, parameters: Dict[str, Any]
+        self,
+        genre_id: str,
+        parameters: Dict[str, Any],
+        refresh: Refresh = None,
     ) -> Optional[Genre]:
-        key = make_cache_key(f"{GENRE_ES_INDEX}?{genre_id}", parameters)
-        data = await self.cache.get(key)
+        key = await self.make_list_key(
+            f"{GENRE_ES_INDEX}?{genre_id}", parameters
+        )
+        data = await get_or_revalidate(
+            self.cache, key, GENRE_CACHE_POLICY, refresh
+        )
         if not data:
             return None
 
@@ -65,11 +114,13 @@ class GenreCacheService:
     async def put_genre_to_cache(
         self, genre: Genre, parameters: Dict[str, Any]
     ):
-        key = make_cache_key(f"{GENRE_ES_INDEX}?{genre.uuid}", parameters)
+        key = await self.make_list_key(
+            f"{GENRE_ES_INDEX}?{genre.uuid}", parameters
+        )
         await self.cache.set(
             key,
             genre.model_dump_json(),
-            GENRE_CACHE_EXPIRE_IN_SECONDS,
+            GENRE_CACHE_POLICY.hard_ttl,
         )
 
 
@@ -82,8 +133,10 @@ class GenreSearchEngineService:
     ) -> list[GenreCommon]:
         try:
             response = await self.search_engine.search_genres_by_params(
-                parameters, GENRE_ES_INDEX
+                parameters, GENRE_ES_INDEX, projection=GENRE_LIST_PROJECTION
             )
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail=str(e)
@@ -94,14 +147,38 @@ class GenreSearchEngineService:
 
         # Создание объектов GenreCommon без поля description
         genres = [
-            GenreCommon(
-                uuid=hit["_id"],
-                name=hit["_source"].get("name"),
-            )
+            GenreCommon(uuid=hit["_id"], name=docvalue(hit, "name.raw"))
             for hit in response["hits"]["hits"]
         ]
         return genres
 
+    async def get_genres_from_search_engine_by_cursor(
+        self, parameters: dict[str, Any], cursor: str
+    ) -> tuple[list[GenreCommon], Optional[str]]:
+        try:
+            hits, next_cursor = await search_by_cursor(
+                self.search_engine,
+                GENRE_ES_INDEX,
+                parameters,
+                cursor,
+                partial(
+                    self.search_engine.search_genres_by_params,
+                    projection=GENRE_LIST_PROJECTION,
+                ),
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail=str(e)
+            )
+
+        genres = [
+            GenreCommon(uuid=hit["_id"], name=docvalue(hit, "name.raw"))
+            for hit in hits
+        ]
+        return genres, next_cursor
+
     async def get_genre_from_search_engine(
         self, genre_id: str, page_size: int, page_number: int, sort: str
     ) -> Optional[Genre]:
@@ -148,53 +225,109 @@ class GenreService:
         self,
         cache_service: GenreCacheService,
         search_engine_service: GenreSearchEngineService,
+        genre_films: Optional[GenreFilmsIndex] = None,
     ):
         self.cache_service = cache_service
         self.search_engine_service = search_engine_service
+        self.genre_films = genre_films
 
     async def get_by_id(
         self, genre_id: str, parameters: dict[str, str]
     ) -> Optional[Genre]:
         """Возвращает жанр с фильмами, сортируя и применяя пагинацию."""
 
+        # Эндпоинт передаёт uuid.UUID, а ключи справочника и Redis - строки
+        genre_id = str(genre_id)
+        if genre_catalogue.ready and genre_catalogue.get(genre_id) is None:
+            # Справочник перечитывается по каждому изменению жанров
+            return None
+
+        # Материализованные ETL множества уже отсортированы и актуальны,
+        # поэтому отдельно не кэшируются
+        if self.genre_films is not None:
+            genre = await self._get_from_genre_films(genre_id, **parameters)
+            if genre is not None:
+                return genre
+
         # Пытаемся получить данные жанра из кеша
         genre = await self.cache_service.get_genre_from_cache(
-            genre_id, parameters
+            genre_id,
+            parameters,
+            refresh=lambda: self._load_genre(genre_id, parameters),
         )
 
         if not genre:
             # Если жанра нет в кеше, ищем его в search_engine
-            genre = (
-                await self.search_engine_service.get_genre_from_search_engine(
-                    genre_id, **parameters
-                )
-            )
+            genre = await self._load_genre(genre_id, parameters)
 
-            if not genre:
-                # Если жанр не найден в search_engine, возвращаем None
-                return None
+        # Возвращаем жанр с фильмами
+        return genre
 
-            # Если жанр найден, сохраняем его в кеш
-            await self.cache_service.put_genre_to_cache(genre, parameters)
+    async def _get_from_genre_films(
+        self, genre_id: str, page_size: int, page_number: int, sort: str
+    ) -> Optional[Genre]:
+        genre = genre_catalogue.get(
+            genre_id
+        ) or await self.genre_films.get_genre(genre_id)
+        if genre is None:
+            return None
 
-        # Возвращаем жанр с фильмами
+        films = await self.genre_films.get_films(
+            genre_id, sort, page_size, page_number
+        )
+        return Genre(uuid=genre.uuid, name=genre.name, films=films or [])
+
+    async def _load_genre(
+        self, genre_id: str, parameters: dict[str, str]
+    ) -> Optional[Genre]:
+        genre = await self.search_engine_service.get_genre_from_search_engine(
+            genre_id, **parameters
+        )
+
+        if not genre:
+            # Если жанр не найден в search_engine, возвращаем None
+            return None
+
+        # Если жанр найден, сохраняем его в кеш
+        await self.cache_service.put_genre_to_cache(genre, parameters)
         return genre
 
     async def get_by_parameters(
         self, parameters: dict[str, str]
     ) -> list[GenreCommon]:
-        genres = await self.cache_service.get_genre_list_from_cache(parameters)
-        if genres is None:
-            genres = (
-                await self.search_engine_service.get_genres_from_search_engine(
-                    parameters
-                )
-            )
-            if genres is None:
-                return None
-            await self.cache_service.put_genre_list_to_cache(
-                genres, parameters
+        if genre_catalogue.ready:
+            # Список и поиск по справочнику в памяти, без внешних запросов
+            return genre_catalogue.page(
+                parameters["page_size"],
+                parameters["page_number"],
+                parameters.get("query"),
             )
+
+        genres = await self.cache_service.get_genre_list_from_cache(
+            parameters,
+            refresh=lambda: self._load_genres_by_parameters(parameters),
+        )
+        if genres is None:
+            genres = await self._load_genres_by_parameters(parameters)
+        return genres
+
+    async def get_page_by_cursor(
+        self, parameters: dict[str, Any], cursor: str
+    ) -> tuple[list[GenreCommon], Optional[str]]:
+        """Возвращает страницу жанров и токен следующей страницы"""
+        return await self.search_engine_service.get_genres_from_search_engine_by_cursor(
+            parameters, cursor
+        )
+
+    async def _load_genres_by_parameters(
+        self, parameters: dict[str, str]
+    ) -> Optional[list[GenreCommon]]:
+        genres = await self.search_engine_service.get_genres_from_search_engine(
+            parameters
+        )
+        if genres is None:
+            return None
+        await self.cache_service.put_genre_list_to_cache(genres, parameters)
         return genres
 
 
@@ -202,9 +335,13 @@ class GenreService:
 def get_genre_service(
     cache_storage: CacheStorage = Depends(get_cache_storage),
     search_engine: SearchEngine = Depends(get_search_engine),
+    redis: Redis = Depends(get_redis),
+    generations: CacheGenerations = Depends(get_cache_generations),
 ) -> GenreService:
     cache_service = GenreCacheService(
-        cache=cache_storage, cache_rules=CacheRules()
+        cache=cache_storage, cache_rules=CacheRules(), generations=generations
     )
     search_engine_service = GenreSearchEngineService(search_engine)
-    return GenreService(cache_service, search_engine_service)
+    return GenreService(
+        cache_service, search_engine_service, GenreFilmsIndex(redis)
+    )
@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import re
+from typing import Any, Iterable, Optional
+
+from core.config import settings
+from core.metrics import register_metrics
+from db.search_engine import SearchEngine
+from models.models import GenreCommon
+
+GENRE_CATALOGUE_ES_INDEX = "genres"
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def trigrams(token: str) -> set[str]:
+    padded = f"  {token} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(token: str) -> int:
+    """Допустимое число правок, как у fuzziness AUTO в Elasticsearch"""
+    if len(token) <= 2:
+        return 0
+    if len(token) <= 5:
+        return 1
+    return 2
+
+
+def levenshtein(a: str, b: str, limit: int) -> Optional[int]:
+    """Расстояние Левенштейна или None, если оно больше limit"""
+    if abs(len(a) - len(b)) > limit:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char_a != char_b),
+                )
+            )
+        if min(current) > limit:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= limit else None
+
+
+class GenreCatalogue:
+    """Полный справочник жанров в памяти каждого воркера.
+
+    Жанров немного, и меняются они редко, поэтому список и нечёткий
+    поиск по названию выполняются локально, без Redis и search_engine.
+    Поиск повторяет семантику match с fuzziness AUTO: жанр подходит,
+    если хотя бы одно слово запроса совпадает со словом названия
+    с точностью до допустимого числа правок. Кандидаты для проверки
+    расстоянием Левенштейна берутся из индекса триграмм слов: при
+    допустимом числе правок у слов всегда есть общая триграмма.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.refresh_requested = asyncio.Event()
+        self.genres: list[GenreCommon] = []
+        self._positions: dict[str, int] = {}
+        # слово названия -> позиции жанров с этим словом
+        self._words: dict[str, set[int]] = {}
+        # триграмма -> слова названий с этой триграммой
+        self._trigrams: dict[str, set[str]] = {}
+        self.listed = 0
+        self.searched = 0
+
+    def load(self, genres: Iterable[GenreCommon]) -> None:
+        """Заменяет справочник целиком"""
+        ordered = sorted(genres, key=lambda genre: (genre.name or "").lower())
+        words: dict[str, set[int]] = {}
+        index: dict[str, set[str]] = {}
+        for position, genre in enumerate(ordered):
+            for word in tokenize(genre.name or ""):
+                words.setdefault(word, set()).add(position)
+                for trigram in trigrams(word):
+                    index.setdefault(trigram, set()).add(word)
+
+        self.genres = ordered
+        self._positions = {
+            genre.uuid: position for position, genre in enumerate(ordered)
+        }
+        self._words = words
+        self._trigrams = index
+        self.ready = True
+
+    def get(self, genre_id: str) -> Optional[GenreCommon]:
+        position = self._positions.get(genre_id)
+        return self.genres[position] if position is not None else None
+
+    def page(
+        self,
+        page_size: int,
+        page_number: int,
+        query: Optional[str] = None,
+    ) -> list[GenreCommon]:
+        """Страница жанров по алфавиту или результатов поиска по названию"""
+        from_ = (page_number - 1) * page_size
+        if not query:
+            self.listed += 1
+            return self.genres[from_ : from_ + page_size]
+
+        self.searched += 1
+        positions = self._search(query)
+        return [self.genres[i] for i in positions[from_ : from_ + page_size]]
+
+    def _search(self, query: str) -> list[int]:
+        # позиция жанра -> (число совпавших слов, суммарное число правок)
+        scores: dict[int, tuple[int, int]] = {}
+        for token in set(tokenize(query)):
+            limit = max_edits(token)
+            if limit == 0:
+                candidates = {token} & self._words.keys()
+            else:
+                candidates = set().union(
+                    *(self._trigrams.get(t, ()) for t in trigrams(token))
+                )
+
+            best: dict[int, int] = {}
+            for word in candidates:
+                distance = levenshtein(token, word, limit)
+                if distance is None:
+                    continue
+                for position in self._words[word]:
+                    best[position] = min(best.get(position, limit), distance)
+
+            for position, distance in best.items():
+                matched, edits = scores.get(position, (0, 0))
+                scores[position] = (matched + 1, edits + distance)
+
+        return sorted(
+            scores, key=lambda i: (-scores[i][0], scores[i][1], i)
+        )
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "genres": len(self.genres),
+            "words": len(self._words),
+            "listed": self.listed,
+            "searched": self.searched,
+        }
+
+
+async def refresh_genre_catalogue(
+    catalogue: GenreCatalogue, search_engine: SearchEngine
+) -> int:
+    """Перечитывает справочник жанров целиком"""
+    genres = []
+    async for hits in search_engine.scan(
+        index=GENRE_CATALOGUE_ES_INDEX, fields=["name"]
+    ):
+        genres.extend(
+            GenreCommon(uuid=hit["_id"], name=hit["_source"].get("name"))
+            for hit in hits
+        )
+    catalogue.load(genres)
+    return len(genres)
+
+
+async def run_genre_catalogue_updater(
+    catalogue: GenreCatalogue, search_engine: SearchEngine
+):
+    """Загрузка справочника при старте, по расписанию
+    и по событию об изменении жанров"""
+    while True:
+        try:
+            count = await refresh_genre_catalogue(catalogue, search_engine)
+            logging.info(f"Genre catalogue loaded: {count} genres")
+        except Exception as e:
+            logging.error(f"Genre catalogue refresh failed: {e}")
+        try:
+            await asyncio.wait_for(
+                catalogue.refresh_requested.wait(),
+                timeout=settings.genre_catalogue_refresh_interval,
+            )
+        except asyncio.TimeoutError:
+            pass
+        catalogue.refresh_requested.clear()
+
+
+genre_catalogue = GenreCatalogue()
+register_metrics("genre_catalogue", genre_catalogue.metrics)
@@ -0,0 +1,65 @@
+from typing import Optional
+
+import backoff
+import orjson
+from redis.asyncio import Redis
+from redis.exceptions import ConnectionError
+
+from common.services_functions import sort_order
+from models.models import FilmCommon, GenreCommon
+
+# Ключи совпадают с ключами, которые ведёт etl_service
+GENRE_FILMS_KEY = "genre_films:{genre_id}"
+GENRE_STUBS_KEY = "genre_stubs"
+FILM_STUBS_KEY = "film_stubs"
+
+
+class GenreFilmsIndex:
+    """Фильмы жанров из материализованных в Redis отсортированных множеств.
+
+    Для каждого жанра etl_service ведёт ZSET фильмов с рейтингом
+    в качестве score и хэш-таблицы с краткими описаниями жанров
+    и фильмов. Страница фильмов жанра - это срез ZREVRANGE и один
+    HMGET, без вложенного запроса к search_engine и сортировки в памяти.
+    """
+
+    def __init__(self, redis: Redis):
+        self.redis = redis
+
+    @backoff.on_exception(backoff.expo, exception=ConnectionError, max_time=60)
+    async def get_genre(self, genre_id: str) -> Optional[GenreCommon]:
+        data = await self.redis.hget(GENRE_STUBS_KEY, genre_id)
+        if data is None:
+            return None
+        stub = orjson.loads(data)
+        return GenreCommon(uuid=stub["id"], name=stub.get("name"))
+
+    @backoff.on_exception(backoff.expo, exception=ConnectionError, max_time=60)
+    async def get_films(
+        self, genre_id: str, sort: str, page_size: int, page_number: int
+    ) -> Optional[list[FilmCommon]]:
+        """Страница фильмов жанра или None, если жанр ещё
+        не материализован и нужно идти в search_engine"""
+        start = (page_number - 1) * page_size
+        end = start + page_size - 1
+        key = GENRE_FILMS_KEY.format(genre_id=genre_id)
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hexists(GENRE_STUBS_KEY, genre_id)
+            if sort_order(sort) == "asc":
+                pipe.zrange(key, start, end)
+            else:
+                pipe.zrevrange(key, start, end)
+            known, film_ids = await pipe.execute()
+
+        if not known:
+            return None
+        if not film_ids:
+            return []
+
+        stubs = await self.redis.hmget(FILM_STUBS_KEY, film_ids)
+        return [
+            FilmCommon(**orjson.loads(stub))
+            for stub in stubs
+            if stub is not None
+        ]
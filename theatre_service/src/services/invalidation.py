@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import os
+import socket
+from typing import Any
+
+import orjson
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from core.config import settings
+from core.metrics import register_metrics
+from db.cache import (
+    CacheGenerations,
+    CacheStorage,
+    TwoTierCacheStorage,
+    get_cache_generations,
+    get_cache_storage,
+)
+from services.film import FILM_ES_INDEX, FILM_RESPONSE_PREFIX
+from services.genre import GENRE_ES_INDEX
+from services.genre_catalogue import genre_catalogue
+from services.person import (
+    PERSON_ES_INDEX,
+    PERSON_FILMOGRAPHY_PREFIX,
+    FilmographyMembership,
+)
+from services.similarity import similarity_index
+
+# Группа потребителей потока изменений: каждое событие получает
+# один воркер, который и удаляет записи из Redis
+INVALIDATION_GROUP = "theatre_service"
+# Через сколько миллисекунд неподтверждённое событие упавшего
+# или зависшего воркера забирает другой воркер
+INVALIDATION_CLAIM_IDLE_MS = 60_000
+INVALIDATION_BATCH = 100
+INVALIDATION_BLOCK_MS = 5000
+
+
+class CacheInvalidator:
+    """Точечная инвалидация кэша по событиям etl_service.
+
+    ETL после каждой пачки документов пишет в поток Redis имя индекса
+    и идентификаторы изменённых документов и увеличивает поколение
+    ключей списков индекса. Записи в Redis удаляет один воркер:
+    события распределяются через группу потребителей и подтверждаются
+    только после удаления, поэтому события, записанные, пока сервис
+    не работал, или не обработанные из-за ошибки, не теряются.
+    L1-кэш у каждого воркера свой, поэтому поток дополнительно читает
+    каждый воркер и очищает только свою память.
+    """
+
+    def __init__(self):
+        self.events = 0
+        self.documents = 0
+        self.deleted_keys = 0
+        self.local_events = 0
+        self.claimed = 0
+        self.failed = 0
+
+    async def keys_of(
+        self,
+        membership: FilmographyMembership,
+        index: str,
+        ids: list[str],
+    ) -> list[str]:
+        """Ключи кэша, которые затрагивает изменение документов"""
+        if index == FILM_ES_INDEX:
+            keys = [f"{FILM_ES_INDEX}?{film_id}" for film_id in ids]
+            keys += [f"{FILM_RESPONSE_PREFIX}?{film_id}" for film_id in ids]
+            # Фильмографии, в которые входят изменённые фильмы
+            keys += [
+                f"{PERSON_FILMOGRAPHY_PREFIX}?{person_id}"
+                for person_id in await membership.persons_of(ids)
+            ]
+            return keys
+        if index == PERSON_ES_INDEX:
+            keys = [f"{PERSON_ES_INDEX}?{person_id}" for person_id in ids]
+            keys += [
+                f"{PERSON_FILMOGRAPHY_PREFIX}?{person_id}" for person_id in ids
+            ]
+            return keys
+        # Страницы жанров целиком лежат в поколении ключей жанров
+        return []
+
+    async def invalidate(
+        self,
+        cache: CacheStorage,
+        membership: FilmographyMembership,
+        index: str,
+        ids: list[str],
+    ) -> None:
+        """Удаляет затронутые записи из общего кэша в Redis"""
+        keys = await self.keys_of(membership, index, ids)
+        await cache.delete_many(keys)
+
+        self.events += 1
+        self.documents += len(ids)
+        self.deleted_keys += len(keys)
+
+    async def invalidate_local(
+        self,
+        cache: CacheStorage,
+        generations: CacheGenerations,
+        membership: FilmographyMembership,
+        index: str,
+        ids: list[str],
+    ) -> None:
+        """Очищает память воркера: L1-кэш, номер поколения
+        и индексы, которые догружаются по событию"""
+        if index == FILM_ES_INDEX:
+            similarity_index.refresh_requested.set()
+        elif index == GENRE_ES_INDEX:
+            genre_catalogue.refresh_requested.set()
+        elif index != PERSON_ES_INDEX:
+            return
+
+        await cache.delete_many(await self.keys_of(membership, index, ids))
+        # Страницы списков индекса etl_service уже перевёл в новое
+        # поколение, осталось перечитать его номер
+        generations.forget(index)
+        self.local_events += 1
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "events": self.events,
+            "documents": self.documents,
+            "deleted_keys": self.deleted_keys,
+            "local_events": self.local_events,
+            "claimed": self.claimed,
+            "failed": self.failed,
+        }
+
+
+def parse_event(fields: dict[bytes, bytes]) -> tuple[str, list[str]]:
+    return fields[b"index"].decode(), orjson.loads(fields[b"ids"])
+
+
+async def create_invalidation_group(redis: Redis) -> None:
+    """Группа создаётся один раз и затем хранит позицию в потоке
+    между перезапусками сервиса"""
+    try:
+        await redis.xgroup_create(
+            settings.etl_changes_stream,
+            INVALIDATION_GROUP,
+            id="$",
+            mkstream=True,
+        )
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def consume_invalidation_group(
+    invalidator: CacheInvalidator, redis: Redis, cache: CacheStorage
+):
+    """Удаление записей из Redis по событиям, доставленным этому воркеру"""
+    stream = settings.etl_changes_stream
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    membership = FilmographyMembership(redis)
+    await create_invalidation_group(redis)
+    while True:
+        try:
+            # События, которые другой воркер получил, но не подтвердил
+            _, claimed, *_ = await redis.xautoclaim(
+                stream,
+                INVALIDATION_GROUP,
+                consumer,
+                min_idle_time=INVALIDATION_CLAIM_IDLE_MS,
+                count=INVALIDATION_BATCH,
+            )
+            invalidator.claimed += len(claimed)
+            response = await redis.xreadgroup(
+                INVALIDATION_GROUP,
+                consumer,
+                {stream: ">"},
+                count=INVALIDATION_BATCH,
+                block=INVALIDATION_BLOCK_MS,
+            )
+            entries = claimed + [
+                entry
+                for _, stream_entries in response
+                for entry in stream_entries
+            ]
+            for entry_id, fields in entries:
+                # У события, вытесненного из потока по MAXLEN, полей нет
+                if fields:
+                    await invalidator.invalidate(
+                        cache, membership, *parse_event(fields)
+                    )
+                await redis.xack(stream, INVALIDATION_GROUP, entry_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            invalidator.failed += 1
+            logging.error(f"Cache invalidation failed: {e}")
+            await asyncio.sleep(1)
+
+
+async def follow_invalidation_stream(
+    invalidator: CacheInvalidator,
+    redis: Redis,
+    cache: CacheStorage,
+    generations: CacheGenerations,
+):
+    """Очистка памяти воркера по всем событиям после запуска.
+
+    Память нового процесса пуста, поэтому более ранние события ему
+    не нужны. Позиция сдвигается только после обработки события.
+    """
+    membership = FilmographyMembership(redis)
+    last_id = "$"
+    while True:
+        try:
+            response = await redis.xread(
+                {settings.etl_changes_stream: last_id},
+                count=INVALIDATION_BATCH,
+                block=INVALIDATION_BLOCK_MS,
+            )
+            for _, entries in response:
+                for entry_id, fields in entries:
+                    await invalidator.invalidate_local(
+                        cache, generations, membership, *parse_event(fields)
+                    )
+                    last_id = entry_id
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            invalidator.failed += 1
+            logging.error(f"Local cache invalidation failed: {e}")
+            await asyncio.sleep(1)
+
+
+async def run_invalidation_consumer(
+    invalidator: CacheInvalidator, redis: Redis
+):
+    """Читает поток изменений ETL в группе и отдельно для памяти воркера"""
+    cache: TwoTierCacheStorage = get_cache_storage(redis)
+    await asyncio.gather(
+        consume_invalidation_group(invalidator, redis, cache.remote),
+        follow_invalidation_stream(
+            invalidator, redis, cache.local, get_cache_generations(redis)
+        ),
+    )
+
+
+cache_invalidator = CacheInvalidator()
+register_metrics("invalidation", cache_invalidator.metrics)
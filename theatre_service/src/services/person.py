@@ -1,29 +1,76 @@
-from functools import lru_cache
-from typing import Optional, Dict, Any
+from functools import lru_cache, partial
+from typing import Optional, Dict, Any, Awaitable, Callable
 from http import HTTPStatus
 
+import backoff
 from fastapi import Depends, HTTPException
+from redis.asyncio import Redis
+from redis.exceptions import ConnectionError
 
-from common.services_functions import make_cache_key
-from db.cache import CacheRules, CacheStorage, get_cache_storage
-from db.search_engine import get_search_engine, SearchEngine
+from common.cursor import search_by_cursor
+from common.revalidation import get_or_revalidate
+from common.services_functions import check_access, make_cache_key
+from db.cache import (
+    CacheGenerations,
+    CacheRules,
+    CacheStorage,
+    get_cache_generations,
+    get_cache_storage,
+    get_redis,
+    CACHE_POLICIES,
+)
+from db.search_engine import get_search_engine, Projection, SearchEngine
 from models.models import (
+    Filmography,
     Person,
     FilmOfPerson,
     PersonList,
 )
+from services.film import FILM_ES_INDEX
 
-PERSON_CACHE_EXPIRE_IN_SECONDS = 60 * 5  # 5 минут
 PERSON_ES_INDEX = "persons"
+# Фильмография персоны с данными фильмов кэшируется целиком
+PERSON_FILMOGRAPHY_PREFIX = f"{PERSON_ES_INDEX}_films"
+# Персоны, в кэшированную фильмографию которых входит фильм
+FILM_PERSONS_KEY = "film_persons:{film_id}"
+PERSON_CACHE_POLICY = CACHE_POLICIES["persons"]
+PERSON_LIST_CACHE_POLICY = CACHE_POLICIES["lists"]
+# Поля документов персон: списку нужны имя и роли в фильмах
+PERSON_LIST_PROJECTION = Projection(
+    includes=("full_name", "films.id", "films.roles")
+)
+PERSON_DETAIL_PROJECTION = Projection(
+    excludes=("full_name_suggest", "last_change_date")
+)
+# Поля фильмов фильмографии. access хранится вместе с фильмом:
+# недоступные фильмы отбрасываются по ролям при выдаче страницы
+FILMOGRAPHY_FILM_PROJECTION = Projection(
+    includes=("title", "imdb_rating", "creation_date", "access")
+)
+
+Refresh = Optional[Callable[[], Awaitable[Any]]]
 
 
 class PersonCacheService:
-    def __init__(self, cache: CacheStorage, cache_rules: CacheRules):
+    def __init__(
+        self,
+        cache: CacheStorage,
+        cache_rules: CacheRules,
+        generations: CacheGenerations,
+    ):
         self.cache = cache
         self.cache_rules = cache_rules
+        self.generations = generations
+
+    async def make_list_key(
+        self, prefix: str, parameters: Dict[str, Any]
+    ) -> str:
+        """Ключ страницы в текущем поколении ключей персон"""
+        generation = await self.generations.get(PERSON_ES_INDEX)
+        return make_cache_key(prefix, parameters, generation)
 
     async def get_person_list_from_cache(
-        self, parameters: Dict[str, Any]
+        self, parameters: Dict[str, Any], refresh: Refresh = None
     ) -> list[Optional[Person]]:
         """Получение списка персон по параметрам из кэша"""
         if not self.cache_rules.need_cache(
@@ -31,8 +78,11 @@ class PersonCacheService:
         ):
             return None
 
-        data = await self.cache.get(
-            make_cache_key(PERSON_ES_INDEX, parameters)
+        data = await get_or_revalidate(
+            self.cache,
+            await self.make_list_key(PERSON_ES_INDEX, parameters),
+            PERSON_LIST_CACHE_POLICY,
+            refresh,
         )
         if not data:
             return None
@@ -52,13 +102,20 @@ class PersonCacheService:
             return None
 
         await self.cache.set(
-            key=make_cache_key(PERSON_ES_INDEX, parameters),
+            key=await self.make_list_key(PERSON_ES_INDEX, parameters),
             value=PersonList(persons=person_list).model_dump_json(),
-            expire=PERSON_CACHE_EXPIRE_IN_SECONDS,
+            expire=PERSON_LIST_CACHE_POLICY.hard_ttl,
         )
 
-    async def get_person_from_cache(self, person_id: str) -> Optional[Person]:
-        data = await self.cache.get(f"{PERSON_ES_INDEX}?{person_id}")
+    async def get_person_from_cache(
+        self, person_id: str, refresh: Refresh = None
+    ) -> Optional[Person]:
+        data = await get_or_revalidate(
+            self.cache,
+            f"{PERSON_ES_INDEX}?{person_id}",
+            PERSON_CACHE_POLICY,
+            refresh,
+        )
         if not data:
             return None
 
@@ -69,8 +126,77 @@ class PersonCacheService:
         await self.cache.set(
             key=f"{PERSON_ES_INDEX}?{person.id}",
             value=person.model_dump_json(),
-            expire=PERSON_CACHE_EXPIRE_IN_SECONDS,
+            expire=PERSON_CACHE_POLICY.hard_ttl,
+        )
+
+    async def get_filmography_from_cache(
+        self, person_id: str, refresh: Refresh = None
+    ) -> Optional[list[FilmOfPerson]]:
+        data = await get_or_revalidate(
+            self.cache,
+            f"{PERSON_FILMOGRAPHY_PREFIX}?{person_id}",
+            PERSON_CACHE_POLICY,
+            refresh,
+        )
+        if not data:
+            return None
+
+        return Filmography.model_validate_json(data).films
+
+    async def put_filmography_to_cache(
+        self, person_id: str, films: list[FilmOfPerson]
+    ):
+        await self.cache.set(
+            key=f"{PERSON_FILMOGRAPHY_PREFIX}?{person_id}",
+            value=Filmography(films=films).model_dump_json(),
+            expire=PERSON_CACHE_POLICY.hard_ttl,
+        )
+
+
+class FilmographyMembership:
+    """Обратное членство фильмов в кэшированных фильмографиях.
+
+    Для каждого фильма хранится множество персон, фильмография которых
+    закэширована вместе с ним: по событию об изменении фильма удаляются
+    только затронутые фильмографии. Множество живёт не меньше записей.
+    """
+
+    def __init__(self, redis: Redis):
+        self.redis = redis
+
+    @backoff.on_exception(backoff.expo, exception=ConnectionError, max_time=60)
+    async def add(
+        self, person_id: str, film_ids: list[str], expire: int
+    ) -> None:
+        if not film_ids:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for film_id in film_ids:
+                key = FILM_PERSONS_KEY.format(film_id=film_id)
+                pipe.sadd(key, person_id)
+                pipe.expire(key, expire)
+            await pipe.execute()
+
+    @backoff.on_exception(backoff.expo, exception=ConnectionError, max_time=60)
+    async def persons_of(self, film_ids: list[str]) -> set[str]:
+        if not film_ids:
+            return set()
+        members = await self.redis.sunion(
+            [FILM_PERSONS_KEY.format(film_id=film_id) for film_id in film_ids]
         )
+        return {member.decode() for member in members}
+
+
+def sort_filmography(
+    films: list[FilmOfPerson], sort: str
+) -> list[FilmOfPerson]:
+    """Сортировка по полю с необязательным минусом для убывания;
+    фильмы без значения поля идут в конце"""
+    field = sort.lstrip("-")
+    known = [film for film in films if getattr(film, field) is not None]
+    unknown = [film for film in films if getattr(film, field) is None]
+    known.sort(key=lambda film: getattr(film, field), reverse=sort[0] == "-")
+    return known + unknown
 
 
 class PersonSearchEngineService:
@@ -83,8 +209,10 @@ class PersonSearchEngineService:
         """Поиск по параметрам (например, имя, пагинация)."""
         try:
             response = await self.search_engine.search_persons_by_params(
-                parameters, PERSON_ES_INDEX
+                parameters, PERSON_ES_INDEX, projection=PERSON_LIST_PROJECTION
             )
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail=str(e)
@@ -109,61 +237,179 @@ class PersonSearchEngineService:
         ]
         return persons
 
+    async def get_persons_from_search_engine_by_cursor(
+        self, parameters: dict, cursor: str
+    ) -> tuple[list[Person], Optional[str]]:
+        """Обход персон по курсору (point in time + search_after)."""
+        try:
+            hits, next_cursor = await search_by_cursor(
+                self.search_engine,
+                PERSON_ES_INDEX,
+                parameters,
+                cursor,
+                partial(
+                    self.search_engine.search_persons_by_params,
+                    projection=PERSON_LIST_PROJECTION,
+                ),
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail=str(e)
+            )
+
+        persons = [
+            Person(
+                id=hit["_id"],
+                full_name=hit["_source"].get("full_name"),
+                films=[
+                    FilmOfPerson(id=f["id"], roles=f["roles"])
+                    for f in hit["_source"].get("films", [])
+                ],
+            )
+            for hit in hits
+        ]
+        return persons, next_cursor
+
     async def get_person_from_search_engine(
         self, person_id: str
     ) -> Optional[Person]:
-        doc = await self.search_engine.get(index=PERSON_ES_INDEX, id=person_id)
+        doc = await self.search_engine.get(
+            index=PERSON_ES_INDEX,
+            id=person_id,
+            projection=PERSON_DETAIL_PROJECTION,
+        )
         if not doc:
             return None
         return Person(**doc["_source"])
 
+    async def get_films_of_person(
+        self, film_ids: list[str], roles: dict[str, list[str]]
+    ) -> list[FilmOfPerson]:
+        """Фильмы фильмографии одним _mget с узкой проекцией"""
+        docs = await self.search_engine.mget(
+            index=FILM_ES_INDEX,
+            ids=film_ids,
+            projection=FILMOGRAPHY_FILM_PROJECTION,
+        )
+        return [
+            FilmOfPerson(
+                **doc["_source"], id=doc["_id"], roles=roles[doc["_id"]]
+            )
+            for doc in docs
+        ]
+
 
 class PersonService:
     def __init__(
         self,
         cache_service: PersonCacheService,
         search_engine_service: PersonSearchEngineService,
+        membership: Optional[FilmographyMembership] = None,
     ):
         self.cache_service = cache_service
         self.search_engine_service = search_engine_service
+        self.membership = membership
 
     async def get_by_id(self, person_id: str) -> Optional[Person]:
         """Возвращает объект персоны.
         Он опционален, так как персона может отсутствовать в базе"""
         # Пытаемся получить данные из кеша, потому что оно работает быстрее
-        person = await self.cache_service.get_person_from_cache(person_id)
+        person = await self.cache_service.get_person_from_cache(
+            person_id, refresh=lambda: self._load_person(person_id)
+        )
         if not person:
             # Если персоны нет в кеше, то ищем его в search_engine
-            person = (
-                await self.search_engine_service.get_person_from_search_engine(
-                    person_id
-                )
-            )
-            if not person:
-                # Если он отсутствует в search_engine,
-                # значит, персоны вообще нет в базе
-                return None
-            # Сохраняем персону в кеш
-            await self.cache_service.put_person_to_cache(person)
+            person = await self._load_person(person_id)
 
         return person
 
+    async def _load_person(self, person_id: str) -> Optional[Person]:
+        person = await self.search_engine_service.get_person_from_search_engine(
+            person_id
+        )
+        if not person:
+            # Если он отсутствует в search_engine,
+            # значит, персоны вообще нет в базе
+            return None
+        # Сохраняем персону в кеш
+        await self.cache_service.put_person_to_cache(person)
+        return person
+
+    async def get_filmography(
+        self, person_id: str, parameters: dict[str, Any], roles: list[str]
+    ) -> Optional[list[FilmOfPerson]]:
+        """Страница фильмов персоны с названиями, рейтингами и датами.
+        Вся фильмография собирается и кэшируется одним целым, вместе
+        с недоступными фильмами; фильтрация по ролям, сортировка
+        и пагинация выполняются в памяти"""
+        films = await self.cache_service.get_filmography_from_cache(
+            person_id, refresh=lambda: self._load_filmography(person_id)
+        )
+        if films is None:
+            films = await self._load_filmography(person_id)
+        if films is None:
+            return None
+
+        films = [
+            film
+            for film in films
+            if not film.access or await check_access(film.access, roles)
+        ]
+        films = sort_filmography(films, parameters["sort"])
+        from_ = (parameters["page_number"] - 1) * parameters["page_size"]
+        return films[from_ : from_ + parameters["page_size"]]
+
+    async def _load_filmography(
+        self, person_id: str
+    ) -> Optional[list[FilmOfPerson]]:
+        person = await self.get_by_id(person_id)
+        if not person:
+            return None
+
+        roles = {film.id: film.roles for film in person.films}
+        filmography = await self.search_engine_service.get_films_of_person(
+            list(roles), roles
+        )
+
+        await self.cache_service.put_filmography_to_cache(
+            person_id, filmography
+        )
+        await self.membership.add(
+            person_id, list(roles), PERSON_CACHE_POLICY.hard_ttl
+        )
+        return filmography
+
     async def get_by_parameters(
         self, parameters: dict[str, str]
     ) -> list[Optional[Person]]:
         """Возвращает список объектов персон"""
         persons = await self.cache_service.get_person_list_from_cache(
+            parameters,
+            refresh=lambda: self._load_persons_by_parameters(parameters),
+        )
+        if persons is None:
+            persons = await self._load_persons_by_parameters(parameters)
+        return persons
+
+    async def get_page_by_cursor(
+        self, parameters: dict[str, Any], cursor: str
+    ) -> tuple[list[Person], Optional[str]]:
+        """Возвращает страницу персон и токен следующей страницы"""
+        return await self.search_engine_service.get_persons_from_search_engine_by_cursor(
+            parameters, cursor
+        )
+
+    async def _load_persons_by_parameters(
+        self, parameters: dict[str, str]
+    ) -> Optional[list[Person]]:
+        persons = await self.search_engine_service.get_persons_from_search_engine(
             parameters
         )
         if persons is None:
-            persons = await self.search_engine_service.get_persons_from_search_engine(
-                parameters
-            )
-            if persons is None:
-                return None
-            await self.cache_service.put_person_list_to_cache(
-                persons, parameters
-            )
+            return None
+        await self.cache_service.put_person_list_to_cache(persons, parameters)
         return persons
 
 
@@ -171,9 +417,15 @@ class PersonService:
 def get_person_service(
     cache_storage: CacheStorage = Depends(get_cache_storage),
     search_engine: SearchEngine = Depends(get_search_engine),
+    generations: CacheGenerations = Depends(get_cache_generations),
+    redis: Redis = Depends(get_redis),
 ) -> PersonService:
     cache_service = PersonCacheService(
-        cache=cache_storage, cache_rules=CacheRules()
+        cache=cache_storage, cache_rules=CacheRules(), generations=generations
     )
     search_engine_service = PersonSearchEngineService(search_engine)
-    return PersonService(cache_service, search_engine_service)
+    return PersonService(
+        cache_service,
+        search_engine_service,
+        FilmographyMembership(redis),
+    )
@@ -0,0 +1,172 @@
+import asyncio
+import io
+import logging
+from typing import Any, Optional
+
+import numpy as np
+from redis.asyncio import Redis
+
+from core.config import settings
+from core.metrics import register_metrics
+
+# Версия формата артефакта, который публикует recommendations_job
+ARTIFACT_VERSION = 1
+
+
+class RecommendationIndex:
+    """Модель item-item рекомендаций в памяти процесса.
+
+    Модель считает офлайн recommendations_job и публикует её в Redis
+    как набор массивов CSR: соседи каждого фильма и история
+    взаимодействий каждого пользователя. Оценка фильма для пользователя -
+    сумма похожестей с фильмами из его истории, умноженных на вес
+    взаимодействия. Пользователям без истории отдаются популярные фильмы.
+    """
+
+    def __init__(self):
+        self.version: Optional[bytes] = None
+        self.items = np.zeros(0, dtype=str)
+        self.user_positions: dict[str, int] = {}
+        self.neighbours_indptr = np.zeros(1, dtype=np.int32)
+        self.neighbours_indices = np.zeros(0, dtype=np.int32)
+        self.neighbours_data = np.zeros(0, dtype=np.float32)
+        self.history_indptr = np.zeros(1, dtype=np.int32)
+        self.history_indices = np.zeros(0, dtype=np.int32)
+        self.history_data = np.zeros(0, dtype=np.float32)
+        self.popularity = np.zeros(0, dtype=np.int32)
+        self.personal = 0
+        self.fallback = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.version is not None
+
+    def load(self, arrays: dict[str, Any], version: bytes) -> None:
+        """Заменяет модель целиком массивами из parse_artifact"""
+        self.items = arrays["items"]
+        self.user_positions = arrays["user_positions"]
+        self.neighbours_indptr = arrays["neighbours_indptr"]
+        self.neighbours_indices = arrays["neighbours_indices"]
+        self.neighbours_data = arrays["neighbours_data"]
+        self.history_indptr = arrays["history_indptr"]
+        self.history_indices = arrays["history_indices"]
+        self.history_data = arrays["history_data"]
+        self.popularity = arrays["popularity"]
+        self.version = version
+
+    def recommend(
+        self, user_id: str, page_size: int, page_number: int
+    ) -> list[str]:
+        """Идентификаторы фильмов для страницы рекомендаций пользователя"""
+        limit = page_size * page_number
+        position = self.user_positions.get(user_id)
+        if position is None:
+            self.fallback += 1
+            return self.popular(page_size, page_number)
+
+        start, end = (
+            self.history_indptr[position],
+            self.history_indptr[position + 1],
+        )
+        seen = self.history_indices[start:end]
+        weights = self.history_data[start:end]
+
+        starts = self.neighbours_indptr[seen]
+        ends = self.neighbours_indptr[seen + 1]
+        columns = np.concatenate(
+            [self.neighbours_indices[s:e] for s, e in zip(starts, ends)]
+            or [np.zeros(0, dtype=np.int32)]
+        )
+        scores = np.concatenate(
+            [
+                self.neighbours_data[s:e] * w
+                for s, e, w in zip(starts, ends, weights)
+            ]
+            or [np.zeros(0, dtype=np.float32)]
+        )
+        totals = np.bincount(
+            columns, weights=scores, minlength=len(self.items)
+        )
+        totals[seen] = 0
+
+        candidates = np.flatnonzero(totals)
+        if candidates.size > limit:
+            best = np.argpartition(-totals[candidates], limit - 1)[:limit]
+            candidates = candidates[best]
+        ranked = candidates[np.argsort(-totals[candidates], kind="stable")]
+
+        if ranked.size < limit:
+            # Личных рекомендаций не хватило - добиваем популярными
+            excluded = np.concatenate([seen, ranked])
+            popular = self.popularity[~np.isin(self.popularity, excluded)]
+            ranked = np.concatenate([ranked, popular[: limit - ranked.size]])
+            self.fallback += 1
+        else:
+            self.personal += 1
+
+        return [str(self.items[i]) for i in ranked[limit - page_size : limit]]
+
+    def popular(self, page_size: int, page_number: int) -> list[str]:
+        from_ = (page_number - 1) * page_size
+        return [
+            str(self.items[i])
+            for i in self.popularity[from_ : from_ + page_size]
+        ]
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "version": self.version.decode() if self.version else None,
+            "items": len(self.items),
+            "users": len(self.user_positions),
+            "personal": self.personal,
+            "fallback": self.fallback,
+        }
+
+
+def parse_artifact(payload: bytes) -> dict[str, Any]:
+    data = np.load(io.BytesIO(payload))
+    if int(data["version"]) != ARTIFACT_VERSION:
+        raise ValueError(f"Unknown artifact version {data['version']}")
+
+    arrays = {name: data[name] for name in data.files}
+    arrays["user_positions"] = {
+        str(user_id): i for i, user_id in enumerate(arrays["users"])
+    }
+    return arrays
+
+
+async def refresh_recommendation_index(
+    index: RecommendationIndex, redis: Redis
+) -> bool:
+    """Перечитывает модель из Redis, если опубликована новая версия"""
+    key = settings.recommendations_model_key
+    version = await redis.get(f"{key}:version")
+    if version is None or version == index.version:
+        return False
+
+    payload = await redis.get(key)
+    if payload is None:
+        return False
+    # Разбор артефакта не должен блокировать цикл событий, а замена
+    # модели выполняется в нём целиком, между запросами
+    arrays = await asyncio.to_thread(parse_artifact, payload)
+    index.load(arrays, version)
+    return True
+
+
+async def run_recommendation_index_updater(
+    index: RecommendationIndex, redis: Redis
+):
+    while True:
+        try:
+            if await refresh_recommendation_index(index, redis):
+                version = index.version.decode()
+                logging.info(f"Recommendation model v{version} loaded")
+        except Exception as e:
+            logging.error(f"Recommendation model refresh failed: {e}")
+        await asyncio.sleep(settings.recommendations_refresh_interval)
+
+
+recommendation_index = RecommendationIndex()
+register_metrics("recommendations", recommendation_index.metrics)
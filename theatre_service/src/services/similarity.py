@@ -0,0 +1,339 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+from core.config import settings
+from core.metrics import register_metrics
+from db.search_engine import SearchEngine
+from models.models import FilmCommon
+
+SIMILARITY_ES_INDEX = "movies"
+SIMILARITY_SOURCE_FIELDS = [
+    "id",
+    "title",
+    "imdb_rating",
+    "genres",
+    "last_change_date",
+]
+# Вес коэффициента Жаккара в ключе сортировки: разница между любыми
+# двумя различными коэффициентами весит больше всего диапазона рейтинга
+SCORE_WEIGHT = 1e5
+
+
+class SimilarityIndex:
+    """Индекс похожести фильмов по общим жанрам.
+
+    Хранит матрицу принадлежности фильмов жанрам (фильмы x жанры)
+    и считает коэффициент Жаккара между наборами жанров. При равной
+    похожести выше стоят фильмы с большим рейтингом. Топ-K похожих
+    для фильма запоминается до следующего изменения индекса,
+    поэтому повторные запросы обслуживаются без вычислений.
+    """
+
+    def __init__(self, top_k: int, memo_size: int):
+        self.top_k = top_k
+        self.memo_size = memo_size
+        self.ready = False
+        self.last_change_date: Optional[str] = None
+        # Фильмы с last_change_date, равной последней загруженной:
+        # догрузка запрашивает эту дату ещё раз и пропускает их
+        self.boundary_ids: set[str] = set()
+        self.reconciled_at = 0.0
+        self.film_ids: list[str] = []
+        self.titles: list[Optional[str]] = []
+        self.film_positions: dict[str, int] = {}
+        self.genre_positions: dict[str, int] = {}
+        # Буферы с запасом: заняты первые len(film_ids) строк
+        # и len(genre_positions) столбцов
+        self._ratings = np.zeros(0, dtype=np.float64)
+        self._matrix = np.zeros((0, 0), dtype=np.uint8)
+        self._genre_counts = np.zeros(0, dtype=np.int32)
+        self._memo: OrderedDict[str, np.ndarray] = OrderedDict()
+        self.memo_hits = 0
+        self.memo_misses = 0
+        # Внеочередная догрузка по событию об изменении фильмов
+        self.refresh_requested = asyncio.Event()
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._matrix[: len(self.film_ids), : len(self.genre_positions)]
+
+    @property
+    def ratings(self) -> np.ndarray:
+        return self._ratings[: len(self.film_ids)]
+
+    @property
+    def genre_counts(self) -> np.ndarray:
+        return self._genre_counts[: len(self.film_ids)]
+
+    def upsert(self, docs: list[dict[str, Any]]) -> None:
+        """Добавляет новые фильмы и обновляет изменившиеся.
+
+        Строки изменённых фильмов переписываются на месте; буферы
+        перевыделяются, только когда кончается запас.
+        """
+        if not docs:
+            return
+
+        for doc in docs:
+            for genre in doc.get("genres") or []:
+                self.genre_positions.setdefault(
+                    genre["uuid"], len(self.genre_positions)
+                )
+
+        new_ids = [
+            doc["id"] for doc in docs if doc["id"] not in self.film_positions
+        ]
+        for film_id in new_ids:
+            self.film_positions[film_id] = len(self.film_ids)
+            self.film_ids.append(film_id)
+            self.titles.append(None)
+        self._reserve(len(self.film_ids), len(self.genre_positions))
+
+        positions = []
+        for doc in docs:
+            position = self.film_positions[doc["id"]]
+            positions.append(position)
+            row = self._matrix[position]
+            row[:] = 0
+            for genre in doc.get("genres") or []:
+                row[self.genre_positions[genre["uuid"]]] = 1
+            self._ratings[position] = doc.get("imdb_rating") or 0.0
+            self.titles[position] = doc.get("title")
+            last_change_date = doc.get("last_change_date")
+            if not last_change_date:
+                continue
+            if (
+                self.last_change_date is None
+                or last_change_date > self.last_change_date
+            ):
+                self.last_change_date = last_change_date
+                self.boundary_ids = {doc["id"]}
+            elif last_change_date == self.last_change_date:
+                self.boundary_ids.add(doc["id"])
+
+        self._genre_counts[positions] = self._matrix[positions].sum(
+            axis=1, dtype=np.int32
+        )
+        self._memo.clear()
+
+    def remove(self, film_ids: Iterable[str]) -> int:
+        """Удаляет фильмы из индекса.
+
+        На место удалённой строки переносится последняя, поэтому буферы
+        не перевыделяются, а позиции остальных фильмов не сдвигаются.
+        """
+        removed = 0
+        for film_id in film_ids:
+            position = self.film_positions.pop(film_id, None)
+            if position is None:
+                continue
+            last = len(self.film_ids) - 1
+            if position != last:
+                moved_id = self.film_ids[last]
+                self.film_ids[position] = moved_id
+                self.titles[position] = self.titles[last]
+                self.film_positions[moved_id] = position
+                self._matrix[position] = self._matrix[last]
+                self._ratings[position] = self._ratings[last]
+                self._genre_counts[position] = self._genre_counts[last]
+            self.film_ids.pop()
+            self.titles.pop()
+            self._matrix[last] = 0
+            self._ratings[last] = 0.0
+            self._genre_counts[last] = 0
+            self.boundary_ids.discard(film_id)
+            removed += 1
+        if removed:
+            # В запомненных топах хранятся позиции строк
+            self._memo.clear()
+        return removed
+
+    def _reserve(self, films_count: int, genres_count: int) -> None:
+        """Увеличивает буферы не меньше чем вдвое, если места не хватает"""
+        rows, columns = self._matrix.shape
+        if films_count <= rows and genres_count <= columns:
+            return
+
+        if films_count > rows:
+            rows = max(films_count, rows * 2)
+        if genres_count > columns:
+            columns = max(genres_count, columns * 2)
+        matrix = np.zeros((rows, columns), dtype=np.uint8)
+        matrix[: self._matrix.shape[0], : self._matrix.shape[1]] = self._matrix
+        self._matrix = matrix
+        ratings = np.zeros(rows, dtype=np.float64)
+        ratings[: self._ratings.size] = self._ratings
+        self._ratings = ratings
+        genre_counts = np.zeros(rows, dtype=np.int32)
+        genre_counts[: self._genre_counts.size] = self._genre_counts
+        self._genre_counts = genre_counts
+
+    def similar(
+        self, film_id: str, page_size: int, page_number: int
+    ) -> Optional[list[FilmCommon]]:
+        """Страница похожих фильмов или None, если фильма нет в индексе"""
+        position = self.film_positions.get(film_id)
+        if position is None:
+            return None
+
+        top = self._memo.get(film_id)
+        if top is None:
+            self.memo_misses += 1
+            top = self._compute_top(position)
+            self._memo[film_id] = top
+            if len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        else:
+            self.memo_hits += 1
+            self._memo.move_to_end(film_id)
+
+        from_ = (page_number - 1) * page_size
+        return [
+            FilmCommon(
+                id=self.film_ids[i],
+                title=self.titles[i],
+                imdb_rating=float(self.ratings[i]),
+            )
+            for i in top[from_ : from_ + page_size]
+        ]
+
+    def _compute_top(self, position: int) -> np.ndarray:
+        genre_columns = np.flatnonzero(self.matrix[position])
+        if not genre_columns.size:
+            return np.zeros(0, dtype=np.int64)
+
+        # Пересечение считаем только по жанрам самого фильма
+        intersection = self.matrix[:, genre_columns].sum(
+            axis=1, dtype=np.int32
+        )
+        intersection[position] = 0
+        candidates = np.flatnonzero(intersection)
+        if not candidates.size:
+            return candidates
+
+        union = (
+            self.genre_counts[candidates]
+            + genre_columns.size
+            - intersection[candidates]
+        )
+        scores = (
+            intersection[candidates] / union * SCORE_WEIGHT
+            + self.ratings[candidates]
+        )
+        if candidates.size > self.top_k:
+            best = np.argpartition(-scores, self.top_k - 1)[: self.top_k]
+            candidates, scores = candidates[best], scores[best]
+        return candidates[np.argsort(-scores, kind="stable")]
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "films": len(self.film_ids),
+            "genres": len(self.genre_positions),
+            "matrix_bytes": int(self._matrix.nbytes),
+            "memo_entries": len(self._memo),
+            "memo_hits": self.memo_hits,
+            "memo_misses": self.memo_misses,
+        }
+
+
+async def refresh_similarity_index(
+    index: SimilarityIndex, search_engine: SearchEngine
+) -> int:
+    """Догружает в индекс фильмы, изменённые после последнего обновления.
+
+    Дата последнего загруженного фильма запрашивается ещё раз (gte):
+    фильмы, записанные ETL с той же датой после прошлой догрузки,
+    иначе были бы пропущены. Уже загруженные с этой датой фильмы
+    отбрасываются по идентификатору.
+    """
+    query = None
+    boundary = index.last_change_date
+    if boundary:
+        query = {"range": {"last_change_date": {"gte": boundary}}}
+
+    docs = []
+    async for hits in search_engine.scan(
+        index=SIMILARITY_ES_INDEX,
+        fields=SIMILARITY_SOURCE_FIELDS,
+        query=query,
+    ):
+        docs.extend(
+            {**hit["_source"], "id": hit["_id"]}
+            for hit in hits
+            if not (
+                hit["_source"].get("last_change_date") == boundary
+                and hit["_id"] in index.boundary_ids
+            )
+        )
+    # Вся выборка записывается в индекс за один раз
+    index.upsert(docs)
+    return len(docs)
+
+
+async def reconcile_similarity_index(
+    index: SimilarityIndex, search_engine: SearchEngine
+) -> int:
+    """Удаляет из индекса фильмы, которых больше нет в search_engine.
+
+    Догрузка видит только изменённые документы, поэтому удалённые
+    фильмы находятся сверкой полного списка идентификаторов.
+    """
+    present = set()
+    async for hits in search_engine.scan(
+        index=SIMILARITY_ES_INDEX, fields=["id"]
+    ):
+        present.update(hit["_id"] for hit in hits)
+    removed = index.remove(
+        [film_id for film_id in index.film_ids if film_id not in present]
+    )
+    index.reconciled_at = time.monotonic()
+    return removed
+
+
+async def run_similarity_index_updater(
+    index: SimilarityIndex, search_engine: SearchEngine
+):
+    """Полная загрузка индекса при старте и периодическая догрузка изменений"""
+    while True:
+        try:
+            changed = await refresh_similarity_index(index, search_engine)
+            if changed or not index.ready:
+                logging.info(f"Similarity index updated: {changed} films")
+            if not index.ready:
+                # Сразу после полной загрузки удалённых фильмов нет
+                index.reconciled_at = time.monotonic()
+            elif (
+                time.monotonic() - index.reconciled_at
+                >= settings.similarity_reconcile_interval
+            ):
+                removed = await reconcile_similarity_index(
+                    index, search_engine
+                )
+                if removed:
+                    logging.info(
+                        f"Similarity index removed {removed} deleted films"
+                    )
+            index.ready = True
+        except Exception as e:
+            logging.error(f"Similarity index refresh failed: {e}")
+        try:
+            await asyncio.wait_for(
+                index.refresh_requested.wait(),
+                timeout=settings.similarity_refresh_interval,
+            )
+        except asyncio.TimeoutError:
+            pass
+        index.refresh_requested.clear()
+
+
+similarity_index = SimilarityIndex(
+    top_k=settings.similarity_top_k,
+    memo_size=settings.similarity_memo_size,
+)
+register_metrics("similarity_index", similarity_index.metrics)
@@ -0,0 +1,105 @@
+import asyncio
+from functools import lru_cache
+from typing import Callable
+
+from fastapi import Depends
+
+from common.single_flight import SingleFlight
+from core.config import settings
+from core.metrics import register_metrics
+from db.cache import MemoryCacheStorage
+from db.search_engine import SearchEngine, get_search_engine
+from models.models import FilmCommon, PersonCommon
+
+# Индексы и completion-поля, которые заполняет etl_service
+SUGGEST_FILMS_INDEX = "movies"
+SUGGEST_FILMS_FIELD = "title_suggest"
+SUGGEST_PERSONS_INDEX = "persons"
+SUGGEST_PERSONS_FIELD = "full_name_suggest"
+
+SuggestRender = Callable[[list[FilmCommon], list[PersonCommon]], bytes]
+
+# Готовые ответы по префиксам: частые префиксы короткие и повторяются
+# у всех пользователей, поэтому держим их в памяти процесса
+suggest_cache = MemoryCacheStorage(
+    max_bytes=settings.suggest_cache_max_bytes,
+    max_ttl=settings.suggest_cache_ttl,
+)
+suggest_single_flight = SingleFlight()
+register_metrics(
+    "suggest",
+    lambda: {
+        "cache": suggest_cache.metrics(),
+        "single_flight": suggest_single_flight.metrics(),
+    },
+)
+
+
+def normalize_prefix(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class SuggestService:
+    """Подсказки при наборе по completion-полям фильмов и персон"""
+
+    def __init__(self, search_engine: SearchEngine):
+        self.search_engine = search_engine
+
+    async def get_response(
+        self, query: str, size: int, render: SuggestRender
+    ) -> bytes:
+        prefix = normalize_prefix(query)
+        if not prefix:
+            return render([], [])
+        key = f"suggest:{size}:{prefix}"
+        payload = await suggest_cache.get(key)
+        if payload is not None:
+            return payload
+
+        return await suggest_single_flight.do(
+            key, lambda: self._render(prefix, size, render, key)
+        )
+
+    async def _render(
+        self, prefix: str, size: int, render: SuggestRender, key: str
+    ) -> bytes:
+        films, persons = await asyncio.gather(
+            self.search_engine.suggest(
+                SUGGEST_FILMS_INDEX,
+                SUGGEST_FILMS_FIELD,
+                prefix,
+                size,
+                source=["title"],
+            ),
+            self.search_engine.suggest(
+                SUGGEST_PERSONS_INDEX,
+                SUGGEST_PERSONS_FIELD,
+                prefix,
+                size,
+                source=["full_name"],
+            ),
+        )
+        payload = render(
+            [
+                FilmCommon(
+                    id=option["_id"], title=option["_source"].get("title")
+                )
+                for option in films
+            ],
+            [
+                PersonCommon(
+                    id=option["_id"],
+                    full_name=option["_source"].get("full_name"),
+                )
+                for option in persons
+            ],
+        )
+        await suggest_cache.set(key, payload, settings.suggest_cache_ttl)
+        return payload
+
+
+@lru_cache()
+def get_suggest_service(
+    search_engine: SearchEngine = Depends(get_search_engine),
+) -> SuggestService:
+    return SuggestService(search_engine)
@@ -1,3 +1,4 @@
+from http import HTTPStatus
 from typing import Any
 import aiohttp
 import asyncio
@@ -88,15 +89,28 @@ def es_delete_data(es_client):
 
 @pytest_asyncio.fixture(name="make_get_request")
 def make_get_request():
-    async def inner(path: str, parameters: dict[str, Any] = {}):
+    async def inner(
+        path: str,
+        parameters: dict[str, Any] = {},
+        headers: dict[str, str] = {},
+        service_url: str = service_settings.get_host(),
+    ):
         session = aiohttp.ClientSession()
-        url = service_settings.get_host() + path
-        async with session.get(url, params=parameters, timeout=10) as response:
-            body = await response.json()
+        url = service_url + path
+        async with session.get(
+            url, params=parameters, headers=headers, timeout=10
+        ) as response:
+            # У ответа 304 нет тела
+            body = (
+                None
+                if response.status == HTTPStatus.NOT_MODIFIED
+                else await response.json()
+            )
             status = response.status
+            headers = response.headers
 
         await session.close()
-        return {"body": body, "status": status}
+        return {"body": body, "status": status, "headers": headers}
 
     return inner
 
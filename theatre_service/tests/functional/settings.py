@@ -6,15 +6,19 @@ from tests.functional.testdata.es_mapping import (
     PERSONS_MAPPING,
 )
 from tests.functional.utils.helpers import (
+    AuthSettings,
     RedisSettings,
     ElasticsearchSettings,
     ServiceSettings,
+    TiersServiceSettings,
 )
 
 
 es_settings = ElasticsearchSettings()
 redis_settings = RedisSettings()
 service_settings = ServiceSettings()
+tiers_service_settings = TiersServiceSettings()
+auth_settings = AuthSettings()
 
 
 class TestSettings(BaseSettings):
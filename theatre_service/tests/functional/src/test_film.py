@@ -1,14 +1,28 @@
 """функциональные тесты для метода /film"""
 
+import asyncio
+import time
+import uuid
 from http import HTTPStatus
+from typing import Optional
 
 import pytest
+from jose import jwt
 
-from tests.functional.settings import test_film_settings
+from tests.functional.settings import (
+    auth_settings,
+    service_settings,
+    test_film_settings,
+    test_person_settings,
+    tiers_service_settings,
+)
 from tests.functional.testdata.movie_data import (
     generate_movies_data,
     generate_one_movie_data,
 )
+from tests.functional.testdata.person_data import generate_one_person_data
+
+RECOMMENDATIONS_USER = "6f5a0c1e-6d3b-4c1f-9b4a-2f1f7c0d8e21"
 
 
 # вывести все фильмы
@@ -111,3 +125,475 @@ async def test_cache_all_film(
     if expected_answer["status"] == HTTPStatus.NOT_FOUND:
         return
     assert len(response["body"]) == expected_answer["length"]
+
+
+# обход всех фильмов по курсору
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "movies_len, page_size, expected_pages",
+    [
+        (60, 25, [25, 25, 10]),
+        (20, 10, [10, 10, 0]),
+        (0, 10, [0]),
+    ],
+)
+async def test_films_cursor_pagination(
+    make_get_request,
+    es_write_data,
+    es_bulk_query,
+    movies_len,
+    page_size,
+    expected_pages,
+):
+    es_data = generate_movies_data(movies_len=movies_len)
+    bulk_query = es_bulk_query(
+        es_data=es_data, es_index=test_film_settings.es_index
+    )
+    await es_write_data(bulk_query, test_film_settings)
+
+    pages = []
+    seen_ids = set()
+    cursor = ""
+    while cursor is not None:
+        response = await make_get_request(
+            "/api/v1/films", {"page_size": page_size, "cursor": cursor}
+        )
+        assert response["status"] == HTTPStatus.OK
+        pages.append(len(response["body"]))
+        seen_ids.update(film["uuid"] for film in response["body"])
+        cursor = response["headers"].get("X-Next-Cursor")
+
+    assert pages == expected_pages
+    assert len(seen_ids) == movies_len
+
+
+def make_token(user_id: str, roles: Optional[list[dict]] = None) -> str:
+    return jwt.encode(
+        {
+            "user_id": user_id,
+            "roles": roles or [],
+            "exp": int(time.time()) + 600,
+        },
+        auth_settings.jwt_secret_key,
+        algorithm=auth_settings.jwt_algorithm,
+    )
+
+
+# персональные рекомендации: владелец токена и служебный запрос
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "headers, expected_status",
+    [
+        (
+            {"Authorization": f"Bearer {make_token(RECOMMENDATIONS_USER)}"},
+            HTTPStatus.OK,
+        ),
+        (
+            {"X-Internal-Auth": auth_settings.internal_auth_key},
+            HTTPStatus.OK,
+        ),
+        (
+            {"Authorization": f"Bearer {make_token(str(uuid.uuid4()))}"},
+            HTTPStatus.FORBIDDEN,
+        ),
+        ({"X-Internal-Auth": "wrong-key"}, HTTPStatus.FORBIDDEN),
+        ({}, HTTPStatus.FORBIDDEN),
+    ],
+    ids=["owner", "internal", "other user", "wrong key", "anonymous"],
+)
+async def test_user_recommendations_auth(
+    make_get_request,
+    es_write_data,
+    es_bulk_query,
+    headers,
+    expected_status,
+):
+    es_data = generate_movies_data(movies_len=10)
+    bulk_query = es_bulk_query(
+        es_data=es_data, es_index=test_film_settings.es_index
+    )
+    await es_write_data(bulk_query, test_film_settings)
+
+    response = await make_get_request(
+        f"/api/v1/films/recommendations/{RECOMMENDATIONS_USER}",
+        headers=headers,
+    )
+
+    assert response["status"] == expected_status
+    if expected_status == HTTPStatus.OK:
+        assert len(response["body"]) == 10
+
+
+# L1 в памяти процесса: страница отдаётся без Redis и Elasticsearch.
+# L1 не очищается между тестами, поэтому у каждого теста на
+# fastapi_tiers свой page_size
+@pytest.mark.asyncio
+async def test_l1_cache_serves_without_redis(
+    make_get_request,
+    es_write_data,
+    es_delete_data,
+    es_bulk_query,
+    redis_client,
+):
+    es_data = generate_movies_data(movies_len=10)
+    bulk_query = es_bulk_query(
+        es_data=es_data, es_index=test_film_settings.es_index
+    )
+    await es_write_data(bulk_query, test_film_settings)
+    param_data = {"page_size": 7}
+
+    for service_url in (
+        service_settings.get_host(),
+        tiers_service_settings.get_host(),
+    ):
+        response = await make_get_request(
+            "/api/v1/films", param_data, service_url=service_url
+        )
+        assert response["status"] == HTTPStatus.OK
+    metrics = await make_get_request(
+        "/api/v1/metrics", service_url=tiers_service_settings.get_host()
+    )
+    l1_hits = metrics["body"]["cache"]["l1"]["hits"]
+
+    await es_delete_data(test_film_settings)
+    await redis_client.flushall()
+
+    # Без L1 данных больше нигде нет
+    response = await make_get_request("/api/v1/films", param_data)
+    assert response["status"] == HTTPStatus.NOT_FOUND
+
+    response = await make_get_request(
+        "/api/v1/films",
+        param_data,
+        service_url=tiers_service_settings.get_host(),
+    )
+    assert response["status"] == HTTPStatus.OK
+    assert len(response["body"]) == 7
+    metrics = await make_get_request(
+        "/api/v1/metrics", service_url=tiers_service_settings.get_host()
+    )
+    assert metrics["body"]["cache"]["l1"]["hits"] > l1_hits
+
+
+# stale-while-revalidate: после soft TTL клиент сразу получает
+# устаревшую страницу, а обновлённая появляется после фонового запроса
+@pytest.mark.asyncio
+async def test_stale_while_revalidate(
+    make_get_request,
+    es_write_data,
+    es_bulk_query,
+):
+    param_data = {"page_size": 9}
+    es_data = generate_movies_data(movies_len=10)
+    await es_write_data(
+        es_bulk_query(es_data=es_data, es_index=test_film_settings.es_index),
+        test_film_settings,
+    )
+    response = await make_get_request(
+        "/api/v1/films",
+        param_data,
+        service_url=tiers_service_settings.get_host(),
+    )
+    assert len(response["body"]) == 9
+
+    es_data = generate_movies_data(movies_len=3)
+    await es_write_data(
+        es_bulk_query(es_data=es_data, es_index=test_film_settings.es_index),
+        test_film_settings,
+    )
+    # soft TTL списков на fastapi_tiers - 1 секунда
+    await asyncio.sleep(2)
+
+    response = await make_get_request(
+        "/api/v1/films",
+        param_data,
+        service_url=tiers_service_settings.get_host(),
+    )
+    assert response["status"] == HTTPStatus.OK
+    assert len(response["body"]) == 9
+
+    for _ in range(10):
+        await asyncio.sleep(0.5)
+        response = await make_get_request(
+            "/api/v1/films",
+            param_data,
+            service_url=tiers_service_settings.get_host(),
+        )
+        if len(response["body"]) == 3:
+            break
+    assert {film["uuid"] for film in response["body"]} == {
+        film["id"] for film in es_data
+    }
+
+
+# несколько фильмов одним запросом: порядок запроса, пропуск
+# ненайденных и недоступных, повторный ответ из кэша
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "roles, expected_films",
+    [
+        ([], [2, 0]),
+        ([{"name": "subscriber"}], [2, 0, 1]),
+    ],
+    ids=["no roles", "subscriber"],
+)
+async def test_films_batch(
+    make_get_request,
+    es_write_data,
+    es_delete_data,
+    es_bulk_query,
+    roles,
+    expected_films,
+):
+    es_data = generate_movies_data(movies_len=3)
+    es_data[1]["access"] = [{"privilege": "subscriber"}]
+    bulk_query = es_bulk_query(
+        es_data=es_data, es_index=test_film_settings.es_index
+    )
+    await es_write_data(bulk_query, test_film_settings)
+
+    ids = [es_data[2]["id"], str(uuid.uuid4()), es_data[0]["id"]]
+    ids.append(es_data[1]["id"])
+    token = make_token(str(uuid.uuid4()), roles)
+    headers = {"Authorization": f"Bearer {token}"}
+    expected_ids = [es_data[i]["id"] for i in expected_films]
+
+    response = await make_get_request(
+        "/api/v1/films/batch", {"ids": ids}, headers=headers
+    )
+    assert response["status"] == HTTPStatus.OK
+    assert [film["uuid"] for film in response["body"]] == expected_ids
+
+    # Второй запрос обслуживается из Redis без Elasticsearch
+    await es_delete_data(test_film_settings)
+    response = await make_get_request(
+        "/api/v1/films/batch", {"ids": ids}, headers=headers
+    )
+    assert [film["uuid"] for film in response["body"]] == expected_ids
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "ids_len, headers, expected_status",
+    [
+        (1, {}, HTTPStatus.FORBIDDEN),
+        (
+            101,
+            {"Authorization": f"Bearer {make_token(str(uuid.uuid4()))}"},
+            HTTPStatus.BAD_REQUEST,
+        ),
+    ],
+    ids=["anonymous", "too many ids"],
+)
+async def test_films_batch_rejected(
+    make_get_request, ids_len, headers, expected_status
+):
+    ids = [str(uuid.uuid4()) for _ in range(ids_len)]
+    response = await make_get_request(
+        "/api/v1/films/batch", {"ids": ids}, headers=headers
+    )
+
+    assert response["status"] == expected_status
+
+
+# ETag и Cache-Control: совпавший If-None-Match даёт 304 без тела
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "path, private",
+    [("/api/v1/films", False), ("/api/v1/films/batch", True)],
+    ids=["public list", "private batch"],
+)
+async def test_conditional_responses(
+    make_get_request, es_write_data, es_bulk_query, path, private
+):
+    es_data = generate_movies_data(movies_len=5)
+    bulk_query = es_bulk_query(
+        es_data=es_data, es_index=test_film_settings.es_index
+    )
+    await es_write_data(bulk_query, test_film_settings)
+    param_data = {"ids": [film["id"] for film in es_data]} if private else {}
+    headers = {
+        "Authorization": f"Bearer {make_token(str(uuid.uuid4()))}"
+    }
+
+    response = await make_get_request(path, param_data, headers=headers)
+    assert response["status"] == HTTPStatus.OK
+    etag = response["headers"]["ETag"]
+    cache_control = response["headers"]["Cache-Control"]
+    assert cache_control.startswith("private" if private else "public")
+    assert "max-age=" in cache_control
+    assert response["headers"].get("Vary") == (
+        "Authorization" if private else None
+    )
+
+    for if_none_match, expected_status in (
+        (etag, HTTPStatus.NOT_MODIFIED),
+        (f'"other", W/{etag}', HTTPStatus.NOT_MODIFIED),
+        ('"other"', HTTPStatus.OK),
+    ):
+        response = await make_get_request(
+            path,
+            param_data,
+            headers={**headers, "If-None-Match": if_none_match},
+        )
+        assert response["status"] == expected_status
+        assert response["headers"]["ETag"] == etag
+        if expected_status == HTTPStatus.NOT_MODIFIED:
+            assert response["body"] is None
+        else:
+            assert len(response["body"]) == 5
+
+
+def completion_input(text: str, weight: float) -> dict:
+    """Входы completion-поля так же, как их строит etl_service"""
+    words = text.split()
+    return {
+        "input": [" ".join(words[i:]) for i in range(len(words))],
+        "weight": int(weight),
+    }
+
+
+# подсказки при наборе: фильмы и персоны по началу любого слова,
+# фильмы с большим рейтингом выше
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "query, size, expected_answer",
+    [
+        (
+            "mat",
+            10,
+            {"films": ["The Matrix", "The Matrix Reloaded"], "persons": []},
+        ),
+        ("mat", 1, {"films": ["The Matrix"], "persons": []}),
+        (
+            " Re",
+            10,
+            {"films": ["The Matrix Reloaded"], "persons": ["Keanu Reeves"]},
+        ),
+        ("zzz", 10, {"films": [], "persons": []}),
+        (" ", 10, {"films": [], "persons": []}),
+    ],
+    ids=["films", "size", "films and persons", "nothing", "blank"],
+)
+async def test_suggest(
+    make_get_request,
+    es_write_data,
+    es_bulk_query,
+    query,
+    size,
+    expected_answer,
+):
+    movies = []
+    for title, rating in (("The Matrix", 8.7), ("The Matrix Reloaded", 7.2)):
+        movie = generate_one_movie_data(imdb_rating=rating)
+        movie["title"] = title
+        movie["title_suggest"] = completion_input(title, rating * 10)
+        movies.append(movie)
+    person = generate_one_person_data(person_name="Keanu Reeves")
+    person["full_name_suggest"] = completion_input("Keanu Reeves", 1)
+    await es_write_data(
+        es_bulk_query(es_data=movies, es_index=test_film_settings.es_index),
+        test_film_settings,
+    )
+    await es_write_data(
+        es_bulk_query(
+            es_data=[person], es_index=test_person_settings.es_index
+        ),
+        test_person_settings,
+    )
+
+    response = await make_get_request(
+        "/api/v1/suggest", {"query": query, "size": size}
+    )
+
+    assert response["status"] == HTTPStatus.OK
+    assert [
+        film["title"] for film in response["body"]["films"]
+    ] == expected_answer["films"]
+    assert [
+        person["full_name"] for person in response["body"]["persons"]
+    ] == expected_answer["persons"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "param_data",
+    [{"query": ""}, {"query": "a" * 51}, {"query": "mat", "size": 21}],
+    ids=["empty", "too long", "size"],
+)
+async def test_suggest_validation(make_get_request, param_data):
+    response = await make_get_request("/api/v1/suggest", param_data)
+
+    assert response["status"] == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+FACET_GENRES = [str(uuid.uuid4()), str(uuid.uuid4())]
+
+
+# поиск с фасетами: страница, общее число фильмов, фасет рейтингов
+# по выдаче и фасет жанров без фильтра по жанру
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "param_data, expected_answer",
+    [
+        (
+            {},
+            {
+                "length": 5,
+                "total": 10,
+                "ratings": {"2-4": 4, "4-6": 4, "8-10": 2},
+            },
+        ),
+        (
+            {"genre_id": FACET_GENRES[0]},
+            {"length": 5, "total": 6, "ratings": {"4-6": 4, "8-10": 2}},
+        ),
+        (
+            {"genre_id": str(uuid.uuid4())},
+            {"length": 0, "total": 0, "ratings": {}},
+        ),
+    ],
+    ids=["all films", "genre", "unknown genre"],
+)
+async def test_faceted_search(
+    make_get_request,
+    es_write_data,
+    es_bulk_query,
+    param_data,
+    expected_answer,
+):
+    es_data = []
+    for genre_index, rating, count in (
+        (0, 9.0, 2),
+        (0, 5.0, 4),
+        (1, 3.0, 4),
+    ):
+        for _ in range(count):
+            movie = generate_one_movie_data(imdb_rating=rating)
+            movie["genres"] = [
+                {"name": "Drama", "uuid": FACET_GENRES[genre_index]}
+            ]
+            es_data.append(movie)
+    bulk_query = es_bulk_query(
+        es_data=es_data, es_index=test_film_settings.es_index
+    )
+    await es_write_data(bulk_query, test_film_settings)
+
+    response = await make_get_request(
+        "/api/v1/films/search",
+        {**param_data, "facets": "true", "page_size": 5},
+    )
+
+    assert response["status"] == HTTPStatus.OK
+    body = response["body"]
+    assert len(body["films"]) == expected_answer["length"]
+    assert body["total"] == expected_answer["total"]
+    assert {genre["uuid"]: genre["count"] for genre in body["genres"]} == {
+        FACET_GENRES[0]: 6,
+        FACET_GENRES[1]: 4,
+    }
+    assert {
+        rating["key"]: rating["count"]
+        for rating in body["ratings"]
+        if rating["count"]
+    } == expected_answer["ratings"]
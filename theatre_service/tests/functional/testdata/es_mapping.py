@@ -71,6 +71,7 @@ MOVIES_MAPPING = {
                 "fields": {"raw": {"type": "keyword"}},
                 "analyzer": "ru_en",
             },
+            "title_suggest": {"type": "completion"},
             "writers": {
                 "type": "nested",
                 "dynamic": "strict",
@@ -201,6 +202,7 @@ PERSONS_MAPPING = {
                 "fields": {"raw": {"type": "keyword"}},
                 "analyzer": "ru_en",
             },
+            "full_name_suggest": {"type": "completion"},
             "id": {"type": "keyword"},
             "last_change_date": {"type": "keyword", "index": False},
         },
@@ -21,3 +21,15 @@ class ElasticsearchSettings(CommonSettings):
 
 class ServiceSettings(CommonSettings):
     model_config = SettingsConfigDict(env_prefix="THEATRE_SERVICE_")
+
+
+class TiersServiceSettings(ServiceSettings):
+    """Экземпляр API с включённым L1 и коротким soft TTL списков"""
+
+    host: str = Field("fastapi_tiers", alias="THEATRE_TIERS_SERVICE_HOST")
+
+
+class AuthSettings(BaseSettings):
+    jwt_secret_key: str = Field(..., alias="AUTH_SECRET_KEY")
+    jwt_algorithm: str = Field("HS256", alias="JWT_ALGORITHM")
+    internal_auth_key: str = Field(..., alias="NOTIFICATION_API_SECRET_KEY")
@@ -0,0 +1,12 @@
+from typing import Any
+
+from fastapi import APIRouter
+
+from services.bearer import verified_tokens
+
+router = APIRouter(prefix="/api/v1/metrics")
+
+
+@router.get("/", summary="Метрики кэша проверенных токенов")
+async def service_metrics() -> dict[str, Any]:
+    return {"verified_tokens": verified_tokens.metrics()}
@@ -11,6 +11,7 @@ from core.config import settings
 from api.v1.like import router as like_router
 from api.v1.bookmark import router as bookmark_router
 from api.v1.comment import router as comment_router
+from api.v1.metrics import router as metrics_router
 from exceptions.services import DuplicateError, NotFoundKeyError
 
 
@@ -36,6 +37,7 @@ app = FastAPI(
 app.include_router(router=like_router)
 app.include_router(router=bookmark_router)
 app.include_router(router=comment_router)
+app.include_router(router=metrics_router)
 
 
 @app.exception_handler(DuplicateError)
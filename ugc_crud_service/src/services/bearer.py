@@ -4,9 +4,15 @@ from typing import Optional
 from jose import jwt
 from fastapi import HTTPException, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from verified_tokens import VerifiedTokenCache
 
 from core.config import settings
 
+# Сколько проверенных токенов помнит процесс
+VERIFIED_TOKENS_MAX_ENTRIES = 10_000
+
+verified_tokens = VerifiedTokenCache(VERIFIED_TOKENS_MAX_ENTRIES)
+
 
 def decode_token(token: str) -> Optional[dict]:
     """
@@ -15,15 +21,22 @@ def decode_token(token: str) -> Optional[dict]:
     Возвращает содержимое токена в виде словаря или None,
     если токен невалиден или при декодировании
     было выброшено исключение.
+    Подпись токена, уже проверенного ранее, повторно не проверяется,
+    пока не наступит его exp.
     """
+    payload = verified_tokens.get(token)
+    if payload is not None:
+        return payload
     try:
-        return jwt.decode(
+        payload = jwt.decode(
             token,
             settings.jwt_secret_key,
             algorithms=[settings.jwt_algorithm],
         )
     except Exception:
         return None
+    verified_tokens.set(token, payload)
+    return payload
 
 
 class JWTBearer(HTTPBearer):
@@ -8,6 +8,7 @@ from core.config import settings
 from core.database import get_database
 from api.v1.link import router
 from api.v1.health import router as health_router
+from api.v1.metrics import router as metrics_router
 
 
 @asynccontextmanager
@@ -35,6 +36,9 @@ def create_application() -> FastAPI:
     )
 
     # Include routers
+    # Метрики объявлены раньше /api/v1/{link_id}, который иначе
+    # перехватил бы путь
+    app.include_router(metrics_router, prefix="/api/v1/metrics")
     app.include_router(router, prefix="/api/v1")
     app.include_router(health_router, prefix="/health")
 